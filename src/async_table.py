@@ -0,0 +1,239 @@
+"""An asyncio interface to the table, for scripts and services that work on
+several table files at once.
+
+`Table` blocks while it reads and writes the table file, so `AsyncTable` runs
+its methods on an executor, by default the thread pool of the event loop.
+Each `AsyncTable` owns a table of its own, see `Table(singleton=False)`, so
+table files are read and written concurrently:
+
+    async def main(paths):
+        tables = await asyncio.gather(*map(AsyncTable.open, paths))
+        await asyncio.gather(*(table.add_board("Inbox") for table in tables))
+        await asyncio.gather(*(table.close() for table in tables))
+
+As with `Table`, the boards, panels and cards returned are the ones held by
+the table and must only be changed through its methods. Calls on the same
+table may overlap; the table runs them one at a time.
+"""
+import asyncio
+from concurrent.futures import Executor
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, List, Set, TypeVar
+
+from db import Location, Table
+from kanbaru_objects import Board, Card, Color, Panel
+
+T = TypeVar("T")
+
+
+class AsyncTable:
+    """Awaitable facade of a table. The mutation methods write the table
+    file before returning, unless `start_write_behind()` was called on
+    `table`.
+
+    Parameters
+    ----------
+    path : str
+        The path of the table file, see `Table.set_path()`.
+    executor : Executor, optional
+        The executor running the methods of the table, by default None (the
+        default executor of the event loop).
+    """
+
+    def __init__(self, path: str, executor: Executor = None) -> None:
+        self._table = Table(singleton=False)
+        self._table.set_path(path)
+        self._executor = executor
+
+    @classmethod
+    async def open(cls, path: str,
+                   executor: Executor = None) -> "AsyncTable":
+        """Returns the table of a table file, once it has been read. The
+        table file is created if it does not exist.
+
+        Parameters
+        ----------
+        path : str
+            The path of the table file.
+        executor : Executor, optional
+            The executor running the methods of the table, by default None.
+
+        Returns
+        -------
+        table : AsyncTable
+            The table.
+        """
+        table = cls(path, executor)
+        await table.read()
+        return table
+
+    @property
+    def table(self) -> Table:
+        """The table, e.g. to set its compression. Its methods block."""
+        return self._table
+
+    @property
+    def path(self) -> str:
+        return self._table.get_path()
+
+    async def _run(self, function: Callable[..., T], *args: Any,
+                   **kwargs: Any) -> T:
+        """Runs a function on the executor and returns its result."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(function, *args, **kwargs))
+
+    async def read(self) -> None:
+        """See `Table.read()`."""
+        await self._run(self._table.read)
+
+    async def write(self) -> None:
+        """See `Table.write()`."""
+        await self._run(self._table.write)
+
+    async def flush(self) -> None:
+        """See `Table.flush()`."""
+        await self._run(self._table.flush)
+
+    async def reload(self) -> Set[str]:
+        """See `Table.reload()`."""
+        return await self._run(self._table.reload)
+
+    async def close(self) -> None:
+        """See `Table.close()`."""
+        await self._run(self._table.close)
+
+    async def transaction(self, function: Callable[..., T],
+                          *args: Any) -> T:
+        """Calls `function(table, *args)` inside `Table.transaction()`, so
+        its changes are written once and undone if it fails. The function
+        runs on the executor and gets the blocking table.
+
+        Parameters
+        ----------
+        function : Callable[..., T]
+            The function making the changes.
+        *args : Any
+            The other arguments of the function.
+
+        Returns
+        -------
+        result : T
+            The result of the function.
+        """
+        def run() -> T:
+            with self._table.transaction() as table:
+                return function(table, *args)
+        return await self._run(run)
+
+    async def boards(self) -> List[Board]:
+        """Returns the boards of the table, with their panels loaded."""
+        def load() -> List[Board]:
+            boards = list(self._table.boards)
+            for board in boards:
+                board.panels
+            return boards
+        return await self._run(load)
+
+    async def locate(self, item_id: str) -> Location | None:
+        """See `Table.locate()`."""
+        return await self._run(self._table.locate, item_id)
+
+    async def find(self, item_id: str) -> Board | Panel | Card | None:
+        """See `Table.find()`."""
+        return await self._run(self._table.find, item_id)
+
+    async def query(self, kind: str = "card", **filters: Any
+                    ) -> List[Location]:
+        """Returns the list of matches of `Table.query()`."""
+        return await self._run(
+            lambda: list(self._table.query(kind, **filters)))
+
+    async def search(self, query: str, limit: int = 50) -> List[Location]:
+        """See `Table.search()`."""
+        return await self._run(self._table.search, query, limit)
+
+    async def due_between(self, start: int | None = None,
+                          end: int | None = None,
+                          limit: int | None = None) -> List[Location]:
+        """See `Table.due_between()`."""
+        return await self._run(self._table.due_between, start, end, limit)
+
+    async def upcoming(self, days: int = 7, now: datetime = None,
+                       limit: int | None = None) -> List[Location]:
+        """See `Table.upcoming()`."""
+        return await self._run(self._table.upcoming, days, now, limit)
+
+    async def overdue(self, now: datetime = None,
+                      limit: int | None = None) -> List[Location]:
+        """See `Table.overdue()`."""
+        return await self._run(self._table.overdue, now, limit)
+
+    async def title_exists(self, kind: str, title: str,
+                           scope: str = None) -> bool:
+        """See `Table.title_exists()`."""
+        return await self._run(self._table.title_exists, kind, title, scope)
+
+    async def add_board(self, title: str, id: str = None) -> Board:
+        """See `Table.add_board()`."""
+        return await self._run(self._table.add_board, title, id)
+
+    async def add_panel(self, board: Board, title: str,
+                        id: str = None) -> Panel | None:
+        """See `Table.add_panel()`."""
+        return await self._run(self._table.add_panel, board, title, id)
+
+    async def add_card(self, panel: Panel, card: Card) -> Card | None:
+        """See `Table.add_card()`."""
+        return await self._run(self._table.add_card, panel, card)
+
+    async def add_cards(self, panel: Panel,
+                        cards: List[Card]) -> List[Card]:
+        """See `Table.add_cards()`."""
+        return await self._run(self._table.add_cards, panel, cards)
+
+    async def move_card(self, card: Card, destination: Panel,
+                        index: int = None) -> None:
+        """See `Table.move_card()`, which writes the move like the other
+        mutation methods."""
+        await self._run(self._table.move_card, card, destination, index)
+
+    async def update_card(self, card_old: Card, card_new: Card) -> None:
+        """See `Table.update_card()`."""
+        await self._run(self._table.update_card, card_old, card_new)
+
+    async def update_panel(self, panel_old: Panel,
+                           panel_new: Panel) -> None:
+        """See `Table.update_panel()`."""
+        await self._run(self._table.update_panel, panel_old, panel_new)
+
+    async def update_board(self, board_old: Board,
+                           board_new: Board) -> None:
+        """See `Table.update_board()`."""
+        await self._run(self._table.update_board, board_old, board_new)
+
+    async def update_panel_order(self, board: Board,
+                                 new_panel_list: List[Panel]) -> None:
+        """See `Table.update_panel_order()`."""
+        await self._run(self._table.update_panel_order, board,
+                        new_panel_list)
+
+    async def update_board_order(self, new_board_list: List[Board]) -> None:
+        """See `Table.update_board_order()`."""
+        await self._run(self._table.update_board_order, new_board_list)
+
+    async def change_board_color(self, board: Board, color: Color) -> None:
+        """See `Table.change_board_color()`."""
+        await self._run(self._table.change_board_color, board, color)
+
+    async def delete_card(self, card: Card) -> None:
+        """See `Table.delete_card()`."""
+        await self._run(self._table.delete_card, card)
+
+    async def delete_panel(self, panel: Panel) -> None:
+        """See `Table.delete_panel()`."""
+        await self._run(self._table.delete_panel, panel)
+
+    async def delete_board(self, board: Board) -> None:
+        """See `Table.delete_board()`."""
+        await self._run(self._table.delete_board, board)
@@ -0,0 +1,92 @@
+"""Compares updating several table files concurrently through `AsyncTable`
+with updating them one after the other, each update being written to the
+table file before the next one.
+
+Run from the src directory:
+
+    python -m benchmarks.async_tables [--tables 10] [--updates 50]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from async_table import AsyncTable
+from kanbaru_objects import Card
+
+
+async def prepare(directory: str, name: str, tables: int,
+                  cards: int) -> List[str]:
+    """Creates `tables` table files holding `cards` cards each and returns
+    their paths."""
+    paths = [os.path.join(directory, f"{i}-{name}") for i in range(tables)]
+
+    async def create(path: str) -> None:
+        table = await AsyncTable.open(path)
+        board = (await table.boards())[0]
+        panel = await table.add_panel(board, "Backlog")
+        await table.add_cards(panel, [
+            Card(f"Card {i}", description="Follow up with the team.")
+            for i in range(cards)])
+        await table.close()
+
+    await asyncio.gather(*map(create, paths))
+    return paths
+
+
+async def update(table: AsyncTable, updates: int) -> None:
+    """Renames the cards of a table one at a time."""
+    cards = [location.item for location in await table.query("card")]
+    for i in range(updates):
+        card = cards[i % len(cards)]
+        await table.update_card(card, Card(
+            f"{card.title} {i}", card.day, card.minute, card.description,
+            card.id))
+
+
+async def measure(paths: List[str], updates: int,
+                  concurrent: bool) -> float:
+    """Opens the tables, updates them concurrently or one after the other,
+    closes them, and returns the elapsed number of seconds."""
+    with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        start = time.perf_counter()
+        tables = await asyncio.gather(
+            *(AsyncTable.open(path, executor) for path in paths))
+        if concurrent:
+            await asyncio.gather(
+                *(update(table, updates) for table in tables))
+        else:
+            for table in tables:
+                await update(table, updates)
+        await asyncio.gather(*(table.close() for table in tables))
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=10)
+    parser.add_argument("--cards", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    print(f"tables: {args.tables}, cards: {args.cards} per table, "
+          f"updates: {args.updates} per table")
+    print(f"{'file':<14}{'sequential':>12}{'concurrent':>12}{'speedup':>10}")
+    for name in ["Table.pkl", "Table.pickle", "Table.db"]:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = asyncio.run(
+                prepare(directory, name, args.tables, args.cards))
+            sequential = asyncio.run(measure(paths, args.updates, False))
+            concurrent = asyncio.run(measure(paths, args.updates, True))
+        print(f"{name:<14}{sequential * 1000:>9.0f} ms"
+              f"{concurrent * 1000:>9.0f} ms"
+              f"{sequential / concurrent:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
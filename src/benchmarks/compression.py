@@ -0,0 +1,159 @@
+"""Compares the size of the table file and the write latency with and without
+compression of long descriptions, on a workspace where some cards carry
+pasted logs.
+
+Run from the src directory:
+
+    python -m benchmarks.compression [--cards 10000] [--logs 0.1]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+from uuid import uuid4
+
+from db import Table
+from kanbaru_objects import Card
+
+
+def make_log(lines: int) -> str:
+    """Returns a synthetic application log of `lines` lines."""
+    levels = ["DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR"]
+    return "".join(
+        f"2024-03-{1 + i // 3600 % 28:02d} {i // 60 % 24:02d}:"
+        f"{i % 60:02d}:{random.randrange(60):02d} "
+        f"{random.choice(levels):<7} worker-{random.randrange(16)} "
+        f"processed request {uuid4().hex[:12]} in "
+        f"{random.randrange(1, 900)} ms\n"
+        for i in range(lines)
+    )
+
+
+def make_data(boards: int, panels: int, cards: int,
+              logs: float) -> List[Dict]:
+    """Returns the data of a table with `cards` cards spread evenly over
+    `boards` boards of `panels` panels each. A fraction `logs` of the cards
+    carry a log of 50 to 500 lines as their description, the others a
+    sentence."""
+    per_panel = max(1, cards // (boards * panels))
+    return [
+        {
+            "_Board__id": uuid4().hex,
+            "_Board__title": f"Board {b}",
+            "_Board__color": "LIGHTBLUE",
+            "_Board__panels_lists": [
+                {
+                    "_Panel__id": uuid4().hex,
+                    "_Panel__title": f"Panel {b}.{p}",
+                    "_Board__panels": [
+                        {
+                            "_Card__id": uuid4().hex,
+                            "_Card__title": f"Card {b}.{p}.{c}",
+                            "_Card__description": (
+                                make_log(random.randint(50, 500))
+                                if random.random() < logs else
+                                "Follow up with the team."),
+                            "_Card__date": 738886,
+                            "_Card__time": 720
+                        }
+                        for c in range(per_panel)
+                    ]
+                }
+                for p in range(panels)
+            ]
+        }
+        for b in range(boards)
+    ]
+
+
+def file_size(path: str) -> int:
+    """Returns the size of the table file, or of all the files it is made
+    of."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name))
+                   for name in os.listdir(path))
+    return sum(os.path.getsize(name) for name in (path, path + ".journal")
+               if os.path.exists(name))
+
+
+def measure(path: str, data: List[Dict], method: str | None,
+            updates: int) -> Dict[str, float]:
+    """Writes the table to a new table file at `path` with the given
+    compression method, updates a few long descriptions, and returns the
+    size of the file and the write and read latencies. The table is then
+    read back and rewritten, which does not decompress the descriptions."""
+    Table._instance = None
+    table = Table.get_instance()
+    table.set_path(path)
+    table.set_compression(method)
+    table.data = data
+
+    start = time.perf_counter()
+    table.write()
+    full = time.perf_counter() - start
+
+    cards = [card for board in table.boards for panel in board.panels
+             for card in panel.cards if len(card.description) > 1000]
+    start = time.perf_counter()
+    for card in random.sample(cards, min(updates, len(cards))):
+        table.update_card(card, Card(card.title, card.day, card.minute,
+                                     card.description + "\n", card.id))
+    update = (time.perf_counter() - start) / max(1, min(updates, len(cards)))
+    size = file_size(path)
+
+    Table._instance = None
+    table = Table.get_instance()
+    table.set_path(path)
+    start = time.perf_counter()
+    table.read()
+    for board in table.boards:
+        board.panels
+    read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table.boards = table.boards
+    table.write()
+    rewrite = time.perf_counter() - start
+    Table._instance = None
+    return {"size": size, "full": full, "update": update, "read": read,
+            "rewrite": rewrite}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=10_000)
+    parser.add_argument("--boards", type=int, default=10)
+    parser.add_argument("--panels", type=int, default=10)
+    parser.add_argument("--logs", type=float, default=0.1,
+                        help="fraction of cards carrying a log")
+    parser.add_argument("--updates", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    random.seed(args.seed)
+    data = make_data(args.boards, args.panels, args.cards, args.logs)
+    text = sum(len(card["_Card__description"]) for board in data
+               for panel in board["_Board__panels_lists"]
+               for card in panel["_Board__panels"])
+    print(f"cards: {args.cards}, description text: {text / 2 ** 20:.1f} MiB")
+    print(f"{'file':<14}{'method':<8}{'size':>10}{'first write':>13}"
+          f"{'update':>10}{'read':>10}{'rewrite':>10}")
+    for name in ["Table.pickle", "Table.db"]:
+        for method in [None, "zlib", "lzma"]:
+            with tempfile.TemporaryDirectory() as directory:
+                result = measure(os.path.join(directory, name), data, method,
+                                 args.updates)
+            print(f"{name:<14}{method or 'none':<8}"
+                  f"{result['size'] / 2 ** 20:>6.1f} MiB"
+                  f"{result['full'] * 1000:>10.0f} ms"
+                  f"{result['update'] * 1000:>7.1f} ms"
+                  f"{result['read'] * 1000:>7.0f} ms"
+                  f"{result['rewrite'] * 1000:>7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Measures how long it takes to build the boards, panels and cards of a large
+table and how much memory they take.
+
+Run from the src directory:
+
+    python -m benchmarks.model_memory [--cards 100000]
+"""
+import argparse
+import gc
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+from uuid import uuid4
+
+from db import Table
+from storage import PickleStorage
+
+
+def make_data(boards: int, panels: int, cards: int) -> List[Dict]:
+    """Returns the data of a table with `cards` cards spread evenly over
+    `boards` boards of `panels` panels each."""
+    per_panel = max(1, cards // (boards * panels))
+    return [
+        {
+            "_Board__id": uuid4().hex,
+            "_Board__title": f"Board {b}",
+            "_Board__color": "LIGHTBLUE",
+            "_Board__panels_lists": [
+                {
+                    "_Panel__id": uuid4().hex,
+                    "_Panel__title": f"Panel {b}.{p}",
+                    "_Board__panels": [
+                        {
+                            "_Card__id": uuid4().hex,
+                            "_Card__title": f"Card {b}.{p}.{c}",
+                            "_Card__description": "",
+                            "_Card__date": 738886,
+                            "_Card__time": 720
+                        }
+                        for c in range(per_panel)
+                    ]
+                }
+                for p in range(panels)
+            ]
+        }
+        for b in range(boards)
+    ]
+
+
+def load(path: str) -> Table:
+    """Reads the table at `path` and builds all of its boards."""
+    Table._instance = None
+    table = Table.get_instance()
+    table.set_path(path)
+    table.read()
+    for board in table.boards:
+        board.panels
+    return table
+
+
+def resident_memory() -> int | None:
+    """Returns the peak resident memory of the process in bytes, or None if
+    it cannot be measured on this platform."""
+    try:
+        import resource
+    except ModuleNotFoundError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--boards", type=int, default=10)
+    parser.add_argument("--panels", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Table.pickle")
+        data = make_data(args.boards, args.panels, args.cards)
+        PickleStorage(path).dump(data)
+        load(path)
+
+        gc.collect()
+        start = time.perf_counter()
+        for board in data:
+            Table._build_panels(board["_Board__panels_lists"])
+        built = time.perf_counter() - start
+
+        gc.collect()
+        start = time.perf_counter()
+        table = load(path)
+        loaded = time.perf_counter() - start
+        cards = sum(len(panel.cards) for board in table.boards
+                    for panel in board.panels)
+        del table, data
+        Table._instance = None
+
+        gc.collect()
+        tracemalloc.start()
+        table = load(path)
+        gc.collect()
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"cards:            {cards}")
+    print(f"construction:     {built * 1000:.0f} ms")
+    print(f"table read:       {loaded * 1000:.0f} ms")
+    print(f"allocated:        {allocated / 2 ** 20:.1f} MiB "
+          f"({allocated / cards:.0f} bytes per card)")
+    rss = resident_memory()
+    if rss is not None:
+        print(f"peak resident:    {rss / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
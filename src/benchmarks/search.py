@@ -0,0 +1,121 @@
+"""Measures how long it takes to build, save and load the search index of a
+large table and to run prefix and multi-word queries on it.
+
+Run from the src directory:
+
+    python -m benchmarks.search [--cards 100000]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+from uuid import uuid4
+
+from db import Table
+from storage import storage_for
+
+WORDS = (
+    "fix add remove update refactor test deploy review login logout "
+    "session token cache index query search board panel card title "
+    "description export import sync server client database migration "
+    "backup restore crash error warning timeout latency memory thread lock "
+    "queue worker schedule release hotfix feature design layout color font "
+    "window dialog button settings profile account password email invoice "
+    "report chart metric alert customer ticket sprint backlog roadmap"
+).split()
+
+
+def sentence(words: int) -> str:
+    """Returns a sentence of random words, some of them numbered."""
+    return " ".join(
+        random.choice(WORDS) + (str(random.randrange(1000))
+                                if random.random() < 0.1 else "")
+        for _ in range(words))
+
+
+def make_data(boards: int, panels: int, cards: int) -> List[Dict]:
+    """Returns the data of a table with `cards` cards spread evenly over
+    `boards` boards of `panels` panels each, with random titles and
+    descriptions."""
+    per_panel = max(1, cards // (boards * panels))
+    return [
+        {
+            "_Board__id": uuid4().hex,
+            "_Board__title": f"Board {b}",
+            "_Board__color": "LIGHTBLUE",
+            "_Board__panels_lists": [
+                {
+                    "_Panel__id": uuid4().hex,
+                    "_Panel__title": f"Panel {b}.{p}",
+                    "_Board__panels": [
+                        {
+                            "_Card__id": uuid4().hex,
+                            "_Card__title": sentence(4),
+                            "_Card__description": sentence(30),
+                            "_Card__date": 738886,
+                            "_Card__time": 720
+                        }
+                        for _ in range(per_panel)
+                    ]
+                }
+                for p in range(panels)
+            ]
+        }
+        for b in range(boards)
+    ]
+
+
+def open_table(path: str) -> Table:
+    Table._instance = None
+    table = Table.get_instance()
+    table.set_path(path)
+    table.read()
+    return table
+
+
+def timed(function, repeat: int = 1) -> float:
+    """Returns the average number of milliseconds a call takes."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--boards", type=int, default=10)
+    parser.add_argument("--panels", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    random.seed(args.seed)
+    queries = ["login", "log", "deploy server", "sea ind",
+               "crash timeout thread", "invoice42", "nothing"]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Table.db")
+        storage = storage_for(path)
+        storage.dump(make_data(args.boards, args.panels, args.cards))
+        storage.close()
+
+        table = open_table(path)
+        print(f"cards:            {args.cards}")
+        print(f"build index:      {timed(lambda: table.search('')):.0f} ms")
+        print(f"save index:       {timed(table.flush):.0f} ms")
+        table = open_table(path)
+        print(f"read with index:  {timed(lambda: open_table(path)):.0f} ms")
+        table = open_table(path)
+        for query in queries:
+            hits = len(table.search(query, limit=args.cards))
+            print(f'"{query}":'.ljust(18) +
+                  f"{timed(lambda: table.search(query), 20):.1f} ms "
+                  f"({hits} cards)")
+        Table._instance = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """Keeps the values of the most recently used keys, up to `maxsize` of
+    them. Storing a value when the cache is full evicts the value that was
+    used the longest time ago.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        The maximum number of values kept, by default 128.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.__maxsize = maxsize
+        self.__values: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @property
+    def maxsize(self) -> int:
+        return self.__maxsize
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the value of a key and marks it as the most recently used.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key to look up.
+        default : Any, optional
+            The value returned if the key is not cached, by default None.
+
+        Returns
+        -------
+        Any
+            The cached value, or `default`.
+        """
+        with self.__lock:
+            try:
+                self.__values.move_to_end(key)
+            except KeyError:
+                return default
+            return self.__values[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Stores the value of a key, evicting the least recently used value
+        if the cache is full.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key to store the value under.
+        value : Any
+            The value.
+        """
+        with self.__lock:
+            self.__values[key] = value
+            self.__values.move_to_end(key)
+            if len(self.__values) > self.__maxsize:
+                self.__values.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        """Removes the value of a key, if it is cached."""
+        with self.__lock:
+            self.__values.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes every value."""
+        with self.__lock:
+            self.__values.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.__lock:
+            return key in self.__values
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__values)
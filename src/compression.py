@@ -0,0 +1,75 @@
+import lzma
+import zlib
+
+# Compressed text is stored as bytes starting with a tag naming the method,
+# so it can be told apart from plain text and decompressed without knowing
+# which method the table was written with.
+METHODS = {
+    "zlib": (b"Z", lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (b"X", lambda data: lzma.compress(data, preset=6),
+             lzma.decompress),
+}
+_DECOMPRESS = {tag: decompress for tag, _, decompress in METHODS.values()}
+
+
+def compress_text(text: str, method: str = "zlib") -> bytes:
+    """Compresses text with the given method.
+
+    Parameters
+    ----------
+    text : str
+        The text to compress.
+    method : str, optional
+        The compression method, "zlib" or "lzma", by default "zlib".
+
+    Returns
+    -------
+    bytes
+        The tagged compressed text, see `decompress_text()`.
+
+    Raises
+    ------
+    ValueError
+        If the method is not supported.
+    """
+    try:
+        tag, compress, _ = METHODS[method]
+    except KeyError:
+        raise ValueError(f'Unknown compression method "{method}"')
+    return tag + compress(text.encode("utf-8"))
+
+
+def decompress_text(data: bytes) -> str:
+    """Decompresses text compressed by `compress_text()`.
+
+    Parameters
+    ----------
+    data : bytes
+        The tagged compressed text.
+
+    Returns
+    -------
+    str
+        The text.
+    """
+    return _DECOMPRESS[data[:1]](data[1:]).decode("utf-8")
+
+
+class CompressedText:
+    """Compressed text that is only decompressed when it is read. Stands in
+    for the description of a card, which calls it with its ID on every access,
+    see `Card`.
+
+    Parameters
+    ----------
+    data : bytes
+        The tagged compressed text, see `compress_text()`.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    def __call__(self, card_id: str = None) -> str:
+        return decompress_text(self.data)
@@ -1,9 +1,66 @@
-from kanbaru_objects import Board, Card, Color, Panel
+from cache import LRUCache
+from compression import CompressedText, compress_text, decompress_text
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import Future
+from functools import partial, wraps
+from indexes import DueIndex, SearchIndex, TitleIndex
+from kanbaru_objects import (MINUTES_PER_DAY, Board, Card, Color, Panel,
+                             to_due)
+from locking import FileLock
+from storage import Change, Storage, replay_changes, storage_for
+from writer import WriteBehind
+import heapq
 import logging
 import os
 import sys
-import pickle
-from typing import Dict, List
+import threading
+from typing import (Any, Callable, Dict, Iterable, Iterator, List,
+                    NamedTuple, Set, Tuple)
+
+
+class Location(NamedTuple):
+    """Where a board, panel or card is in the table.
+
+    Attributes
+    ----------
+    item : Board | Panel | Card
+        The located board, panel or card.
+    board : Board
+        The board itself, or the board containing the panel or card.
+    panel : Panel
+        The panel itself, or the panel containing the card. None for boards.
+    position : int
+        The position of the item in its list of boards, panels or cards.
+    """
+    item: Board | Panel | Card
+    board: Board
+    panel: Panel | None
+    position: int
+
+
+def slot_values(item: Board | Panel | Card) -> Dict[str, Any]:
+    """Returns the attributes of a board, panel or card by the mangled name
+    of their slot, with lists copied, except its revision."""
+    values = {}
+    for cls in type(item).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if name == "__revision":
+                continue
+            name = f"_{cls.__name__}{name}"
+            value = getattr(item, name)
+            values[name] = list(value) if isinstance(value, list) else value
+    return values
+
+
+def synchronized(method: Callable) -> Callable:
+    """Runs a method of the table while holding the lock of the table, so the
+    background writer never serializes a half-applied change."""
+    @wraps(method)
+    def wrapper(self: "Table", *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class Table:
@@ -11,18 +68,105 @@ class Table:
     Singleton class for table. This class is used to store, retrieve, and
     manipulate data from the local table.
 
+    The boards, panels and cards are kept as a graph of objects that is built
+    once by `read()` and patched in place by every mutation method. Each
+    mutation increments `generation`, so callers can tell whether the objects
+    they hold are still current, and raises the revision of the boards,
+    panels and cards it changed, see `KanbaruObject`.
+
+    Every board, panel and card has a unique ID that is stored in the table
+    file. The table keeps an index from each ID to the location of the item,
+    see `locate()`, and the mutation methods find their targets through it.
+    The titles of boards, panels and cards are indexed too, so uniqueness
+    checks through `title_exists()` do not scan the table.
+
+    Changes made inside `transaction()` are written once, when the
+    transaction ends, and are undone if it fails.
+
+    Storage backends may load the panels of each board lazily. The panels and
+    cards of such a board are only built, indexed and logged the first time
+    its panels are accessed, and are written back untouched until then.
+    Backends may also load the descriptions of cards lazily, in which case
+    a description is only read when it is accessed, e.g. when a card is
+    opened, and the most recently read descriptions are cached.
+
+    Cards can be searched by the words of their titles and descriptions, see
+    `search()`. The search index is kept up to date by the mutation methods
+    and saved next to the table file by `flush()`, so it is only rebuilt if
+    the table file was changed without it.
+
+    Long descriptions can be compressed in the table file, see
+    `set_compression()`. They stay compressed in memory too, until they are
+    read.
+
+    By default `write()` writes to the table file before returning. After
+    `start_write_behind()`, it only marks the table as changed and a
+    background thread writes all the changes made in a burst at once, see
+    `writer.WriteBehind`. Call `flush()` to wait for pending changes to be
+    written, e.g. before the application exits.
+
+    Several processes may share the table file. Reads and writes hold an
+    advisory lock on a lock file next to the table file, see
+    `locking.FileLock`, and a write that finds the table file changed by
+    another process applies its changes on top of the other process's
+    instead of overwriting them. Call `reload()` to pick up the changes made
+    by other processes; it only reads the table file if it changed.
+
     Use `Table.get_instance()` to get the instance of the table class.
+    Scripts and services working on several table files create a table per
+    file with `Table(singleton=False)` instead, see `async_table.AsyncTable`.
+
+    Parameters
+    ----------
+    singleton : bool, optional
+        Whether the table is the instance returned by `get_instance()`, by
+        default True. Other tables are independent of it and of each other.
     """
 
     _instance: "Table" = None
+    DESCRIPTION_CACHE_SIZE: int = 64
 
-    def __init__(self: "Table") -> None:
-        assert Table._instance is None, \
-            "Table class is a singleton class!"
-        Table._instance = self
+    def __init__(self: "Table", singleton: bool = True) -> None:
+        if singleton:
+            assert Table._instance is None, \
+                "Table class is a singleton class!"
+            Table._instance = self
 
         self._tb_path: str = ""
-        self.__data: List[Dict] = [vars(Board())]
+        self._storage: Storage = None
+        self._file_lock: FileLock = None
+        self._lock: threading.RLock = threading.RLock()
+        self._io_lock: threading.RLock = threading.RLock()
+        self._writer: WriteBehind | None = None
+        self._listeners: List[Callable[[Change], None]] = []
+        self._sync = None
+        self._sync_server: str | None = None
+        self.__boards: List[Board] = [Board(panels_lists=[])]
+        self.__changes: List[Change] | None = []
+        self.__generation: int = 0
+        self.__index: Dict[str, Location] = {}
+        self.__titles: TitleIndex = TitleIndex()
+        self.__unloaded: Dict[str, Callable[[], List[Dict]]] = {}
+        self.__prefetched: Dict[str, List[Dict]] = {}
+        self.__descriptions: LRUCache = LRUCache(self.DESCRIPTION_CACHE_SIZE)
+        self.__search: SearchIndex | None = None
+        self.__search_stamp: tuple | None = None
+        self.__due: DueIndex | None = None
+        self.__stamp: tuple | None = None
+        self.__remote: Set[str] = set()
+        self.__compression: str | None = None
+        self.__compression_threshold: int = 0
+        self.__depth: int = 0
+        self.__writing: int = 0
+        self.__revision: int = 0
+        self.__deferred: bool = False
+        self.__saved: Dict[int, Tuple[Board | Panel | Card, Dict]] | None = \
+            None
+        self.__saved_boards: List[Board] | None = None
+        self.__pending: List[Change] = []
+        self._index_boards()
+        for board in self.__boards:
+            self._add_titles(board)
 
     @staticmethod
     def get_instance() -> "Table":
@@ -48,7 +192,8 @@ class Table:
         return self._tb_path
 
     def set_path(self: "Table", path: str) -> None:
-        """Sets the path of the table file.
+        """Sets the path of the table file. The storage backend is chosen
+        from the extension of the table file, see `storage.storage_for`.
 
         Parameters
         ----------
@@ -58,11 +203,52 @@ class Table:
         if not path:
             logging.warning("Table path is empty!")
             return None
+        if self._storage is not None:
+            self.flush()
+            self._close_storage()
         self._tb_path = path
+        self._storage = storage_for(path)
+        self._file_lock = FileLock(path + ".lock")
+        self.__stamp = None
+
+    def set_compression(self: "Table", method: str | None = "zlib",
+                        threshold: int = 1024) -> None:
+        """Sets how descriptions are compressed in the table file. Only
+        descriptions of at least `threshold` characters that shrink when
+        compressed are compressed, each on its own, and they are only
+        decompressed when read. Compressed descriptions are read whatever
+        the setting.
 
-    def create(self: "Table") -> None:
+        Parameters
+        ----------
+        method : str | None, optional
+            The compression method, "zlib" or "lzma", or None to write
+            descriptions uncompressed, by default "zlib".
+        threshold : int, optional
+            The minimum length of a compressed description, by default 1024.
+
+        Raises
+        ------
+        ValueError
+            If the method is not supported.
+        """
+        if method is not None:
+            compress_text("", method)
+        with self._lock:
+            self.__compression = method
+            self.__compression_threshold = threshold
+
+    def create(self: "Table", replace: bool = True) -> None:
         """Creates a new table file at the path specified in self.tb_path.
-        If the directory does not exist, it will be created.
+        If the directory does not exist, it will be created. The table file
+        is written while holding its lock exclusively.
+
+        Parameters
+        ----------
+        replace : bool, optional
+            Whether to replace an existing table file, by default True. If
+            False, a table file created by another process meanwhile is read
+            instead.
 
         Raises
         ------
@@ -72,13 +258,16 @@ class Table:
 
         Notes
         -----
-        The table file is a JSON file.
+        The format of the table file depends on the storage backend.
         """
         try:
             os.makedirs(os.path.dirname(self._tb_path), exist_ok=True)
-            with open(self._tb_path, "wb") as f:
-                pickle.dump(self.__data, f)
-            logging.info("Table file created")
+            with self._lock, self._io_lock, self._file_lock.exclusive():
+                if replace or not self._exists():
+                    self._storage.dump(self.data)
+                    self._file_lock.bump()
+                    logging.info("Table file created")
+                self.__changes = []
         except Exception as e:
             logging.warning(
                 "Failed to create/access table file! "
@@ -86,12 +275,28 @@ class Table:
             raise Exception(
                 "Failed to create/access table file! "
                 "The application will now exit.", sys.exit(1))
-        self.get_instance().read()
+        self.read()
+
+    def _exists(self: "Table") -> bool:
+        """Returns whether the table file can be loaded, e.g. once another
+        process created it. Called while holding the lock of the table
+        file."""
+        try:
+            self._storage.load()
+        except FileNotFoundError:
+            return False
+        return True
 
     def write(self: "Table") -> None:
         """Writes data from the table instance to the table file.
+        Only the changes made since the last write are committed to the
+        storage backend, unless the data was replaced as a whole or the
+        backend can only rewrite the whole table.
         If exceptions are raised, a new table file will be created.
 
+        In write-behind mode, the write is only scheduled and happens on the
+        background writer thread, see `start_write_behind()`.
+
         Raises
         ------
         FileNotFoundError
@@ -101,27 +306,280 @@ class Table:
             If the table file cannot be written to, an exception will be
             raised and a new table file will be created.
         """
+        if self.__depth:
+            return None
+        if self._writer is not None:
+            self._writer.mark_dirty()
+        else:
+            self._write_now()
+
+    def _write_now(self: "Table", background: bool = False) -> None:
+        """Writes the changes to the table file. The changes are taken from
+        the table while holding its lock, but the lock is released before the
+        table file is written, so the table can keep changing meanwhile.
+
+        If another process changed the table file since it was last read or
+        written, the changes are applied on top of the table file as it is
+        now, see `_rebase()`, and are dropped where they touch boards, panels
+        or cards the other process deleted. The boards, panels and cards of
+        the table are only brought up to date by the next `reload()`.
+
+        Parameters
+        ----------
+        background : bool, optional
+            Whether the background writer is writing, by default False. If
+            so, an error is raised as is, instead of exiting the application.
+        """
+        with self._lock:
+            changes, self.__changes = self.__changes, []
+            data = None
+            if changes is None or not self._storage.incremental:
+                data = [self._board_dict(board, self._storage.lazy,
+                                         compress=True)
+                        for board in self.__boards]
+            loaded = {board.id for board in self.__boards if board.loaded}
+            known = self.__stamp
+            self.__writing += 1
         try:
-            with open(self._tb_path, "wb") as f:
-                pickle.dump(self.__data, f)
-                logging.info("Table written to the table file")
+            with self._io_lock, self._file_lock.exclusive():
+                external = known is not None and self._stamp() != known
+                if external:
+                    logging.info("Table file changed by another process")
+                    data = self._rebase(data, changes, loaded)
+                if data is not None:
+                    self._storage.dump(data)
+                else:
+                    self._storage.commit(changes)
+                self._file_lock.bump()
+                stamp = self._stamp()
+            if not external:
+                with self._lock:
+                    self.__stamp = stamp
+            logging.info("Table written to the table file")
         except FileNotFoundError:
             logging.warning(
                 "Table file not found! "
                 "Creating new table...", exc_info=True)
+            with self._lock:
+                self.__changes = None
             self.create()
+        except TimeoutError:
+            logging.warning("Table file is locked, the changes will be "
+                            "written later", exc_info=True)
+            with self._lock:
+                if changes is None or self.__changes is None:
+                    self.__changes = None
+                else:
+                    self.__changes[:0] = changes
+            if self._writer is not None:
+                self._writer.mark_dirty()
         except Exception as e:
+            with self._lock:
+                self.__changes = None
+            if background:
+                # Reported by the background writer, which retries it
+                raise
             logging.warning(
                 "Failed to create/access table file! "
                 "The application will now exit.", exc_info=True)
             raise Exception(
                 "Failed to create/access table file! "
                 "The application will now exit.", sys.exit(1))
+        finally:
+            with self._lock:
+                self.__writing -= 1
+
+    def _rebase(self: "Table", data: List[Dict] | None,
+                changes: List[Change] | None,
+                loaded: Set[str]) -> List[Dict] | None:
+        """Prepares a write to a table file that another process changed.
+        Called while holding the lock of the table file.
+
+        Parameters
+        ----------
+        data : List[Dict] | None
+            The data of the table, or None if the changes are committed.
+        changes : List[Change] | None
+            The changes to write, or None if the whole table is rewritten.
+        loaded : Set[str]
+            The IDs of the boards whose panels have been loaded.
+
+        Returns
+        -------
+        data : List[Dict] | None
+            The data to dump, or None if the changes are to be committed.
+        """
+        if changes is None:
+            if self._storage.incremental:
+                self._storage.refresh()
+                return data
+            # Unloaded boards were not changed, so they keep the panels of
+            # the other process
+            loaders = {board["_Board__id"]: board["_Board__panels_lists"]
+                       for board in self._storage.load()}
+            for board in data:
+                if callable(board["_Board__panels_lists"]):
+                    board["_Board__panels_lists"] = loaders.get(
+                        board["_Board__id"], board["_Board__panels_lists"])
+            logging.warning("Overwriting the changes of another process")
+            return data
+        if self._storage.incremental:
+            self._storage.refresh()
+            return None
+        data = self._storage.load()
+        for board in data:
+            panels = board["_Board__panels_lists"]
+            if board["_Board__id"] in loaded and callable(panels):
+                board["_Board__panels_lists"] = panels()
+        replay_changes(data, changes)
+        return data
+
+    def start_write_behind(
+        self: "Table", delay: float = 0.5, max_delay: float = 5.0,
+        done: Callable[[BaseException | None], None] = None
+    ) -> None:
+        """Starts writing the table file on a background thread. Writes are
+        delayed until no change has been made for `delay` seconds, but never
+        by more than `max_delay` seconds.
+
+        Parameters
+        ----------
+        delay : float, optional
+            The number of seconds without changes to wait before writing, by
+            default 0.5.
+        max_delay : float, optional
+            The maximum number of seconds a change stays unwritten, by
+            default 5.
+        done : Callable[[BaseException | None], None], optional
+            The function called on the background thread after every write
+            with the exception that failed it, or None if it succeeded, by
+            default None.
+        """
+        if self._writer is not None:
+            return None
+        self._writer = WriteBehind(partial(self._write_now, True), delay,
+                                   max_delay, done)
+        logging.info("Write-behind started")
+
+    def stop_write_behind(self: "Table") -> None:
+        """Stops the background writer, writes the pending changes once,
+        including the ones the writer failed to write, and saves the search
+        index. Afterwards, `write()` writes to the table file before
+        returning."""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+            logging.info("Write-behind stopped")
+            with self._lock:
+                pending = self.__changes != []
+            if pending:
+                self._write_now()
+        self._save_search()
+        if self._sync is not None:
+            self._sync.save()
+
+    def close(self: "Table") -> None:
+        """Writes the pending changes, stops the background writer and
+        closes the table file. The table must not be used afterwards, until
+        `set_path()` is called again."""
+        if self._storage is None:
+            return None
+        self.stop_write_behind()
+        with self._lock:
+            pending = self.__changes != []
+        if pending:
+            self._write_now()
+        self._close_storage()
+        self._storage = None
+
+    def _close_storage(self: "Table") -> None:
+        """Closes the sync engine, the storage backend and the lock of the
+        table file."""
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+        with self._io_lock:
+            self._storage.close()
+            self._file_lock.close()
+
+    def flush(self: "Table") -> None:
+        """Waits until the pending changes are written to the table file, if
+        the table is in write-behind mode, and saves the search index if the
+        table file changed since it was last saved. The state of the sync
+        engine is saved too, if the table has been synchronized."""
+        if self._writer is not None:
+            self._writer.flush()
+        self._save_search()
+        if self._sync is not None:
+            self._sync.save()
+
+    @contextmanager
+    def transaction(self: "Table") -> Iterator["Table"]:
+        """Groups several changes into one. Inside the transaction, writes
+        are skipped and the generation of the table does not change. When
+        the transaction ends, the table is written once and its generation
+        is incremented once if anything changed. If an exception escapes the
+        transaction, the boards, panels and cards it changed are restored in
+        place to their state before the transaction and nothing is written.
+        Only the items a mutation is about to change are remembered, see
+        `_save()`, so starting a transaction does not copy the table.
+
+        Transactions can be nested, in which case only the outermost one
+        writes or rolls back. The lock of the table is held for the whole
+        transaction, so the background writer never sees part of it. The
+        listeners of the table are only told about the changes once the
+        outermost transaction succeeds, see `add_listener()`.
+
+        Yields
+        ------
+        table : Table
+            The table instance.
+
+        Examples
+        --------
+        >>> with Table.get_instance().transaction() as table:
+        ...     table.delete_panel(panel)
+        ...     table.update_panel_order(board, panels)
+        """
+        with self._lock:
+            if self.__depth:
+                self.__depth += 1
+                try:
+                    yield self
+                finally:
+                    self.__depth -= 1
+                return None
+            changes = self.__changes
+            recorded = None if changes is None else len(changes)
+            self.__saved, self.__saved_boards = {}, None
+            self.__pending = []
+            self.__depth, self.__deferred = 1, False
+            try:
+                yield self
+            except BaseException:
+                self.__depth = 0
+                self._restore()
+                self.__changes = changes
+                if changes is not None:
+                    del changes[recorded:]
+                logging.warning("Transaction rolled back", exc_info=True)
+                raise
+            finally:
+                self.__depth = 0
+                self.__saved, self.__saved_boards = None, None
+                pending, self.__pending = self.__pending, []
+            for change in pending:
+                for listener in self._listeners:
+                    listener(change)
+            if not self.__deferred:
+                return None
+            self.__generation += 1
+        self.write()
 
     def read(self: "Table") -> None:
-        """Reads data from the table file and stores it in the table
-        instance. If exceptions are raised, a new table file will be
-        created.
+        """Reads data from the table file and builds the boards, panels and
+        cards of the table instance from it. If exceptions are raised, a new
+        table file will be created.
 
         Raises
         ------
@@ -134,32 +592,255 @@ class Table:
         """
         logging.info("Reading table file...")
         try:
-            with open(self._tb_path, "rb") as f:
-                self.__data = pickle.load(f)
+            with self._io_lock:
+                if self._storage.outdated():
+                    with self._file_lock.exclusive():
+                        # Unless another process migrated it meanwhile
+                        if self._storage.outdated():
+                            self._storage.migrate()
+                            self._file_lock.bump()
+                with self._file_lock.shared():
+                    data = self._storage.load()
+                    stamp = self._stamp()
+            self.boards = self._build(data)
+            self.__stamp = stamp
+            if not data or "_Board__id" in data[0]:
+                self.__changes = []
+            else:
+                self._assign_ids()
+            self._load_search()
+        except TimeoutError:
+            logging.warning("Table file is locked by another process!")
+            raise
         except FileNotFoundError:
             logging.warning(
                 "Table file not found! "
                 "Creating new table...", exc_info=True)
-            self.create()
+            self.create(replace=False)
         except Exception as e:
             logging.warning(
                 "Failed to read data from table! "
                 "Creating new table...", exc_info=True)
             self.create()
-        logging.info(
-            f"Loaded {len(self.boards)} "
-            f"board{'s' if len(self.boards) > 1 else ''}")
-        for board in self.boards:
-            logging.info(
-                f'+--"{board.title}" [{len(board.panels)} '
-                f'panel{"s" if len(board.panels) > 1 else ""}]')
+        self._log_boards()
+        logging.info("Table read from the table file")
+
+    def _assign_ids(self: "Table") -> None:
+        """Writes the IDs given by `_build()` to a table file written before
+        boards, panels and cards had IDs. The table file is read again while
+        holding its lock exclusively, so the IDs another process gave them
+        meanwhile are kept."""
+        with self._lock, self._io_lock, self._file_lock.exclusive():
+            data = self._storage.load()
+            if data and "_Board__id" in data[0]:
+                self.boards = self._build(data)
+                self.__stamp = self._stamp()
+                self.__changes = []
+                return None
+            logging.info("Assigning IDs to boards, panels and cards...")
+            self._write_now()
+
+    def _log_boards(self: "Table") -> None:
+        """Logs the number of boards, panels and cards that have been
+        loaded, and the tree of their titles if debug logging is enabled."""
+        loaded = [board for board in self.__boards if board.loaded]
+        panels = sum(len(board.panels) for board in loaded)
+        cards = sum(len(panel.cards) for board in loaded
+                    for panel in board.panels)
+        logging.info("Loaded %d board%s (%d not loaded yet), %d panel%s and "
+                     "%d card%s", len(self.__boards),
+                     "s" if len(self.__boards) != 1 else "",
+                     len(self.__boards) - len(loaded), panels,
+                     "s" if panels != 1 else "", cards,
+                     "s" if cards != 1 else "")
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return None
+        for board in self.__boards:
+            if not board.loaded:
+                logging.debug('+--"%s" [not loaded]', board.title)
+                continue
+            logging.debug('+--"%s" [%d panel%s]', board.title,
+                          len(board.panels),
+                          "s" if len(board.panels) > 1 else "")
             for panel in board.panels:
-                logging.info(
-                    f'|   +--"{panel.title}" [{len(panel.cards)} '
-                    f'card{"s" if len(panel.cards) > 1 else ""}]')
+                logging.debug('|   +--"%s" [%d card%s]', panel.title,
+                              len(panel.cards),
+                              "s" if len(panel.cards) > 1 else "")
                 for card in panel.cards:
-                    logging.info(f'|   |   +--"{card.title}"')
-        logging.info("Table read from the table file")
+                    logging.debug('|   |   +--"%s"', card.title)
+
+    def reload(self: "Table") -> Set[str]:
+        """Brings the boards, panels and cards up to date with changes made
+        to the table file by other processes. The table file is only read if
+        it changed since it was last read or written, and only the boards
+        that changed are rebuilt; the other boards, and the panels of boards
+        that have not been loaded, are left as they are.
+
+        Nothing is reloaded while changes are waiting to be written, or while
+        the table file is being written or locked by another process; the
+        next call tries again. The table file is read without holding the
+        lock of the table, so `reload()` may be called from a worker thread
+        while the table is used.
+
+        Returns
+        -------
+        changed : Set[str]
+            The IDs of the boards that were added, removed or changed, by
+            other processes or since the last call by `sync()`, see
+            `notify_changed()`.
+        """
+        with self._lock:
+            changed, self.__remote = self.__remote, set()
+        return changed | self._reload_file()
+
+    @synchronized
+    def notify_changed(self: "Table", board_ids: Iterable[str]) -> None:
+        """Reports boards that were changed on behalf of someone else than
+        the user, e.g. by `sync()`, to the next `reload()`.
+
+        Parameters
+        ----------
+        board_ids : Iterable[str]
+            The IDs of the boards.
+        """
+        self.__remote.update(board_ids)
+
+    def add_listener(self: "Table",
+                     listener: Callable[[Change], None]) -> None:
+        """Calls a function with every change made to the table, while
+        holding the lock of the table. The change is the one committed to
+        the storage backend, see `storage.Change`. Changes made inside a
+        transaction are passed when it succeeds, and never if it is rolled
+        back.
+
+        Parameters
+        ----------
+        listener : Callable[[Change], None]
+            The function to call.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self: "Table",
+                        listener: Callable[[Change], None]) -> None:
+        """Stops calling a function added by `add_listener()`."""
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def sync(self: "Table", account: str, server: str = None,
+             push: bool = True, pull: bool = True) -> Future:
+        """Synchronizes the table with the records of an account on a sync
+        server, on a background thread, see `sync.SyncEngine`. Only the
+        boards, panels and cards changed since the last sync are pushed or
+        pulled. Boards changed by the sync are reported by `reload()`.
+
+        Parameters
+        ----------
+        account : str
+            The account to synchronize with.
+        server : str, optional
+            The URL of the sync server or the path of its JSON file, by
+            default None (see `sync.default_server()`).
+        push : bool, optional
+            Whether to push the local changes, by default True.
+        pull : bool, optional
+            Whether to pull the remote changes, by default True.
+
+        Returns
+        -------
+        future : Future
+            Resolves to the number of records pushed and pulled once the
+            sync is over.
+        """
+        from sync import SyncEngine, default_server, transport_for
+        server = server or default_server(self)
+        if self._sync is None or self._sync.account != account or \
+                self._sync_server != server:
+            if self._sync is not None:
+                self._sync.close()
+            self._sync = SyncEngine(self, account, transport_for(server))
+            self._sync_server = server
+        return self._sync.start(push, pull)
+
+    def push_to_firebase(self: "Table", username: str) -> Future:
+        """Pushes the local changes to the account of a user, see
+        `sync()`."""
+        return self.sync(username, pull=False)
+
+    def pull_from_firebase(self: "Table", username: str) -> Future:
+        """Pulls the remote changes of the account of a user, see
+        `sync()`."""
+        return self.sync(username, push=False)
+
+    def _reload_file(self: "Table") -> Set[str]:
+        """Merges the table file into the table if it changed, see
+        `reload()`. The table file is read while holding the lock of the
+        table file only, and merged while holding the lock of the table."""
+        if self._storage is None or self.__changes != [] or \
+                self.__writing or not self._io_lock.acquire(blocking=False):
+            return set()
+        known = self.__stamp
+        try:
+            with self._file_lock.shared(timeout=0):
+                stamp = self._stamp()
+                if stamp == known:
+                    return set()
+                data = self._storage.load()
+                for board in data:
+                    panels = board["_Board__panels_lists"]
+                    location = self.__index.get(board["_Board__id"])
+                    if location is not None and location.item.loaded \
+                            and callable(panels):
+                        board["_Board__panels_lists"] = panels()
+        except TimeoutError:
+            return set()
+        except Exception:
+            logging.warning("Failed to reload the table file",
+                            exc_info=True)
+            return set()
+        finally:
+            self._io_lock.release()
+        with self._lock:
+            # Changes made, written or boards loaded meanwhile are not in the
+            # data, so the table file is read again by the next call
+            loaded = {board.id for board in self.__boards if board.loaded}
+            if self.__changes != [] or self.__writing or \
+                    self.__stamp != known or any(
+                        callable(board["_Board__panels_lists"])
+                        and board["_Board__id"] in loaded for board in data):
+                return set()
+            return self._merge(data, stamp)
+
+    def prefetch(self: "Table", item: Board | Card) -> None:
+        """Reads the panels of a board or the description of a card from the
+        table file ahead of their first access, without holding the lock of
+        the table, e.g. on a worker thread so the GUI thread does not wait
+        for the table file. Boards that have been loaded and descriptions
+        held by their card are left as they are.
+
+        Parameters
+        ----------
+        item : Board | Card
+            The board or card to prefetch.
+
+        Raises
+        ------
+        TimeoutError
+            If another process kept the table file locked.
+        """
+        if isinstance(item, Card):
+            if not item.description_loaded:
+                self._describe(item.id)
+            return None
+        load = self.__unloaded.get(item.id)
+        if load is None or item.id in self.__prefetched:
+            return None
+        with self._io_lock, self._file_lock.shared():
+            data = self._loader(item.id, load)()
+        # Dropped if the board was loaded, reloaded or deleted meanwhile
+        with self._lock:
+            if self.__unloaded.get(item.id) is load:
+                self.__prefetched[item.id] = data
 
     @property
     def boards(self: "Table") -> List[Board]:
@@ -167,6 +848,9 @@ class Table:
         panels containing their attributes and a list of cards containing their
         attributes.
 
+        The returned objects are the ones held by the table, so they must only
+        be modified through the methods of the table.
+
         Returns
         -------
         boards : List[Board]
@@ -174,51 +858,548 @@ class Table:
             containing their attributes and a list of cards containing their
             attributes.
         """
-        boards = []
-        board_lists = self.__data
-
-        for board_item in board_lists:
-            panel_data = board_item.get('_Board__panels_lists', [])
-            panels = []
-
-            for panel_item in panel_data:
-                card_data = panel_item.get('_Board__panels', [])
-                cards = []
-
-                for card_item in card_data:
-                    card = Card(
-                        title=card_item.get('_Card__title', ''),
-                        description=card_item.get('_Card__description', ''),
-                        date=card_item.get('_Card__date', ''),
-                        time=card_item.get('_Card__time', '')
-                    )
-                    cards.append(card)
-
-                panel_obj = Panel(
-                    title=panel_item.get('_Panel__title', ''),
-                    card_lists=cards
-                )
-                panels.append(panel_obj)
-
-            board = Board(
-                title=board_item.get('_Board__title', ''),
-                color=board_item.get('_Board__color', ''),
-                panels_lists=panels
-            )
-            boards.append(board)
-        return boards
+        return self.__boards
 
     @boards.setter
+    @synchronized
     def boards(self: "Table", boards: List[Board]) -> None:
-        """Sets the list of boards.
+        """Sets the list of boards. The whole table will be rewritten by the
+        next write.
 
         Parameters
         ----------
         boards : List[Board]
             The list of boards.
         """
-        self.__data["_Board__title"] = boards
+        self._save()
+        self.__boards = boards
+        self.__changes = None
+        if self.__depth:
+            self.__deferred = True
+        self.__generation += 1
+        self.__index = {}
+        self.__titles.clear()
+        self.__search = None
+        self.__due = None
+        self._index_boards()
+        for board in self.__boards:
+            self._add_titles(board)
+
+    @property
+    def generation(self: "Table") -> int:
+        """Returns the generation of the table, which is incremented every
+        time the boards, panels or cards of the table change.
+
+        Returns
+        -------
+        generation : int
+            The generation of the table.
+        """
+        return self.__generation
+
+    def locate(self: "Table", item_id: str) -> Location | None:
+        """Returns the location of a board, panel or card.
+
+        Parameters
+        ----------
+        item_id : str
+            The ID of the board, panel or card.
+
+        Returns
+        -------
+        location : Location | None
+            The location of the item, or None if it is not in the table.
+        """
+        location = self.__index.get(item_id)
+        if location is None and self.__unloaded:
+            self._load_all()
+            location = self.__index.get(item_id)
+        return location
+
+    def find(self: "Table", item_id: str) -> Board | Panel | Card | None:
+        """Returns the board, panel or card with the given ID.
+
+        Parameters
+        ----------
+        item_id : str
+            The ID of the board, panel or card.
+
+        Returns
+        -------
+        item : Board | Panel | Card | None
+            The item, or None if it is not in the table.
+        """
+        location = self.locate(item_id)
+        return location.item if location else None
+
+    def iter_panels(self: "Table", board: Board) -> Iterator[Panel]:
+        """Yields the panels of a board without keeping them loaded. Boards
+        that have not been loaded yet are read from the table file and their
+        panels are dropped once iterated, so walking every board holds one
+        board in memory at a time.
+
+        Parameters
+        ----------
+        board : Board
+            The board.
+
+        Yields
+        ------
+        panel : Panel
+            Each panel of the board, with its cards.
+        """
+        with self._lock:
+            load = self.__unloaded.get(board.id)
+            if load is None:
+                panels = list(board.panels)
+            else:
+                with self._io_lock, self._file_lock.shared():
+                    load = self._loader(board.id, load)
+                    panels = self._build_panels(load(), self._describe)
+        yield from panels
+
+    @synchronized
+    def search(self: "Table", query: str,
+               limit: int = 50) -> List[Location]:
+        """Returns the cards whose title or description contains all the
+        words of a query, in the order of the table. Each word of the query
+        matches the words starting with it, ignoring case. Boards holding
+        matching cards are loaded if needed.
+
+        The search index is built the first time if it could not be loaded
+        from the search index file.
+
+        Parameters
+        ----------
+        query : str
+            The words to look for.
+        limit : int, optional
+            The maximum number of cards returned, by default 50.
+
+        Returns
+        -------
+        locations : List[Location]
+            The locations of the first matching cards.
+        """
+        index = self._search_index()
+        matches = set(index.search(query))
+        if self.__unloaded:
+            for board_id in self.__unloaded.keys() & {
+                    index.owner(card_id)[0] for card_id in matches}:
+                self.__index[board_id].item.panels
+        if len(matches) <= 10 * limit:
+            locations = [self.__index[card_id] for card_id in matches
+                         if card_id in self.__index]
+            return heapq.nsmallest(limit, locations, key=lambda location: (
+                self.__index[location.board.id].position,
+                self.__index[location.panel.id].position,
+                location.position))
+        locations = []
+        for board in self.__boards:
+            for panel in board.panels if board.loaded else []:
+                for card in panel.cards:
+                    if card.id in matches:
+                        locations.append(self.__index[card.id])
+                        if len(locations) == limit:
+                            return locations
+        return locations
+
+    @synchronized
+    def due_between(self: "Table", start: int | None = None,
+                    end: int | None = None,
+                    limit: int | None = None) -> List[Location]:
+        """Returns the cards due from `start` included to `end` excluded,
+        soonest first. Due dates and times are counted in minutes since the
+        start of the day ordinals, see `Card.due` and `to_due()`.
+
+        The due-date index is built from the whole table the first time,
+        loading every board, and kept up to date afterwards.
+
+        Parameters
+        ----------
+        start : int | None, optional
+            The earliest due date and time, by default None (no bound).
+        end : int | None, optional
+            The due date and time the cards are due before, by default None
+            (no bound).
+        limit : int | None, optional
+            The maximum number of cards returned, by default None (all).
+
+        Returns
+        -------
+        locations : List[Location]
+            The locations of the cards.
+        """
+        return [self.__index[card_id] for card_id
+                in self._due_index().between(start, end, limit)]
+
+    def upcoming(self: "Table", days: int = 7, now: datetime = None,
+                 limit: int | None = None) -> List[Location]:
+        """Returns the cards due from now to the same time `days` days
+        later, soonest first.
+
+        Parameters
+        ----------
+        days : int, optional
+            The number of days to look ahead, by default 7.
+        now : datetime, optional
+            The current date and time, by default `datetime.now()`.
+        limit : int | None, optional
+            The maximum number of cards returned, by default None (all).
+
+        Returns
+        -------
+        locations : List[Location]
+            The locations of the cards.
+        """
+        start = to_due(now or datetime.now())
+        return self.due_between(start, start + days * MINUTES_PER_DAY, limit)
+
+    def overdue(self: "Table", now: datetime = None,
+                limit: int | None = None) -> List[Location]:
+        """Returns the cards due before now, the longest overdue first.
 
+        Parameters
+        ----------
+        now : datetime, optional
+            The current date and time, by default `datetime.now()`.
+        limit : int | None, optional
+            The maximum number of cards returned, by default None (all).
+
+        Returns
+        -------
+        locations : List[Location]
+            The locations of the cards.
+        """
+        return self.due_between(None, to_due(now or datetime.now()), limit)
+
+    def query(self: "Table", kind: str = "card", board: Board | str = None,
+              panel: Panel | str = None, title: str = None,
+              title_contains: str = None, due_after: datetime | int = None,
+              due_before: datetime | int = None) -> Iterator[Location]:
+        """Yields the boards, panels or cards matching all the given
+        conditions, one at a time.
+
+        The cheapest index is chosen for each query: the locator narrows the
+        query to a board or panel, the title index answers at once when no
+        item has the exact title, and the due-date index is walked instead
+        of the cards when the due range holds fewer cards than the scope.
+        Items are yielded in the order of the table, or soonest due first
+        when the due-date index is used. The table should not be changed
+        while iterating.
+
+        Parameters
+        ----------
+        kind : str, optional
+            The kind of item: "board", "panel" or "card", by default "card".
+        board : Board | str, optional
+            The board, or its ID, the query is restricted to, by default
+            None.
+        panel : Panel | str, optional
+            The panel, or its ID, the query is restricted to along with its
+            board, by default None.
+        title : str, optional
+            The exact title of the items, by default None.
+        title_contains : str, optional
+            Text the titles contain, ignoring case, by default None.
+        due_after : datetime | int, optional
+            The earliest due date and time of the cards, included, by
+            default None. Integers are minutes, see `Card.due`.
+        due_before : datetime | int, optional
+            The due date and time the cards are due before, by default None.
+            Integers are minutes, see `Card.due`.
+
+        Yields
+        ------
+        location : Location
+            The location of each matching item.
+
+        Raises
+        ------
+        ValueError
+            If the kind is unknown, or due dates are given for boards or
+            panels.
+
+        Examples
+        --------
+        >>> table = Table.get_instance()
+        >>> next(table.query("board", title="Backlog"), None)
+        >>> for location in table.query(board=board, due_before=now):
+        ...     print(location.item.title)
+        """
+        if kind not in ("board", "panel", "card"):
+            raise ValueError(f'Unknown kind "{kind}"')
+        start, end = (due if due is None or isinstance(due, int)
+                      else to_due(due) for due in (due_after, due_before))
+        dated = start is not None or end is not None
+        if dated and kind != "card":
+            raise ValueError("Only cards have due dates")
+        folded = None if title_contains is None else title_contains.casefold()
+
+        with self._lock:
+            scope = None
+            for item in (panel, board):
+                if item is None:
+                    continue
+                location = self.locate(getattr(item, "id", item))
+                if location is None or \
+                        scope is not None and location.item is not scope.board:
+                    return None
+                scope = scope or location
+            in_panel = scope is not None and scope.panel is not None
+            if title is not None:
+                parent = {"board": None,
+                          "panel": scope.board.id if scope else None,
+                          "card": scope.panel.id if in_panel else None}[kind]
+                if not self.title_exists(kind, title, parent):
+                    return None
+
+            boards = [scope.board] if scope is not None else self.__boards
+            if kind == "board":
+                items = iter(boards)
+            elif in_panel:
+                panels = [scope.panel]
+            else:
+                panels = (panel for board in boards for panel in board.panels)
+            if kind == "panel":
+                items = iter(panels)
+            elif kind == "card":
+                panels = list(panels)
+                if dated and (scope is None or self.__due is not None and (
+                        self.__due.count(start, end) <
+                        sum(len(panel.cards) for panel in panels))):
+                    items = self._due_cards(start, end, scope)
+                else:
+                    items = (card for panel in panels for card in panel.cards)
+
+        for item in items:
+            if title is not None and item.title != title or \
+                    folded is not None and folded not in item.title.casefold():
+                continue
+            if dated and (item.due is None or
+                          start is not None and item.due < start or
+                          end is not None and item.due >= end):
+                continue
+            location = self.__index.get(item.id)
+            if location is not None:
+                yield location
+
+    def title_exists(self: "Table", kind: str, title: str,
+                     scope: str = None) -> bool:
+        """Returns whether a board, panel or card already has the given title.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of item: "board", "panel" or "card".
+        title : str
+            The title to look for.
+        scope : str, optional
+            The ID of the board to look for panels in, or of the panel to look
+            for cards in, by default None (the whole table).
+
+        Returns
+        -------
+        bool
+            True if the title is used, False otherwise.
+        """
+        if kind != "board" and self.__unloaded:
+            if scope in self.__unloaded:
+                self.__index[scope].item.panels
+            elif scope is None or scope not in self.__index:
+                self._load_all()
+        return self.__titles.exists(kind, title, scope)
+
+    @synchronized
+    def add_board(self: "Table", title: str, id: str = None) -> Board:
+        """Add a new empty board at the end of the table.
+
+        Parameters
+        ----------
+        title : str
+            The title of the new board.
+        id : str, optional
+            The ID of the new board, by default None (a new ID).
+
+        Returns
+        -------
+        board : Board
+            The new board.
+        """
+        board = Board(title=title, panels_lists=[], id=id)
+        self._save()
+        self.__boards.append(board)
+        self._index_boards(len(self.__boards) - 1)
+        self._add_titles(board)
+        self._touch(board)
+        self._record("insert_board", board.id,
+                     values={"index": len(self.__boards) - 1,
+                             "board": self._board_dict(board,
+                                                       compress=True)})
+        Table.write(self)
+        logging.info('Board "%s" added', title)
+        return board
+
+    @synchronized
+    def add_panel(self: "Table", board: Board, title: str,
+                  id: str = None) -> Panel | None:
+        """Add a new empty panel at the end of a board.
+
+        Parameters
+        ----------
+        board : Board
+            The board to add the panel to.
+        title : str
+            The title of the new panel.
+        id : str, optional
+            The ID of the new panel, by default None (a new ID).
+
+        Returns
+        -------
+        panel : Panel | None
+            The new panel, or None if the board is not in the table.
+        """
+        location = self.locate(board.id)
+        if location is None:
+            return None
+        board = location.item
+        panel = Panel(title=title, card_lists=[], id=id)
+        self._save(board)
+        board.panels.append(panel)
+        self._index_panels(board, len(board.panels) - 1)
+        self._add_titles(panel, board.id)
+        self._touch(panel, board)
+        self._record("insert_panel", panel.id,
+                     values={"board": board.id,
+                             "index": len(board.panels) - 1,
+                             "panel": self._panel_dict(panel,
+                                                       compress=True)})
+        Table.write(self)
+        logging.info('Panel "%s" added to board %s', title, board.title)
+        return panel
+
+    @synchronized
+    def add_card(self: "Table", panel: Panel, card: Card) -> Card | None:
+        """Add a new card at the end of a panel.
+
+        Parameters
+        ----------
+        panel : Panel
+            The panel to add the card to.
+        card : Card
+            The card to be added.
+
+        Returns
+        -------
+        card : Card | None
+            The added card, or None if the panel is not in the table.
+        """
+        location = self.locate(panel.id)
+        if location is None:
+            return None
+        panel = location.item
+        self._save(panel)
+        panel.cards.append(card)
+        self._index_cards(location.board, panel, len(panel.cards) - 1)
+        self._add_titles(card, panel.id)
+        self._index_text(card, location.board, panel)
+        self._index_due(card)
+        self._touch(card, panel, location.board)
+        self._record("insert_card", card.id,
+                     values={"panel": panel.id,
+                             "index": len(panel.cards) - 1,
+                             "card": self._card_dict(card, compress=True)})
+        Table.write(self)
+        logging.info('Card "%s" added to panel "%s"', card.title,
+                     panel.title)
+        return card
+
+    @synchronized
+    def add_cards(self: "Table", panel: Panel,
+                  cards: List[Card]) -> List[Card]:
+        """Add new cards at the end of a panel at once, indexing them in bulk
+        and writing the table once.
+
+        Parameters
+        ----------
+        panel : Panel
+            The panel to add the cards to.
+        cards : List[Card]
+            The cards to be added.
+
+        Returns
+        -------
+        cards : List[Card]
+            The added cards, or an empty list if the panel is not in the
+            table.
+        """
+        location = self.locate(panel.id)
+        if location is None or not cards:
+            return []
+        panel, start = location.item, len(location.item.cards)
+        self._save(panel)
+        panel.cards.extend(cards)
+        self._index_cards(location.board, panel, start)
+        self.__titles.add_many("card", (card.title for card in cards),
+                               panel.id)
+        if self.__search is not None:
+            self.__search.add_many(
+                (card.id, location.board.id, panel.id,
+                 f"{card.title} {card.description}") for card in cards)
+        if self.__due is not None:
+            self.__due.add_many((card.id, card.due) for card in cards)
+        self._touch(*cards, panel, location.board)
+        for index, card in enumerate(cards, start):
+            self._record("insert_card", card.id,
+                         values={"panel": panel.id, "index": index,
+                                 "card": self._card_dict(card,
+                                                         compress=True)})
+        Table.write(self)
+        logging.info('%d cards added to panel "%s"', len(cards), panel.title)
+        return cards
+
+    @synchronized
+    def move_card(self: "Table", card: Card, destination: Panel,
+                  index: int = None) -> None:
+        """Move a card to a position in a panel of the same board. The card
+        is removed from its panel before it is inserted, so the index is a
+        position in the destination panel without the card.
+
+        Parameters
+        ----------
+        card : Card
+            The card to be moved.
+        destination : Panel
+            The panel the card is moved to.
+        index : int, optional
+            The position of the card in the destination panel, by default
+            None (adds at the end).
+        """
+        location = self.locate(card.id)
+        dest_location = self.locate(destination.id)
+        if location is None or dest_location is None:
+            return None
+        source, destination = location.panel, dest_location.item
+        self._save(source, destination)
+        del source.cards[location.position]
+        self._index_cards(location.board, source, location.position)
+        if index is None or index >= len(destination.cards):
+            index = len(destination.cards)
+        destination.cards.insert(index, location.item)
+        self._index_cards(dest_location.board, destination, index)
+        self.__titles.remove("card", location.item.title, source.id)
+        self.__titles.add("card", location.item.title, destination.id)
+        if self.__search is not None:
+            self.__search.move(card.id, dest_location.board.id,
+                               destination.id)
+        self._touch(location.item, source, destination, location.board)
+        self._record("move_card", card.id,
+                     values={"panel": destination.id, "index": index})
+        Table.write(self)
+        logging.info('Card "%s" moved to panel "%s" at index %d',
+                     location.item.title, destination.title, index)
+
+    @synchronized
     def update_card(self: "Table", card_old: Card, card_new: Card) -> None:
         """Update card info in table.
 
@@ -229,26 +1410,31 @@ class Table:
         card_new : Card
             The new card to be updated to.
         """
-        for index_b, board in enumerate(self.boards):
-            for index_p, panel in enumerate(board.panels):
-                for index_c, card in enumerate(panel.cards):
-                    if card == card_old:
-                        card_dict = self.data[index_b].get(
-                            "_Board__panels_lists")[index_p].get(
-                                "_Board__panels")[index_c]
-                        card_dict["_Card__title"] = card_new.title
-                        card_dict["_Card__description"] = card_new.description
-                        card_dict["_Card__date"] = card_new.date
-                        card_dict["_Card__time"] = card_new.time
-                        Table.write(self)
-                        logging.info("Card updated:")
-                        logging.info(
-                            f"{card_old} -> title='{card_new.title}', "
-                            f"date='{card_new.date}', "
-                            f"time='{card_new.time}', "
-                            f"description='{card_new.description}'")
-                        return None
+        location = self.locate(card_old.id)
+        if location is None:
+            return None
+        card = location.item
+        self._save(card)
+        old_title = card.title
+        card.title = card_new.title
+        card.description = card_new.description
+        self.__descriptions.discard(card.id)
+        card.date = card_new.date
+        card.time = card_new.time
+        self.__titles.remove("card", old_title, location.panel.id)
+        self.__titles.add("card", card.title, location.panel.id)
+        self._index_text(card, location.board, location.panel)
+        self._index_due(card)
+        self._touch(card, location.panel, location.board)
+        self._record("update_card", card.id,
+                     values=self._card_dict(card, compress=True))
+        Table.write(self)
+        logging.info("Card updated:")
+        logging.info("%s -> title='%s', date='%s', time='%s', "
+                     "description='%s'", card_old, card_new.title,
+                     card_new.date, card_new.time, card_new.description)
 
+    @synchronized
     def update_panel(self: "Table", panel_old: Panel,
                      panel_new: Panel) -> None:
         """Update panel info in table
@@ -260,23 +1446,28 @@ class Table:
         panel_new : Panel
             The new panel to be updated to.
         """
-        for index_b, board in enumerate(self.boards):
-            for index_p, panel in enumerate(board.panels):
-                if panel == panel_old:
-                    panel_dict = self.data[index_b].get(
-                        "_Board__panels_lists")[index_p]
-                    panel_dict["_Panel__title"] = panel_new.title
-                    Table.write(self)
-                    logging.info("Panel updated:")
-                    cards = [
-                        card.title for card in panel_new.cards if hasattr(
-                            panel_new, 'cards')
-                    ] if hasattr(panel_new, 'cards') else []
-                    logging.info(
-                        f"{panel_old} -> title='{panel_new.title}', "
-                        f"cards={cards}")
-                    return None
+        location = self.locate(panel_old.id)
+        if location is None:
+            return None
+        panel = location.item
+        self._save(panel)
+        old_panel, old_title = str(panel), panel.title
+        panel.title = panel_new.title
+        self.__titles.remove("panel", old_title, location.board.id)
+        self.__titles.add("panel", panel.title, location.board.id)
+        self._touch(panel, location.board)
+        self._record("update_panel", panel.id,
+                     values={"_Panel__title": panel.title})
+        Table.write(self)
+        logging.info("Panel updated:")
+        cards = [
+            card.title for card in panel_new.cards if hasattr(
+                panel_new, 'cards')
+        ] if hasattr(panel_new, 'cards') else []
+        logging.info("%s -> title='%s', cards=%s", old_panel, panel_new.title,
+                     cards)
 
+    @synchronized
     def update_board(self: "Table", board_old: Board,
                      board_new: Board) -> None:
         """Update board info in table.
@@ -288,21 +1479,31 @@ class Table:
         board_new : Board
             The new board to be updated to.
         """
-        for index_b, board in enumerate(self.boards):
-            if board == board_old:
-                board_dict = self.data[index_b]
-                board_dict["_Board__title"] = board_new.title
-                board_dict["_Board__color"] = Color(board_new.color).name
-                logging.info("Board updated:")
-                logging.info(
-                    f"{board_old} -> title='{board_new.title}', "
-                    f"color='{Color(board_new.color).name}'")
-                Table.write(self)
-                return None
+        location = self.locate(board_old.id)
+        if location is None:
+            return None
+        board = location.item
+        self._save(board)
+        old_board, old_title = str(board), board.title
+        board.title = board_new.title
+        board.color = board_new.color
+        self.__titles.remove("board", old_title)
+        self.__titles.add("board", board.title)
+        self._touch(board)
+        self._record("update_board", board.id,
+                     values={"_Board__title": board.title,
+                             "_Board__color": Color(board.color).name})
+        logging.info("Board updated:")
+        logging.info("%s -> title='%s', color='%s'", old_board,
+                     board_new.title, Color(board_new.color).name)
+        Table.write(self)
 
+    @synchronized
     def update_panel_order(self: "Table", board: Board,
                            new_panel_list: List[Panel]) -> None:
-        """Update the order of panels in a board.
+        """Update the order of panels in a board. Panels that are no longer
+        in the board are skipped, and panels missing from the new list keep
+        their relative order after the listed ones.
 
         Parameters
         ----------
@@ -311,71 +1512,46 @@ class Table:
         new_panel_list : List[Panel]
             The new list of panels to be updated to.
         """
-        old_panel_list = board.panels
-        for index_b, board_ in enumerate(self.boards):
-            if board_ == board:
-                board_dict = self.data[index_b]
-                board_dict["_Board__panels_lists"] = [
-                    {
-                        "_Panel__title": panel.title,
-                        "_Board__panels": [
-                            {
-                                "_Card__title": card.title,
-                                "_Card__description": card.description,
-                                "_Card__date": card.date,
-                                "_Card__time": card.time
-                            }
-                            for card in panel.cards
-                        ]
-                    }
-                    for panel in new_panel_list
-                ]
-                logging.info("Panel order updated:")
-                logging.info(
-                    f"{[panel.title for panel in old_panel_list]} -> "
-                    f"{[panel.title for panel in new_panel_list]}")
-                Table.write(self)
-                return None
+        location = self.locate(board.id)
+        if location is None:
+            return None
+        board = location.item
+        self._save(board)
+        old_panel_list = list(board.panels)
+        board.panels[:] = self._order(old_panel_list, new_panel_list)
+        self._index_panels(board)
+        self._touch(board)
+        self._record("order_panels", board.id,
+                     values={"order": [panel.id for panel in board.panels]})
+        logging.info("Panel order updated:")
+        logging.info("%s -> %s", [panel.title for panel in old_panel_list],
+                     [panel.title for panel in board.panels])
+        Table.write(self)
 
+    @synchronized
     def update_board_order(self: "Table",
                            new_board_list: List[Board]) -> None:
-        """Update the order of boards.
+        """Update the order of boards. Boards that are no longer in the table
+        are skipped, and boards missing from the new list keep their relative
+        order after the listed ones.
 
         Parameters
         ----------
         new_board_list : List[Board]
             The new list of boards to be updated to.
         """
-        old_board_list = self.boards
-        self.data = [
-            {
-                "_Board__title": board.title,
-                "_Board__color": Color(board.color).name,
-                "_Board__panels_lists": [
-                    {
-                        "_Panel__title": panel.title,
-                        "_Board__panels": [
-                            {
-                                "_Card__title": card.title,
-                                "_Card__description": card.description,
-                                "_Card__date": card.date,
-                                "_Card__time": card.time
-                            }
-                            for card in panel.cards
-                        ]
-                    }
-                    for panel in board.panels
-                ]
-            }
-            for board in new_board_list
-        ]
+        self._save()
+        old_board_list = list(self.__boards)
+        self.__boards[:] = self._order(old_board_list, new_board_list)
+        self._index_boards()
+        self._record("order_boards",
+                     values={"order": [board.id for board in self.__boards]})
         logging.info("Board order updated:")
-        logging.info(
-            f"{[board.title for board in old_board_list]} -> "
-            f"{[board.title for board in new_board_list]}")
+        logging.info("%s -> %s", [board.title for board in old_board_list],
+                     [board.title for board in self.__boards])
         Table.write(self)
-        return None
 
+    @synchronized
     def delete_card(self: "Table", card_delete: Card) -> None:
         """Delete card from table.
 
@@ -384,17 +1560,24 @@ class Table:
         card_delete : Card
             The card to be deleted.
         """
-        for index_b, board in enumerate(self.boards):
-            for index_p, panel in enumerate(board.panels):
-                for index_c, card in enumerate(panel.cards):
-                    if card == card_delete:
-                        del self.data[index_b].get(
-                            "_Board__panels_lists")[index_p].get(
-                                "_Board__panels")[index_c]
-                        Table.write(self)
-                        logging.info(f'Card "{card.title}" deleted')
-                        return None
+        location = self.locate(card_delete.id)
+        if location is None:
+            return None
+        self._save(location.panel)
+        del location.panel.cards[location.position]
+        self._unindex(location.item, location.panel.id)
+        self._index_cards(location.board, location.panel, location.position)
+        self._touch(location.item, location.panel, location.board)
+        self.__descriptions.discard(card_delete.id)
+        if self.__search is not None:
+            self.__search.remove(card_delete.id)
+        if self.__due is not None:
+            self.__due.remove(card_delete.id)
+        self._record("delete_card", card_delete.id)
+        Table.write(self)
+        logging.info('Card "%s" deleted', location.item.title)
 
+    @synchronized
     def delete_panel(self: "Table", panel_delete: Panel) -> None:
         """Delete panel from table.
 
@@ -403,15 +1586,24 @@ class Table:
         panel_delete : Panel
             The panel to be deleted.
         """
-        for index_b, board in enumerate(self.boards):
-            for index_p, panel in enumerate(board.panels):
-                if panel == panel_delete:
-                    del self.data[index_b].get(
-                        "_Board__panels_lists")[index_p]
-                    Table.write(self)
-                    logging.info(f'Panel "{panel.title}" deleted')
-                    return None
+        location = self.locate(panel_delete.id)
+        if location is None:
+            return None
+        self._save(location.board)
+        del location.board.panels[location.position]
+        self._unindex(location.item, location.board.id)
+        self._index_panels(location.board, location.position)
+        self._touch(location.item, location.board)
+        if self.__search is not None:
+            self.__search.remove_scope(panel_delete.id)
+        if self.__due is not None:
+            for card in location.item.cards:
+                self.__due.remove(card.id)
+        self._record("delete_panel", panel_delete.id)
+        Table.write(self)
+        logging.info('Panel "%s" deleted', location.item.title)
 
+    @synchronized
     def delete_board(self: "Table", board_delete: Board) -> None:
         """Delete board from table.
 
@@ -420,13 +1612,25 @@ class Table:
         board_delete : Board
             The board to be deleted.
         """
-        for index_b, board in enumerate(self.boards):
-            if board == board_delete:
-                del self.data[index_b]
-                Table.write(self)
-                logging.info(f'Board "{board.title}" deleted')
-                return None
+        location = self.locate(board_delete.id)
+        if location is None:
+            return None
+        self._save()
+        del self.__boards[location.position]
+        self._unindex(location.item)
+        self._index_boards(location.position)
+        self._touch(location.item)
+        if self.__search is not None:
+            self.__search.remove_scope(board_delete.id)
+        if self.__due is not None:
+            for panel in location.item.panels:
+                for card in panel.cards:
+                    self.__due.remove(card.id)
+        self._record("delete_board", board_delete.id)
+        Table.write(self)
+        logging.info('Board "%s" deleted', location.item.title)
 
+    @synchronized
     def change_board_color(self: "Table", board: Board,
                            color: Color) -> None:
         """Change the color of a board.
@@ -438,35 +1642,635 @@ class Table:
         color : Color
             The new color of the board.
         """
-        for index_b, board in enumerate(self.boards):
-            if board == board:
-                self.data.get(
-                    "_Table__data")[index_b]["_Board__color"] = Color(
-                    color).name
-                Table.write(self)
+        location = self.locate(board.id)
+        if location is None:
+            return None
+        board = location.item
+        self._save(board)
+        board.color = Color(color).value
+        self._touch(board)
+        self._record("update_board", board.id,
+                     values={"_Board__title": board.title,
+                             "_Board__color": Color(color).name})
+        Table.write(self)
+
+    def _record(self: "Table", op: str, target: str = None,
+                values: Dict = None) -> None:
+        """Records a change to be committed by the next write and increments
+        the generation of the table, or marks the current transaction as
+        changed. Once the boards have been replaced as a whole, changes are
+        no longer recorded until the next write rewrites the whole table.
+        Either way, the change is passed to the listeners of the table, at
+        the end of the transaction if there is one.
+
+        Parameters
+        ----------
+        op : str
+            The name of the change.
+        target : str, optional
+            The ID of the board, panel or card the change applies to, by
+            default None.
+        values : Dict, optional
+            The new values, by default None.
+        """
+        if self.__depth:
+            self.__deferred = True
+        else:
+            self.__generation += 1
+        change = Change(op, target, values)
+        if self.__changes is not None:
+            self.__changes.append(change)
+        if self.__depth:
+            if self._listeners:
+                self.__pending.append(change)
+            return None
+        for listener in self._listeners:
+            listener(change)
+
+    def _save(self: "Table", *items: Board | Panel | Card) -> None:
+        """Remembers the state of boards, panels and cards a mutation is
+        about to change, or of the list of boards if no item is given, so
+        the current transaction can restore them, see `_restore()`. Only the
+        first state of each item in a transaction is remembered."""
+        if self.__saved is None:
+            return None
+        if not items:
+            if self.__saved_boards is None:
+                self.__saved_boards = list(self.__boards)
+            return None
+        for item in items:
+            if id(item) not in self.__saved:
+                self.__saved[id(item)] = (item, slot_values(item))
+
+    def _restore(self: "Table") -> None:
+        """Restores the boards, panels and cards remembered by `_save()` and
+        rebuilds the indexes. The whole table is rewritten by the next
+        write, unless the caller restores the changes too."""
+        for item, values in self.__saved.values():
+            for name, value in values.items():
+                setattr(item, name, value)
+        self._touch(*(item for item, _ in self.__saved.values()))
+        if self.__saved_boards is not None:
+            self.__boards[:] = self.__saved_boards
+        self.boards = self.__boards
+
+    def _touch(self: "Table", *items: Board | Panel | Card) -> None:
+        """Raises the revision of boards, panels and cards that changed, or
+        whose contents changed, so they no longer equal older copies."""
+        self.__revision += 1
+        for item in items:
+            item.revision = self.__revision
+
+    def _index_boards(self: "Table", start: int = 0) -> None:
+        """Indexes the boards from the given position onwards. Their panels
+        and cards are indexed too when a board is indexed for the first
+        time."""
+        for position in range(start, len(self.__boards)):
+            board = self.__boards[position]
+            if board.id not in self.__index and board.loaded:
+                self._index_panels(board)
+            self.__index[board.id] = Location(board, board, None, position)
+
+    def _index_panels(self: "Table", board: Board, start: int = 0) -> None:
+        """Indexes the panels of a board from the given position onwards.
+        Their cards are indexed too when a panel is indexed for the first
+        time."""
+        for position in range(start, len(board.panels)):
+            panel = board.panels[position]
+            if panel.id not in self.__index:
+                self._index_cards(board, panel)
+            self.__index[panel.id] = Location(panel, board, panel, position)
+
+    def _index_cards(self: "Table", board: Board, panel: Panel,
+                     start: int = 0) -> None:
+        """Indexes the cards of a panel from the given position onwards."""
+        for position in range(start, len(panel.cards)):
+            card = panel.cards[position]
+            self.__index[card.id] = Location(card, board, panel, position)
+
+    def _unindex(self: "Table", item: Board | Panel | Card,
+                 scope: str = None) -> None:
+        """Removes a board, panel or card and everything it contains from the
+        location and title indexes.
+
+        Parameters
+        ----------
+        item : Board | Panel | Card
+            The item to be removed.
+        scope : str, optional
+            The ID of the board or panel containing the item, by default None.
+        """
+        self.__index.pop(item.id, None)
+        self.__unloaded.pop(item.id, None)
+        self.__prefetched.pop(item.id, None)
+        self.__titles.remove(self._kind(item), item.title, scope)
+        for child in self._children(item):
+            self._unindex(child, item.id)
+
+    def _add_titles(self: "Table", item: Board | Panel | Card,
+                    scope: str = None) -> None:
+        """Adds the title of a board, panel or card and of everything it
+        contains to the title index.
+
+        Parameters
+        ----------
+        item : Board | Panel | Card
+            The item to be added.
+        scope : str, optional
+            The ID of the board or panel containing the item, by default None.
+        """
+        kind = self._kind(item)
+        self.__titles.add(kind, item.title, scope)
+        if kind == "board":
+            for panel in self._children(item):
+                self._add_titles(panel, item.id)
+        elif kind == "panel":
+            self.__titles.add_many(
+                "card", (card.title for card in item.cards), item.id)
+
+    def _index_text(self: "Table", card: Card, board: Board,
+                    panel: Panel) -> None:
+        """Adds the title and description of a card to the search index, if
+        it has been built."""
+        if self.__search is not None:
+            self.__search.add(card.id, board.id, panel.id, card.title,
+                              card.description)
+
+    def _index_due(self: "Table", card: Card) -> None:
+        """Updates the due date and time of a card in the due-date index, if
+        it has been built."""
+        if self.__due is not None:
+            self.__due.set(card.id, card.due)
+
+    def _due_index(self: "Table") -> DueIndex:
+        """Returns the due-date index, building it from the whole table if
+        it has not been built yet."""
+        if self.__due is not None:
+            return self.__due
+        self._load_all()
+        index = DueIndex()
+        index.add_many((card.id, card.due)
+                       for board in self.__boards
+                       for panel in board.panels
+                       for card in panel.cards)
+        self.__due = index
+        logging.info("Due-date index built: %d cards", len(index))
+        return index
+
+    def _due_cards(self: "Table", start: int | None, end: int | None,
+                   scope: Location | None) -> Iterator[Card]:
+        """Yields the cards due from `start` to `end` within a board or
+        panel, walking the due-date index."""
+        for card_id in self._due_index().iterate(start, end):
+            location = self.__index.get(card_id)
+            if location is None or scope is not None and (
+                    location.board is not scope.board or
+                    scope.panel is not None and location.panel is not
+                    scope.panel):
+                continue
+            yield location.item
+
+    def _stamp(self: "Table") -> tuple:
+        """Returns a stamp of the table file that changes whenever any
+        process writes it: the write counter of the lock file and the stamp
+        of the storage backend."""
+        return self._file_lock.generation(), self._storage.stamp()
+
+    def _search_path(self: "Table") -> str:
+        """Returns the path of the search index file, next to the table
+        file."""
+        return os.path.splitext(self._tb_path)[0] + ".search"
+
+    def _search_index(self: "Table") -> SearchIndex:
+        """Returns the search index, building it from the whole table if it
+        has not been loaded or built yet."""
+        if self.__search is not None:
+            return self.__search
+        logging.info("Building search index...")
+        self._load_all()
+        index = SearchIndex()
+        index.add_many(
+            (card.id, board.id, panel.id, f"{card.title} {card.description}")
+            for board in self.__boards
+            for panel in board.panels
+            for card in panel.cards)
+        self.__search = index
+        self.__search_stamp = None
+        logging.info("Search index built: %d cards", len(index))
+        return index
+
+    def _load_search(self: "Table") -> None:
+        """Loads the search index file, if it matches the table file."""
+        with self._io_lock:
+            stamp = self._storage.stamp()
+            index = SearchIndex.load(self._search_path(), stamp)
+        with self._lock:
+            if index is None or self.__changes != []:
                 return None
+            self.__search, self.__search_stamp = index, stamp
+        logging.info("Search index loaded: %d cards", len(index))
+
+    @synchronized
+    def _save_search(self: "Table") -> None:
+        """Saves the search index next to the table file, if it has been
+        built, all the changes have been written and the table file changed
+        since the index was saved or loaded."""
+        if self.__search is None or self.__changes != []:
+            return None
+        try:
+            with self._io_lock:
+                stamp = self._storage.stamp()
+                if stamp == self.__search_stamp:
+                    return None
+                self.__search.save(self._search_path(), stamp)
+        except OSError:
+            logging.warning("Failed to save the search index", exc_info=True)
+            return None
+        self.__search_stamp = stamp
+        logging.info("Search index saved")
+
+    @staticmethod
+    def _kind(item: Board | Panel | Card) -> str:
+        if isinstance(item, Board):
+            return "board"
+        if isinstance(item, Panel):
+            return "panel"
+        return "card"
+
+    @staticmethod
+    def _children(item: Board | Panel | Card) -> List[Panel] | List[Card]:
+        if isinstance(item, Board):
+            return item.panels if item.loaded else []
+        if isinstance(item, Panel):
+            return item.cards
+        return []
+
+    @staticmethod
+    def _order(old_list: List, new_list: List) -> List:
+        """Returns the items of `old_list` in the order given by `new_list`,
+        matching items by ID. Items of `new_list` that are not in `old_list`
+        are skipped, and items of `old_list` missing from `new_list` are
+        appended in their original order.
+        """
+        old_items = {item.id: item for item in old_list}
+        ordered = {}
+        for item in new_list:
+            if item is not None and item.id in old_items:
+                ordered[item.id] = old_items[item.id]
+        return list(ordered.values()) + [
+            item for item in old_list if item.id not in ordered]
+
+    def _build(self: "Table", data: List[Dict]) -> List[Board]:
+        """Builds the boards, panels and cards from the table data. Boards
+        whose panels are given as a function are built without their panels,
+        which are loaded by `_load_board()` when first accessed."""
+        self.__unloaded = {}
+        self.__prefetched = {}
+        self.__descriptions.clear()
+        return [self._build_board(board_item) for board_item in data]
+
+    def _build_board(self: "Table", board_item: Dict) -> Board:
+        """Builds a board, and its panels and cards unless they are given as
+        a function, from the data of the board."""
+        panels = board_item.get('_Board__panels_lists', [])
+        board = Board(
+            title=board_item.get('_Board__title', ''),
+            color=board_item.get('_Board__color', 'LIGHTBLUE'),
+            panels_lists=(partial(self._load_board, panels)
+                          if callable(panels)
+                          else self._build_panels(panels, self._describe)),
+            id=board_item.get('_Board__id')
+        )
+        if callable(panels):
+            self.__unloaded[board.id] = panels
+        return board
+
+    def _merge(self: "Table", data: List[Dict], stamp: tuple) -> Set[str]:
+        """Patches the boards of the table to match the table data read by
+        `reload()`, in which the panels of every loaded board are loaded.
+        Boards are matched by ID. Unchanged boards are kept as they are and
+        the panels of a changed board are rebuilt, updating the indexes.
+        Called while holding the lock of the table."""
+        self.__descriptions.clear()
+        boards = {board.id: board for board in self.__boards}
+        changed = set()
+        merged = []
+        for board_item in data:
+            board = boards.pop(board_item["_Board__id"], None)
+            if board is None:
+                board = self._build_board(board_item)
+                self._add_board_indexes(board)
+                changed.add(board.id)
+                merged.append(board)
+                continue
+            title = board_item.get("_Board__title", "")
+            color = Color[board_item.get("_Board__color", "LIGHTBLUE")].value
+            if board.title != title or board.color != color:
+                self.__titles.remove("board", board.title)
+                self.__titles.add("board", title)
+                board.title, board.color = title, color
+                changed.add(board.id)
+            panels = board_item["_Board__panels_lists"]
+            if not board.loaded:
+                if callable(panels):
+                    self.__unloaded[board.id] = panels
+                    self.__prefetched.pop(board.id, None)
+            else:
+                panels = self._build_panels(panels, self._describe)
+                if not self._same_panels(board.panels, panels):
+                    self._replace_panels(board, panels)
+                    changed.add(board.id)
+            merged.append(board)
+        for board in boards.values():
+            self._unindex(board)
+            if self.__search is not None:
+                self.__search.remove_scope(board.id)
+            if self.__due is not None:
+                for panel in self._children(board):
+                    for card in panel.cards:
+                        self.__due.remove(card.id)
+            changed.add(board.id)
+        order = [board.id for board in merged]
+        if order != [board.id for board in self.__boards]:
+            kept = [board.id for board in self.__boards
+                    if board.id not in boards]
+            if kept != [board_id for board_id in order if board_id in kept]:
+                changed.update(kept)
+            self.__boards[:] = merged
+        self.__stamp = stamp
+        if not changed:
+            return changed
+        self._index_boards()
+        self._touch(*(board for board in merged if board.id in changed))
+        self.__generation += 1
+        logging.info("Reloaded %d board%s changed by another process",
+                     len(changed), "s" if len(changed) != 1 else "")
+        return changed
+
+    def _add_board_indexes(self: "Table", board: Board) -> None:
+        """Adds the titles of a new board to the title index, and its cards
+        to the search and due-date indexes if they have been built, loading
+        the board if needed."""
+        self.__titles.add("board", board.title)
+        if board.loaded:
+            for panel in board.panels:
+                self._add_titles(panel, board.id)
+        if self.__search is None and self.__due is None:
+            return None
+        for panel in board.panels:
+            if self.__search is not None:
+                self.__search.add_many(
+                    (card.id, board.id, panel.id,
+                     f"{card.title} {card.description}")
+                    for card in panel.cards)
+            if self.__due is not None:
+                self.__due.add_many((card.id, card.due)
+                                    for card in panel.cards)
+
+    def _replace_panels(self: "Table", board: Board,
+                        panels: List[Panel]) -> None:
+        """Replaces the panels of a loaded board, updating the indexes."""
+        for panel in board.panels:
+            self._unindex(panel, board.id)
+            if self.__search is not None:
+                self.__search.remove_scope(panel.id)
+            if self.__due is not None:
+                for card in panel.cards:
+                    self.__due.remove(card.id)
+        board.panels[:] = panels
+        self._index_panels(board)
+        for panel in panels:
+            self._add_titles(panel, board.id)
+            if self.__search is not None:
+                self.__search.add_many(
+                    (card.id, board.id, panel.id,
+                     f"{card.title} {card.description}")
+                    for card in panel.cards)
+            if self.__due is not None:
+                self.__due.add_many((card.id, card.due)
+                                    for card in panel.cards)
+
+    @classmethod
+    def _same_panels(cls, panels: List[Panel], others: List[Panel]) -> bool:
+        """Returns whether two lists of panels have the same IDs, titles and
+        cards, in the same order."""
+        return len(panels) == len(others) and all(
+            panel.id == other.id and panel.title == other.title and
+            len(panel.cards) == len(other.cards) and all(
+                card.id == other_card.id and
+                card.title == other_card.title and
+                card.day == other_card.day and
+                card.minute == other_card.minute and
+                cls._same_description(card, other_card)
+                for card, other_card in zip(panel.cards, other.cards))
+            for panel, other in zip(panels, others))
+
+    @staticmethod
+    def _same_description(card: Card, other: Card) -> bool:
+        """Returns whether two cards have the same description, without
+        decompressing them. Descriptions that are both loaded when accessed
+        are deemed the same, since they are read from the table file
+        anyway."""
+        loader, other_loader = card.description_loader, \
+            other.description_loader
+        if isinstance(loader, CompressedText) and \
+                isinstance(other_loader, CompressedText):
+            return loader.data == other_loader.data
+        if loader is not None and other_loader is not None and not \
+                isinstance(loader, CompressedText) and not \
+                isinstance(other_loader, CompressedText):
+            return True
+        return card.description == other.description
+
+    @staticmethod
+    def _build_panels(data: List[Dict],
+                      describe: Callable[[str], str] = None) -> List[Panel]:
+        """Builds the panels and cards of a board from the table data.
+        Compressed descriptions are decompressed when first read, and
+        descriptions given as a function are loaded through `describe`
+        instead, if it is given."""
+        panels = []
+        for panel_item in data:
+            cards = []
+            for card_item in panel_item.get('_Board__panels', []):
+                description = card_item.get('_Card__description', '')
+                if isinstance(description, bytes):
+                    description = CompressedText(description)
+                elif describe is not None and callable(description):
+                    description = describe
+                cards.append(Card(
+                    title=card_item.get('_Card__title', ''),
+                    description=description,
+                    date=card_item.get('_Card__date'),
+                    time=card_item.get('_Card__time'),
+                    id=card_item.get('_Card__id')
+                ))
+            panels.append(Panel(
+                title=panel_item.get('_Panel__title', ''),
+                card_lists=cards,
+                id=panel_item.get('_Panel__id')
+            ))
+        return panels
+
+    @synchronized
+    def _load_board(self: "Table", load: Callable[[], List[Dict]],
+                    board: Board) -> List[Panel]:
+        """Loads the panels of a board and indexes them, from the data read
+        by `prefetch()` if any. Called by the board the first time its panels
+        are accessed, see `_loader()`.
+
+        Parameters
+        ----------
+        load : Callable[[], List[Dict]]
+            The function returning the panel data of the board.
+        board : Board
+            The board being loaded.
+
+        Returns
+        -------
+        panels : List[Panel]
+            The panels of the board.
+        """
+        data = self.__prefetched.pop(board.id, None)
+        if data is None:
+            with self._io_lock, self._file_lock.shared():
+                data = self._loader(
+                    board.id, self.__unloaded.get(board.id, load))()
+        panels = self._build_panels(data, self._describe)
+        self.__unloaded.pop(board.id, None)
+        for position, panel in enumerate(panels):
+            self.__index[panel.id] = Location(panel, board, panel, position)
+            self._index_cards(board, panel)
+            self._add_titles(panel, board.id)
+        logging.info('Board "%s" loaded', board.title)
+        return panels
+
+    def _loader(self: "Table", board_id: str,
+                load: Callable[[], List[Dict]]) -> Callable[[], List[Dict]]:
+        """Returns the function loading the panels of an unloaded board.
+        Such functions may read a table file that another process has
+        replaced since, so if the table file changed since it was last read
+        or written, the function is taken from the table file as it is now.
+        Called while holding the lock of the table file."""
+        if self.__stamp is None or self._stamp() == self.__stamp:
+            return load
+        for board_item in self._storage.load():
+            if board_item["_Board__id"] == board_id:
+                panels = board_item["_Board__panels_lists"]
+                return panels if callable(panels) else partial(list, panels)
+        # Deleted by another process, until the next reload removes it
+        return list
+
+    def _describe(self: "Table", card_id: str) -> str:
+        """Returns the description of a card whose description is loaded
+        lazily, from the cache if it was read recently.
+
+        Parameters
+        ----------
+        card_id : str
+            The ID of the card.
+
+        Returns
+        -------
+        description : str
+            The description of the card.
+        """
+        description = self.__descriptions.get(card_id)
+        if description is None:
+            with self._io_lock, self._file_lock.shared():
+                description = self._storage.load_description(card_id)
+            if isinstance(description, bytes):
+                description = decompress_text(description)
+            self.__descriptions.put(card_id, description)
+        return description
+
+    def _load_all(self: "Table") -> None:
+        """Loads the panels of every board that has not been loaded yet."""
+        for board in list(self.__boards):
+            board.panels
+
+    def _card_dict(self: "Table", card: Card, lazy: bool = False,
+                   compress: bool = False) -> Dict:
+        """Returns the data of a card. If `lazy` is True and the description
+        of the card has not been loaded, the function that loads it is
+        returned in its place. If `compress` is True, the description is
+        compressed if it is long enough, see `set_compression()`. Either
+        way, descriptions that are still compressed are returned as they
+        are."""
+        loader = card.description_loader
+        if isinstance(loader, CompressedText) and (lazy or compress):
+            description = loader.data
+        elif loader is not None and lazy:
+            description = self._storage.load_description
+        elif compress:
+            description = self._compress(card.description)
+        else:
+            description = card.description
+        return {
+            "_Card__id": card.id,
+            "_Card__title": card.title,
+            "_Card__description": description,
+            "_Card__date": card.day,
+            "_Card__time": card.minute
+        }
+
+    def _compress(self: "Table", text: str) -> str | bytes:
+        """Returns text compressed with the compression method of the table
+        if it is long enough and shrinks, or the text itself otherwise."""
+        if (self.__compression is None
+                or len(text) < self.__compression_threshold):
+            return text
+        data = compress_text(text, self.__compression)
+        return data if len(data) < len(text) else text
+
+    def _panel_dict(self: "Table", panel: Panel, lazy: bool = False,
+                    compress: bool = False) -> Dict:
+        return {
+            "_Panel__id": panel.id,
+            "_Panel__title": panel.title,
+            "_Board__panels": [self._card_dict(card, lazy, compress)
+                               for card in panel.cards]
+        }
+
+    def _board_dict(self: "Table", board: Board, lazy: bool = False,
+                    compress: bool = False) -> Dict:
+        """Returns the data of a board. If `lazy` is True and the panels of
+        the board have not been loaded, the function that loads them is
+        returned in their place. See `_card_dict()` for the descriptions of
+        its cards."""
+        return {
+            "_Board__id": board.id,
+            "_Board__title": board.title,
+            "_Board__color": Color(board.color).name,
+            "_Board__panels_lists": (
+                self.__unloaded[board.id]
+                if lazy and board.id in self.__unloaded else
+                [self._panel_dict(panel, lazy, compress)
+                 for panel in board.panels])
+        }
 
     @property
     def data(self: "Table") -> List[Dict]:
-        """Returns the data of the table.
+        """Returns the data of the table, as stored in the table file.
 
         Returns
         -------
         data : List[Dict]
             The data of the table.
         """
-        return self.__data
+        return [self._board_dict(board) for board in self.__boards]
 
     @data.setter
     def data(self: "Table", data: List[Dict]) -> None:
-        """Sets the data of the table.
+        """Sets the data of the table. The whole table will be rewritten by
+        the next write.
 
         Parameters
         ----------
         data : List[Dict]
             The data of the table.
         """
-        self.__data = data
+        self.boards = self._build(data)
 
     def __str__(self: "Table") -> str:
         """Returns the table instance as a stringified dictionary.
@@ -481,4 +2285,4 @@ class Table:
         This method is used for debugging purposes.
         """
         logging.debug("Table printed")
-        return str(self.__data)
+        return str(self.data)
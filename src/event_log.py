@@ -0,0 +1,151 @@
+"""The event log of the application.
+
+Records are handed to a background thread through a queue, see
+`logging.handlers.QueueHandler`, so logging never waits for the log file or
+the console. The log file is rotated when it grows too large and when the
+application starts, and rotated files are compressed with gzip.
+"""
+import atexit
+import copy
+import gzip
+import logging
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Tuple
+
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 5
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops records below WARNING that repeat a message too often, e.g.
+    one record per card added by an import. Records are grouped by their
+    unformatted message, and each group may log `burst` records at once and
+    `rate` records per second after that. The number of records dropped is
+    added to the next record of the group that is logged.
+
+    Parameters
+    ----------
+    rate : float, optional
+        The number of records per second of a group, by default 10.
+    burst : int, optional
+        The number of records a group may log at once, by default 100.
+    """
+
+    MAX_GROUPS: int = 1000
+
+    def __init__(self, rate: float = 10.0, burst: int = 100) -> None:
+        logging.Filter.__init__(self)
+        self._rate = rate
+        self._burst = burst
+        self._lock = threading.Lock()
+        # Tokens left, time of the last update and records dropped by group
+        self._groups: Dict[Tuple[str, int, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, dropped = self._groups.get(
+                key, (self._burst, now, 0))
+            tokens = min(self._burst, tokens + (now - last) * self._rate)
+            if len(self._groups) >= self.MAX_GROUPS and \
+                    key not in self._groups:
+                self._groups.clear()
+            if tokens < 1:
+                self._groups[key] = [tokens, now, dropped + 1]
+                return False
+            self._groups[key] = [tokens - 1, now, 0]
+        if dropped:
+            record.msg = f"{record.getMessage()} ({dropped} similar " \
+                         f"messages dropped)"
+            record.args = None
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """Queues records with their message formatted, so later changes to the
+    arguments do not show, but leaves the rest of the formatting, e.g. of
+    timestamps and tracebacks, to the thread writing the records."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Compresses a rotated log file."""
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def init_event_logger(path: str, fmt: str, debug: bool = False,
+                      stdout: bool = False, max_bytes: int = MAX_BYTES,
+                      backup_count: int = BACKUP_COUNT) -> QueueListener:
+    """Initializes the event logger.
+    - Rotate the event log file of the previous run and compress it
+    - Set the format of the event log file
+    - Set the debug level of the event log file; without debug, repeated
+    messages are rate-limited, see `RateLimitFilter`
+    - Write the records on a background thread until the application exits
+
+    Parameters
+    ----------
+    path : str
+        The path of the event log file.
+    fmt : str
+        The format of the records.
+    debug : bool, optional
+        Whether to log debug records, by default False.
+    stdout : bool, optional
+        Whether to print the records too, by default False.
+    max_bytes : int, optional
+        The size at which the event log file is rotated, by default 1 MiB.
+    backup_count : int, optional
+        The number of rotated event log files to keep, by default 5.
+
+    Returns
+    -------
+    listener : QueueListener
+        The listener writing the records, stopped at exit.
+    """
+    formatter = logging.Formatter(fmt, datefmt="%d-%b-%y %H:%M:%S")
+    file_handler = RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count,
+        encoding="utf-8", delay=True)
+    file_handler.namer = _gzip_namer
+    file_handler.rotator = _gzip_rotator
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        file_handler.doRollover()
+    handlers = [file_handler]
+    if stdout:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    queue_handler = _QueueHandler(records)
+    if not debug:
+        queue_handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(records, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
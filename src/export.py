@@ -0,0 +1,191 @@
+"""Exports the cards of the table to JSON Lines or CSV files, one card per
+line or row, for reporting.
+
+Cards are streamed from the table board by board and written as they come,
+so boards that are not loaded yet are only held in memory while they are
+exported.
+
+Run headless from the src directory:
+
+    python export.py Table.db cards.csv [--board TITLE ...]
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, TextIO
+
+from db import Table
+from kanbaru_objects import Board
+
+COLUMNS = ["board_id", "board", "panel_id", "panel", "card_id", "card",
+           "date", "time", "description"]
+EXTENSIONS = {".jsonl": "jsonl", ".csv": "csv"}
+
+
+def rows(table: Table,
+         boards: Iterable[Board] = None) -> Iterator[Dict[str, str]]:
+    """Yields a row for each card of the given boards, in the order of the
+    table.
+
+    Parameters
+    ----------
+    table : Table
+        The table to export.
+    boards : Iterable[Board], optional
+        The boards to export, by default None (all the boards).
+
+    Yields
+    ------
+    row : Dict[str, str]
+        The card, its panel and its board, keyed by `COLUMNS`.
+    """
+    for board in table.boards if boards is None else boards:
+        for panel in table.iter_panels(board):
+            for card in panel.cards:
+                yield {
+                    "board_id": board.id,
+                    "board": board.title,
+                    "panel_id": panel.id,
+                    "panel": panel.title,
+                    "card_id": card.id,
+                    "card": card.title,
+                    "date": card.date,
+                    "time": card.time,
+                    "description": card.description,
+                }
+
+
+def write_jsonl(rows: Iterable[Dict[str, str]], file: TextIO) -> int:
+    """Writes rows as JSON Lines and returns the number of rows."""
+    count = 0
+    for row in rows:
+        file.write(json.dumps(row, ensure_ascii=False))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(rows: Iterable[Dict[str, str]], file: TextIO) -> int:
+    """Writes rows as CSV with a header row and returns the number of
+    rows."""
+    writer = csv.DictWriter(file, fieldnames=COLUMNS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+WRITERS: Dict[str, Callable[[Iterable[Dict[str, str]], TextIO], int]] = {
+    "jsonl": write_jsonl,
+    "csv": write_csv,
+}
+
+
+def format_of(path: str) -> str:
+    """Returns the export format matching the extension of a file.
+
+    Raises
+    ------
+    ValueError
+        If the extension is not a supported format.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        return EXTENSIONS[extension]
+    except KeyError:
+        raise ValueError(f'Unknown export format "{extension}"')
+
+
+def export(path: str, boards: Iterable[Board] = None, fmt: str = None,
+           table: Table = None) -> int:
+    """Exports the cards of some or all of the boards to a file. The file is
+    written through a temporary file, so it is never left half written.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file to write.
+    boards : Iterable[Board], optional
+        The boards to export, by default None (all the boards).
+    fmt : str, optional
+        "jsonl" or "csv", by default None (from the extension of the path).
+    table : Table, optional
+        The table to export, by default the table instance.
+
+    Returns
+    -------
+    count : int
+        The number of cards exported.
+
+    Raises
+    ------
+    ValueError
+        If the format is not supported.
+    """
+    fmt = fmt or format_of(path)
+    if fmt not in WRITERS:
+        raise ValueError(f'Unknown export format "{fmt}"')
+    table = table or Table.get_instance()
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8", newline="") as file:
+            count = WRITERS[fmt](rows(table, boards), file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logging.info('Exported %d cards to "%s"', count, path)
+    return count
+
+
+def select_boards(table: Table, titles: List[str]) -> List[Board]:
+    """Returns the boards with the given titles, in the given order.
+
+    Raises
+    ------
+    ValueError
+        If no board has one of the titles.
+    """
+    boards = []
+    for title in titles:
+        location = next(table.query("board", title=title), None)
+        if location is None:
+            raise ValueError(f'Board "{title}" does not exist')
+        boards.append(location.item)
+    return boards
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("table", help="the table file to export")
+    parser.add_argument("output", help="the .jsonl or .csv file to write")
+    parser.add_argument("--board", action="append", default=[],
+                        help="export the board with this title, can be "
+                        "repeated (default: all the boards)")
+    parser.add_argument("--format", choices=sorted(WRITERS),
+                        help="the export format (default: from the output "
+                        "extension)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.table):
+        parser.error(f'table file "{args.table}" does not exist')
+    table = Table.get_instance()
+    table.set_path(args.table)
+    table.read()
+    try:
+        boards = select_boards(table, args.board) if args.board else None
+        count = export(args.output, boards, args.format, table)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f'Exported {count} cards to "{args.output}"')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Imports cards from CSV, JSON Lines and Trello JSON exports into the table.
+
+Rows are read one at a time, validated in batches and only added to the
+table once the whole file is valid, in a single transaction that writes
+the table once. Boards and panels are matched by title and created when
+they do not exist yet, and cards whose title is already used in their panel
+are skipped.
+
+Run headless from the src directory:
+
+    python importer.py Table.db cards.csv [--board TITLE]
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, TextIO
+
+from db import Table
+from kanbaru_objects import (Board, Card, Panel, format_date, format_time,
+                             parse_dates, parse_times)
+
+FIELDS = ["board", "panel", "card", "date", "time", "description"]
+# Column names of other tools, compared ignoring case and spaces
+ALIASES = {
+    "board": "board", "board name": "board", "project": "board",
+    "panel": "panel", "list": "panel", "list name": "panel",
+    "column": "panel", "status": "panel",
+    "card": "card", "card name": "card", "title": "card", "name": "card",
+    "date": "date", "due date": "date",
+    "time": "time", "due time": "time",
+    "description": "description", "card description": "description",
+    "desc": "description", "notes": "description",
+}
+DEFAULT_TITLE = "Imported"
+BATCH_SIZE = 1000
+MAX_ERRORS = 10
+
+
+class ImportCancelled(Exception):
+    """Raised by the progress function of an import to stop it. Nothing is
+    imported."""
+
+
+class ImportedCard(NamedTuple):
+    """A card read from an import file, with the titles of the board and
+    panel it goes to."""
+    board: str
+    panel: str
+    card: Card
+
+
+def read_csv(file: TextIO,
+             columns: Dict[str, str] = None) -> Iterator[Dict[str, str]]:
+    """Yields the rows of a CSV file with a header row, keyed by `FIELDS`.
+
+    Parameters
+    ----------
+    file : TextIO
+        The CSV file, opened with `newline=""`.
+    columns : Dict[str, str], optional
+        The column holding each field, overriding the column names
+        recognized by default, see `ALIASES`, by default None.
+
+    Yields
+    ------
+    row : Dict[str, str]
+        The fields of each row. Missing fields are left out.
+
+    Raises
+    ------
+    ValueError
+        If no column holds the card titles.
+    """
+    reader = csv.reader(file)
+    header = next(reader, [])
+    positions = {}
+    for position, name in enumerate(header):
+        field = ALIASES.get(" ".join(name.split()).lower())
+        if field is not None:
+            positions.setdefault(field, position)
+    for field, name in (columns or {}).items():
+        if name not in header:
+            raise ValueError(f'Column "{name}" does not exist')
+        positions[field] = header.index(name)
+    if "card" not in positions:
+        raise ValueError("No column holds the card titles")
+    for row in reader:
+        if any(row):
+            yield {field: row[position].strip()
+                   for field, position in positions.items()
+                   if position < len(row)}
+
+
+def read_jsonl(file: TextIO) -> Iterator[Dict[str, str]]:
+    """Yields the rows of a JSON Lines file, one object per line with the
+    keys of `FIELDS`, such as written by `export.write_jsonl()`."""
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"Line {number}: {error}")
+        yield {field: str(item[field]) for field in FIELDS
+               if item.get(field) is not None}
+
+
+def read_trello(file: TextIO) -> Iterator[Dict[str, str]]:
+    """Yields the open cards of a Trello board export. Lists become panels
+    and due dates are converted to local time.
+
+    A Trello export is a single JSON document, so it is parsed as a whole,
+    but its cards are converted one at a time."""
+    data = json.load(file)
+    board = data.get("name") or DEFAULT_TITLE
+    lists = {item["id"]: item.get("name", "") for item in data.get("lists", [])
+             if not item.get("closed")}
+    for card in data.get("cards", []):
+        if card.get("closed") or card.get("idList") not in lists:
+            continue
+        row = {"board": board, "panel": lists[card["idList"]],
+               "card": card.get("name", ""),
+               "description": card.get("desc", "")}
+        if card.get("due"):
+            due = datetime.fromisoformat(
+                card["due"].replace("Z", "+00:00")).astimezone()
+            row["date"] = format_date(due.toordinal())
+            row["time"] = format_time(due.hour * 60 + due.minute)
+        yield row
+
+
+READERS: Dict[str, Callable[[TextIO], Iterator[Dict[str, str]]]] = {
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+    "trello": read_trello,
+}
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".json": "trello"}
+
+
+def parse(rows: Iterable[Dict[str, str]], board: str = None,
+          progress: Callable[[int], None] = None) -> List[ImportedCard]:
+    """Builds the cards of rows, validating their dates and times in
+    batches.
+
+    Parameters
+    ----------
+    rows : Iterable[Dict[str, str]]
+        The rows, keyed by `FIELDS`.
+    board : str, optional
+        The title of the board all the cards go to, by default None (the
+        board of each row).
+    progress : Callable[[int], None], optional
+        Called with the number of rows read after each batch, by default
+        None.
+
+    Returns
+    -------
+    cards : List[ImportedCard]
+        The cards, in the order of the rows.
+
+    Raises
+    ------
+    ValueError
+        If a row has no title or an invalid date or time. The message lists
+        the first invalid rows.
+    """
+    rows = iter(rows)
+    cards: List[ImportedCard] = []
+    errors: List[str] = []
+    while batch := list(islice(rows, BATCH_SIZE)):
+        days, bad_days = parse_dates(row.get("date") for row in batch)
+        minutes, bad_minutes = parse_times(row.get("time") for row in batch)
+        bad_days, bad_minutes = set(bad_days), set(bad_minutes)
+        for position, row in enumerate(batch):
+            number = len(cards) + len(errors) + 1
+            if not row.get("card"):
+                errors.append(f"Row {number}: Card title cannot be empty.")
+            elif position in bad_days:
+                errors.append(f"Row {number}: Card date must follow format "
+                              "DD-MM-YYYY.")
+            elif position in bad_minutes:
+                errors.append(f"Row {number}: Card time must follow format "
+                              "HH:MM.")
+            else:
+                cards.append(ImportedCard(
+                    board or row.get("board") or DEFAULT_TITLE,
+                    row.get("panel") or DEFAULT_TITLE,
+                    Card(row["card"], days[position], minutes[position],
+                         row.get("description", ""))))
+        if progress is not None:
+            progress(len(cards) + len(errors))
+    if errors:
+        more = len(errors) - MAX_ERRORS
+        raise ValueError("\n".join(errors[:MAX_ERRORS]) + (
+            f"\n... and {more} more" if more > 0 else ""))
+    return cards
+
+
+def commit(cards: Iterable[ImportedCard], table: Table = None,
+           progress: Callable[[int], None] = None) -> int:
+    """Adds cards to the table in a single transaction, creating the boards
+    and panels they go to if no board or panel has their title. Cards whose
+    title is already used in their panel, e.g. by an earlier import of the
+    same file, are skipped, as the GUI does not allow them either.
+
+    Parameters
+    ----------
+    cards : Iterable[ImportedCard]
+        The cards, with the titles of their board and panel.
+    table : Table, optional
+        The table to add the cards to, by default the table instance.
+    progress : Callable[[int], None], optional
+        Called with the number of cards added after each panel, inside the
+        transaction, by default None. If it raises, e.g. `ImportCancelled`,
+        the transaction is rolled back.
+
+    Returns
+    -------
+    count : int
+        The number of cards added, without the cards skipped.
+    """
+    table = table or Table.get_instance()
+    groups: Dict[tuple, List[Card]] = {}
+    for board, panel, card in cards:
+        groups.setdefault((board, panel), []).append(card)
+    boards: Dict[str, Board] = {}
+    count = skipped = 0
+    with table.transaction():
+        for (board_title, panel_title), group in groups.items():
+            board = boards.get(board_title)
+            if board is None:
+                location = next(table.query("board", title=board_title), None)
+                board = boards[board_title] = location.item if location \
+                    else table.add_board(board_title)
+            location = next(table.query("panel", board=board,
+                                        title=panel_title), None)
+            panel: Panel = location.item if location \
+                else table.add_panel(board, panel_title)
+            titles = set()
+            added = []
+            for card in group:
+                if card.title in titles or \
+                        table.title_exists("card", card.title, panel.id):
+                    skipped += 1
+                    continue
+                titles.add(card.title)
+                added.append(card)
+            count += len(table.add_cards(panel, added))
+            if progress is not None:
+                progress(count)
+    logging.info("Imported %d cards", count)
+    if skipped:
+        logging.info("Skipped %d cards whose title is already used in their "
+                     "panel", skipped)
+    return count
+
+
+def import_file(path: str, board: str = None, fmt: str = None,
+                table: Table = None,
+                progress: Callable[[int], None] = None) -> int:
+    """Imports the cards of a CSV, JSON Lines or Trello JSON file. Nothing
+    is imported if any row is invalid.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file to import.
+    board : str, optional
+        The title of the board all the cards go to, by default None (the
+        board of each row, or a board named "Imported").
+    fmt : str, optional
+        "csv", "jsonl" or "trello", by default None (from the extension of
+        the path).
+    table : Table, optional
+        The table to import into, by default the table instance.
+    progress : Callable[[int], None], optional
+        Called with the number of rows read so far, then with the number of
+        cards added so far, by default None. It may raise `ImportCancelled`
+        to stop the import, see `commit()`.
+
+    Returns
+    -------
+    count : int
+        The number of cards imported.
+
+    Raises
+    ------
+    ValueError
+        If the format is not supported or the file is invalid.
+    ImportCancelled
+        If the progress function cancelled the import.
+    """
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower()
+        fmt = EXTENSIONS.get(extension)
+        if fmt is None:
+            raise ValueError(f'Unknown import format "{extension}"')
+    if fmt not in READERS:
+        raise ValueError(f'Unknown import format "{fmt}"')
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        try:
+            cards = parse(READERS[fmt](file), board, progress)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"Invalid JSON: {error}")
+    return commit(cards, table, progress)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("table", help="the table file to import into")
+    parser.add_argument("input", help="the .csv, .jsonl or Trello .json "
+                        "file to import")
+    parser.add_argument("--board", help="import every card into the board "
+                        "with this title")
+    parser.add_argument("--format", choices=sorted(READERS),
+                        help="the import format (default: from the input "
+                        "extension)")
+    args = parser.parse_args(argv)
+
+    table = Table.get_instance()
+    table.set_path(args.table)
+    table.read()
+    try:
+        count = import_file(args.input, args.board, args.format, table)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    print(f'Imported {count} cards into "{args.table}"')
+
+
+if __name__ == "__main__":
+    main()
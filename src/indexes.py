@@ -0,0 +1,499 @@
+import logging
+import pickle
+import re
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+from storage import replace_file
+
+WORD = re.compile(r"\w+")
+
+
+class TitleIndex:
+    """Counts the titles of boards, panels and cards, both across the whole
+    table and within the board or panel containing them, so uniqueness checks
+    are a hash lookup instead of a scan.
+
+    Titles are counted rather than stored in a set because nothing prevents
+    two items of the same kind from sharing a title, e.g. after an import.
+    """
+
+    def __init__(self) -> None:
+        self.__titles: Dict[Tuple[str, str], Counter] = {}
+
+    def add(self, kind: str, title: str, scope: str = None) -> None:
+        """Adds a title to the index.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of item: "board", "panel" or "card".
+        title : str
+            The title of the item.
+        scope : str, optional
+            The ID of the board or panel containing the item, by default None.
+        """
+        for key in {(kind, None), (kind, scope)}:
+            self.__titles.setdefault(key, Counter())[title] += 1
+
+    def add_many(self, kind: str, titles: Iterable[str],
+                 scope: str = None) -> None:
+        """Adds titles of items of the same kind and scope to the index.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of the items: "board", "panel" or "card".
+        titles : Iterable[str]
+            The titles of the items.
+        scope : str, optional
+            The ID of the board or panel containing the items, by default
+            None.
+        """
+        titles = list(titles)
+        for key in {(kind, None), (kind, scope)}:
+            self.__titles.setdefault(key, Counter()).update(titles)
+
+    def remove(self, kind: str, title: str, scope: str = None) -> None:
+        """Removes a title from the index.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of item: "board", "panel" or "card".
+        title : str
+            The title of the item.
+        scope : str, optional
+            The ID of the board or panel containing the item, by default None.
+        """
+        for key in {(kind, None), (kind, scope)}:
+            titles = self.__titles.get(key)
+            if titles is None:
+                continue
+            titles[title] -= 1
+            if titles[title] <= 0:
+                del titles[title]
+            if not titles and key[1] is not None:
+                del self.__titles[key]
+
+    def exists(self, kind: str, title: str, scope: str = None) -> bool:
+        """Returns whether an item of the given kind has the given title.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of item: "board", "panel" or "card".
+        title : str
+            The title to look for.
+        scope : str, optional
+            The ID of the board or panel to look in, by default None (the
+            whole table).
+
+        Returns
+        -------
+        bool
+            True if the title is used, False otherwise.
+        """
+        return self.__titles.get((kind, scope), {}).get(title, 0) > 0
+
+    def clear(self) -> None:
+        """Removes every title from the index."""
+        self.__titles.clear()
+
+
+class SearchIndex:
+    """Inverted index from the words of the titles and descriptions of cards
+    to the cards containing them, for full-text search.
+
+    Every query word matches the words of the index starting with it, and a
+    card matches a query if it matches all of its words. The board and panel
+    of each card are kept too, so deleting a board or panel removes its cards
+    even if they were never loaded.
+
+    Each indexed card is given a document number, and each word maps to the
+    array of the numbers of the documents containing it. Removing or
+    re-adding a card only retires its old number, and the arrays are
+    compacted once retired numbers make up a quarter of them, see
+    `compact()`.
+
+    The index can be saved next to the table file with the stamp of the
+    table file, see `Storage.stamp()`, and is only loaded back if the table
+    file still has the same stamp.
+    """
+
+    VERSION = 2
+
+    def __init__(self) -> None:
+        self.__postings: Dict[str, array] = {}
+        self.__cards: List[str | None] = []
+        self.__numbers: Dict[str, int] = {}
+        self.__owners: Dict[str, Tuple[str, str]] = {}
+        self.__vocabulary: List[str] | None = []
+
+    @staticmethod
+    def words(text: str) -> Set[str]:
+        """Returns the distinct lowercase words of a text.
+
+        Parameters
+        ----------
+        text : str
+            The text to split.
+
+        Returns
+        -------
+        Set[str]
+            The words of the text.
+        """
+        return set(WORD.findall(text.casefold()))
+
+    def add(self, card_id: str, board_id: str, panel_id: str,
+            *texts: str) -> None:
+        """Adds a card to the index, replacing it if it is already indexed.
+
+        Parameters
+        ----------
+        card_id : str
+            The ID of the card.
+        board_id : str
+            The ID of the board containing the card.
+        panel_id : str
+            The ID of the panel containing the card.
+        *texts : str
+            The title, description or other texts of the card.
+        """
+        if card_id in self.__numbers:
+            self.remove(card_id)
+        number = len(self.__cards)
+        self.__cards.append(card_id)
+        self.__numbers[card_id] = number
+        self.__owners[card_id] = (board_id, panel_id)
+        postings = self.__postings
+        for word in self.words(" ".join(texts)):
+            numbers = postings.get(word)
+            if numbers is None:
+                numbers = postings[word] = array("I")
+                self.__vocabulary = None
+            numbers.append(number)
+
+    def add_many(self, cards: Iterable[Tuple[str, str, str, str]]) -> None:
+        """Adds cards that are not indexed yet to the index, e.g. when
+        building it.
+
+        Parameters
+        ----------
+        cards : Iterable[Tuple[str, str, str, str]]
+            The ID of each card, of its board and of its panel, and its text.
+        """
+        new = defaultdict(list)
+        numbers = self.__numbers
+        owners = self.__owners
+        words = WORD.findall
+        for card_id, board_id, panel_id, text in cards:
+            number = numbers[card_id] = len(self.__cards)
+            self.__cards.append(card_id)
+            owners[card_id] = (board_id, panel_id)
+            for word in set(words(text.casefold())):
+                new[word].append(number)
+        for word, added in new.items():
+            self.__postings.setdefault(word, array("I")).extend(added)
+        self.__vocabulary = None
+
+    def remove(self, card_id: str) -> None:
+        """Removes a card from the index, if it is indexed.
+
+        Parameters
+        ----------
+        card_id : str
+            The ID of the card.
+        """
+        number = self.__numbers.pop(card_id, None)
+        if number is None:
+            return None
+        self.__cards[number] = None
+        del self.__owners[card_id]
+        if len(self.__cards) > 4 * (len(self.__cards) - len(self.__numbers)):
+            return None
+        self.compact()
+
+    def remove_scope(self, scope: str) -> None:
+        """Removes every card of a board or panel from the index.
+
+        Parameters
+        ----------
+        scope : str
+            The ID of the board or panel.
+        """
+        for card_id in [card_id for card_id, owner in self.__owners.items()
+                        if scope in owner]:
+            self.remove(card_id)
+
+    def move(self, card_id: str, board_id: str, panel_id: str) -> None:
+        """Records that a card moved to another panel.
+
+        Parameters
+        ----------
+        card_id : str
+            The ID of the card.
+        board_id : str
+            The ID of the board now containing the card.
+        panel_id : str
+            The ID of the panel now containing the card.
+        """
+        if card_id in self.__owners:
+            self.__owners[card_id] = (board_id, panel_id)
+
+    def owner(self, card_id: str) -> Tuple[str, str] | None:
+        """Returns the IDs of the board and panel containing a card, or None
+        if the card is not indexed."""
+        return self.__owners.get(card_id)
+
+    def search(self, query: str) -> List[str]:
+        """Returns the cards matching a query.
+
+        Parameters
+        ----------
+        query : str
+            The words to look for. Each word matches the words starting with
+            it.
+
+        Returns
+        -------
+        List[str]
+            The IDs of the cards containing all the words, in no particular
+            order, or an empty list if the query has no words.
+        """
+        postings = sorted(
+            (self._prefixed(prefix) for prefix in self.words(query)),
+            key=lambda arrays: sum(map(len, arrays)))
+        if not postings:
+            return []
+        matches = set(chain.from_iterable(postings[0]))
+        for arrays in postings[1:]:
+            if not matches:
+                break
+            matches = matches.intersection(chain.from_iterable(arrays))
+        cards = self.__cards
+        return [cards[number] for number in matches
+                if cards[number] is not None]
+
+    def compact(self) -> None:
+        """Renumbers the cards of the index so no number is retired."""
+        renumbered = {}
+        for card_id in self.__cards:
+            if card_id is not None:
+                renumbered[self.__numbers[card_id]] = len(renumbered)
+        postings = {}
+        for word, numbers in self.__postings.items():
+            numbers = array("I", [renumbered[number] for number in numbers
+                                  if number in renumbered])
+            if numbers:
+                postings[word] = numbers
+        self.__postings = postings
+        self.__cards = [card_id for card_id in self.__cards
+                        if card_id is not None]
+        self.__numbers = {card_id: number
+                          for number, card_id in enumerate(self.__cards)}
+        self.__vocabulary = None
+
+    def _prefixed(self, prefix: str) -> List[array]:
+        """Returns the arrays of the numbers of the cards containing each
+        word starting with `prefix`."""
+        if self.__vocabulary is None:
+            self.__vocabulary = sorted(self.__postings)
+        vocabulary = self.__vocabulary
+        arrays = []
+        for position in range(bisect_left(vocabulary, prefix),
+                              len(vocabulary)):
+            word = vocabulary[position]
+            if not word.startswith(prefix):
+                break
+            arrays.append(self.__postings[word])
+        return arrays
+
+    def save(self, path: str, stamp: Hashable) -> None:
+        """Writes the index to a file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the index file.
+        stamp : Hashable
+            The stamp of the table file the index matches.
+        """
+        replace_file(path, pickle.dumps(
+            (self.VERSION, stamp, self.__cards, self.__owners,
+             self.__postings),
+            protocol=pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def load(cls, path: str, stamp: Hashable) -> "SearchIndex | None":
+        """Reads an index written by `save()`.
+
+        Parameters
+        ----------
+        path : str
+            The path of the index file.
+        stamp : Hashable
+            The stamp of the table file.
+
+        Returns
+        -------
+        SearchIndex | None
+            The index, or None if there is no index file, it cannot be read,
+            or it was saved for another stamp of the table file.
+        """
+        try:
+            with open(path, "rb") as f:
+                version, saved_stamp, *state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logging.warning('Ignoring unreadable search index "%s"', path,
+                            exc_info=True)
+            return None
+        if version != cls.VERSION or saved_stamp != stamp:
+            return None
+        index = cls()
+        index.__cards, index.__owners, index.__postings = state
+        index.__numbers = {card_id: number
+                           for number, card_id in enumerate(index.__cards)
+                           if card_id is not None}
+        index.__vocabulary = None
+        return index
+
+    def __contains__(self, card_id: str) -> bool:
+        return card_id in self.__numbers
+
+    def __len__(self) -> int:
+        return len(self.__numbers)
+
+
+class DueIndex:
+    """Sorted index of the due dates and times of cards, for range queries
+    such as the cards due in the next days or the overdue cards.
+
+    Entries are kept as a list of `(due, card_id)` pairs sorted with
+    `bisect`, so a range query is two binary searches and a slice, and
+    adding or removing a card is a binary search and a list insertion or
+    deletion. Cards without a due date are not indexed.
+    """
+
+    def __init__(self) -> None:
+        self.__entries: List[Tuple[int, str]] = []
+        self.__dues: Dict[str, int] = {}
+
+    def set(self, card_id: str, due: int | None) -> None:
+        """Adds a card to the index or moves it to its new due date and
+        time. A card without a due date is removed.
+
+        Parameters
+        ----------
+        card_id : str
+            The ID of the card.
+        due : int | None
+            The due date and time of the card, see `Card.due`.
+        """
+        if self.__dues.get(card_id) == due:
+            return None
+        self.remove(card_id)
+        if due is not None:
+            insort(self.__entries, (due, card_id))
+            self.__dues[card_id] = due
+
+    def add_many(self, cards: Iterable[Tuple[str, int | None]]) -> None:
+        """Adds cards that are not indexed yet, sorting once.
+
+        Parameters
+        ----------
+        cards : Iterable[Tuple[str, int | None]]
+            The ID and due date and time of each card.
+        """
+        for card_id, due in cards:
+            if due is not None:
+                self.__entries.append((due, card_id))
+                self.__dues[card_id] = due
+        self.__entries.sort()
+
+    def remove(self, card_id: str) -> None:
+        """Removes a card from the index, if it is indexed."""
+        due = self.__dues.pop(card_id, None)
+        if due is None:
+            return None
+        position = bisect_left(self.__entries, (due, card_id))
+        del self.__entries[position]
+
+    def between(self, start: int | None = None, end: int | None = None,
+                limit: int | None = None) -> List[str]:
+        """Returns the cards due from `start` included to `end` excluded,
+        soonest first.
+
+        Parameters
+        ----------
+        start : int | None, optional
+            The earliest due date and time, by default None (no bound).
+        end : int | None, optional
+            The due date and time the cards are due before, by default None
+            (no bound).
+        limit : int | None, optional
+            The maximum number of cards returned, by default None (all).
+
+        Returns
+        -------
+        card_ids : List[str]
+            The IDs of the cards.
+        """
+        low, high = self._range(start, end)
+        if limit is not None:
+            high = min(high, low + limit)
+        return [card_id for _, card_id in self.__entries[low:high]]
+
+    def iterate(self, start: int | None = None,
+                end: int | None = None) -> Iterator[str]:
+        """Yields the cards due from `start` included to `end` excluded,
+        soonest first, without copying the range. The index must not change
+        while iterating.
+
+        Parameters
+        ----------
+        start : int | None, optional
+            The earliest due date and time, by default None (no bound).
+        end : int | None, optional
+            The due date and time the cards are due before, by default None
+            (no bound).
+
+        Yields
+        ------
+        card_id : str
+            The ID of each card.
+        """
+        entries = self.__entries
+        low, high = self._range(start, end)
+        for position in range(low, high):
+            yield entries[position][1]
+
+    def count(self, start: int | None = None, end: int | None = None) -> int:
+        """Returns the number of cards due from `start` included to `end`
+        excluded."""
+        low, high = self._range(start, end)
+        return high - low
+
+    def _range(self, start: int | None, end: int | None) -> Tuple[int, int]:
+        """Returns the positions of the first entry due at or after `start`
+        and of the first entry due at or after `end`."""
+        entries = self.__entries
+        low = 0 if start is None else bisect_left(entries, (start,))
+        high = len(entries) if end is None else bisect_left(entries, (end,))
+        return low, max(low, high)
+
+    def due(self, card_id: str) -> int | None:
+        """Returns the indexed due date and time of a card, or None."""
+        return self.__dues.get(card_id)
+
+    def __contains__(self, card_id: str) -> bool:
+        return card_id in self.__dues
+
+    def __len__(self) -> int:
+        return len(self.__dues)
@@ -3,6 +3,8 @@ import os
 import sys
 from tkinter import Tk, messagebox
 
+from event_log import init_event_logger
+
 if sys.version_info < (3, 10):
     print("Python 3.10 or higher is required to run Kanbaru. Please consider "
           "upgrading.")
@@ -11,8 +13,11 @@ if sys.version_info < (3, 10):
 try:
     from PySide6.QtWidgets import QApplication, QMainWindow
     from db import Table
+    from dialog import dialog_factory
+    from storage import default_table_path
     from ui.main import MainScreen
     from ui.welcome import WelcomeScreen
+    from ui.worker import TableWorker
     from utils import get_current_directory
 except ModuleNotFoundError:
     logging.warning("Required modules not found. Prompting user to install...")
@@ -43,8 +48,11 @@ except ModuleNotFoundError:
             from PySide6.QtWidgets import QApplication, QMainWindow
 
             from db import Table
+            from dialog import dialog_factory
+            from storage import default_table_path
             from ui.main import MainScreen
             from ui.welcome import WelcomeScreen
+            from ui.worker import TableWorker
             from utils import get_current_directory
     else:
         sys.exit(1)
@@ -57,9 +65,10 @@ class Kanbaru(QMainWindow):
         # Get current directory
         self.tb_path = None
         self.path = get_current_directory()
+        self.write_failed = False
 
         logging.info("Starting Kanbaru...")
-        logging.info(f'Current directory: "{self.path}"')
+        logging.info('Current directory: "%s"', self.path)
 
         # Initialize local table
         self.initialize_local_table()
@@ -70,71 +79,68 @@ class Kanbaru(QMainWindow):
     @staticmethod
     def init_event_logger(path: str, fmt: str, debug: bool = False,
                           stdout: bool = False) -> None:
-        """Initializes the event logger.
-        - Set the path of the event log file
-        - Set the format of the event log file
-        - Set the debug level of the event log file
-        - Set up the event logger
+        """Initializes the event logger, see `event_log.init_event_logger`.
         """
-        logging.basicConfig(
-            filename=path,
-            filemode="w",
-            format=fmt,
-            datefmt="%d-%b-%y %H:%M:%S",
-            level=logging.DEBUG if debug else logging.INFO,
-        )
-        if stdout:
-            logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+        init_event_logger(path, fmt, debug, stdout)
 
     def initialize_local_table(self) -> None:
         """Initializes the table instance.
         - Determine table path
         - Create table instance
         - Set table path
-        - Read table file
+        - Compress long descriptions in the table file
+        - Read table file, importing the old pickled table if the database
+        does not exist yet
+        - Start writing the table file in the background, reporting failed
+        writes to the user
         """
         if sys.platform == "win32":
             logging.info("Windows OS detected")
-            self.tb_path = os.path.join(
-                os.path.expanduser(
-                    "~"), "Documents", "Kanbaru", "Table.pickle"
-            )
         else:
             logging.info("Unix OS detected")
-            self.tb_path = os.path.join(
-                os.path.expanduser("~"), "Kanbaru", "Table.pickle"
-            )
+        self.tb_path = default_table_path()
         tb = Table.get_instance()
         tb.set_path(self.tb_path)
+        tb.set_compression("zlib")
         tb.read()
-        logging.info(f'Table path: "{tb.get_path()}"')
+        worker = TableWorker.get_instance()
+        worker.written.connect(self.on_written)
+        worker.write_failed.connect(self.on_write_failed)
+        tb.start_write_behind(done=worker.report_write)
+        logging.info('Table path: "%s"', tb.get_path())
         logging.info("Table instance initialized and read successfully")
 
+    def on_written(self) -> None:
+        """Warns again about the next failed write once a write succeeded.
+        """
+        self.write_failed = False
+
+    def on_write_failed(self, message: str) -> None:
+        """Warns the user that the table file could not be written, once
+        until a write succeeds again.
+
+        Parameters
+        ----------
+        message : str
+            The error message of the failed write.
+        """
+        if self.write_failed:
+            return None
+        self.write_failed = True
+        logging.warning("Failed to save the table: %s", message)
+        dialog_factory(
+            title="Saving Failed",
+            msg="The table could not be saved to the table file.\n"
+            "Saving is retried, see event.log for details.",
+            yes_no=False
+        )
+
     def show_main_screen(self):
         """Shows the main screen."""
         logging.info("Going to main screen...")
         MainScreen(self)
 
 
-def init_event_logger(path: str, fmt: str, debug: bool = False,
-                      stdout: bool = False) -> None:
-    """Initializes the event logger.
-    - Set the path of the event log file
-    - Set the format of the event log file
-    - Set the debug level of the event log file
-    - Set up the event logger
-    """
-    logging.basicConfig(
-        filename=path,
-        filemode="w",
-        format=fmt,
-        datefmt="%d-%b-%y %H:%M:%S",
-        level=logging.DEBUG if debug else logging.INFO,
-    )
-    if stdout:
-        logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
-
-
 if __name__ == "__main__":
     app = QApplication(sys.argv)
 
@@ -148,4 +154,7 @@ if __name__ == "__main__":
 
     window = Kanbaru()
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    TableWorker.get_instance().close()
+    Table.get_instance().stop_write_behind()
+    sys.exit(exit_code)
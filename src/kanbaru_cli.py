@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""Manages a Kanbaru table from the command line, without the GUI.
+
+The command line interface only imports the table and its objects, never
+PySide6, so it starts quickly and runs where no display is available. It
+reads and writes the same table file as the GUI, and creates it, or migrates
+it from an older format, the same way.
+
+Run from the src directory:
+
+    python kanbaru_cli.py list boards
+    python kanbaru_cli.py add card "Sprint 12" "To Do" "Fix login" \\
+        --date 01-04-2024 --time 09:30
+    python kanbaru_cli.py list cards --board "Sprint 12" --overdue
+    python kanbaru_cli.py stats
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+from itertools import islice
+from typing import List
+
+from db import Location, Table
+from kanbaru_objects import MINUTES_PER_DAY, Board, Card, Color, Panel, to_due
+from storage import default_table_path
+
+ID = re.compile(r"[0-9a-f]{32}")
+KINDS = {"board": Board, "panel": Panel, "card": Card}
+
+
+def find(table: Table, kind: str, ref: str, board: str = None,
+         panel: str = None) -> Location:
+    """Returns the location of the board, panel or card with the given ID,
+    or with the given title within the given board and panel.
+
+    Raises
+    ------
+    ValueError
+        If no item or several items match.
+    """
+    if ID.fullmatch(ref):
+        location = table.locate(ref)
+        if location is not None and isinstance(location.item, KINDS[kind]):
+            return location
+    scope = {}
+    if board is not None:
+        scope["board"] = find(table, "board", board).item
+    if panel is not None:
+        scope["panel"] = find(table, "panel", panel, board).item
+    locations = list(islice(table.query(kind, title=ref, **scope), 2))
+    if not locations:
+        raise ValueError(f'{kind.capitalize()} "{ref}" does not exist')
+    if len(locations) > 1:
+        raise ValueError(f'Several {kind}s are titled "{ref}", use the ID '
+                         "or narrow it down with --board or --panel")
+    return locations[0]
+
+
+def print_rows(rows: List[List[str]]) -> None:
+    """Prints rows as tab-separated values."""
+    for row in rows:
+        print("\t".join(str(value) for value in row))
+
+
+def list_items(table: Table, args: argparse.Namespace) -> None:
+    kind = args.kind[:-1]
+    scope = {}
+    if args.board is not None:
+        scope["board"] = find(table, "board", args.board).item
+    if args.panel is not None:
+        scope["panel"] = find(table, "panel", args.panel, args.board).item
+    if args.overdue or args.upcoming is not None:
+        if kind != "card":
+            raise ValueError("Only cards have due dates")
+        now = to_due(datetime.now())
+        if args.overdue:
+            scope["due_before"] = now
+        else:
+            scope["due_after"] = now
+            scope["due_before"] = now + args.upcoming * MINUTES_PER_DAY
+    locations = table.query(kind, title_contains=args.contains, **scope)
+    for location in islice(locations, args.limit):
+        item = location.item
+        match kind:
+            case "board":
+                print_rows([[item.id, item.title, Color(item.color).name]])
+            case "panel":
+                print_rows([[item.id, item.title, location.board.title]])
+            case "card":
+                print_rows([[item.id, item.title, location.board.title,
+                             location.panel.title, item.date, item.time]])
+
+
+def add_item(table: Table, args: argparse.Namespace) -> None:
+    match args.kind:
+        case "board":
+            if table.title_exists("board", args.title):
+                raise ValueError(f'Board "{args.title}" already exists')
+            item = table.add_board(args.title)
+            if args.color is not None:
+                table.change_board_color(item, Color[args.color])
+        case "panel":
+            board = find(table, "board", args.board).item
+            if table.title_exists("panel", args.title, board.id):
+                raise ValueError(f'Panel "{args.title}" already exists')
+            item = table.add_panel(board, args.title)
+        case "card":
+            panel = find(table, "panel", args.panel, args.board).item
+            if table.title_exists("card", args.title, panel.id):
+                raise ValueError(f'Card "{args.title}" already exists')
+            item = table.add_card(panel, Card(
+                args.title, args.date or "", args.time or "",
+                args.description or ""))
+    print(item.id)
+
+
+def move_card(table: Table, args: argparse.Namespace) -> None:
+    location = find(table, "card", args.card, args.board, args.from_panel)
+    destination = find(table, "panel", args.panel, location.board.id)
+    table.move_card(location.item, destination.item, args.index)
+
+
+def update_item(table: Table, args: argparse.Namespace) -> None:
+    location = find(table, args.kind, args.ref, getattr(args, "board", None),
+                    getattr(args, "panel", None))
+    item = location.item
+    title = item.title if args.title is None else args.title
+    # Panel titles are unique within their board, as in the GUI
+    scope = location.board.id if args.kind == "panel" else None
+    if title != item.title and table.title_exists(args.kind, title, scope):
+        raise ValueError(f'{args.kind.capitalize()} "{title}" already exists')
+    match args.kind:
+        case "board":
+            color = args.color or Color(item.color).name
+            table.update_board(item, Board(title, color, id=item.id))
+        case "panel":
+            table.update_panel(item, Panel(title, item.cards, id=item.id))
+        case "card":
+            table.update_card(item, Card(
+                title,
+                item.date if args.date is None else args.date,
+                item.time if args.time is None else args.time,
+                item.description if args.description is None
+                else args.description,
+                item.id))
+
+
+def delete_item(table: Table, args: argparse.Namespace) -> None:
+    location = find(table, args.kind, args.ref, getattr(args, "board", None),
+                    getattr(args, "panel", None))
+    match args.kind:
+        case "board":
+            if len(table.boards) == 1:
+                raise ValueError("The last board cannot be deleted")
+            table.delete_board(location.item)
+        case "panel":
+            table.delete_panel(location.item)
+        case "card":
+            table.delete_card(location.item)
+
+
+def export_cards(table: Table, args: argparse.Namespace) -> None:
+    from export import export
+    boards = [find(table, "board", title).item for title in args.board]
+    count = export(args.output, boards or None, args.format, table)
+    print(f'Exported {count} cards to "{args.output}"')
+
+
+def import_cards(table: Table, args: argparse.Namespace) -> None:
+    from importer import import_file
+    count = import_file(args.input, args.board, args.format, table)
+    print(f'Imported {count} cards from "{args.input}"')
+
+
+def show_stats(table: Table, args: argparse.Namespace) -> None:
+    boards = panels = cards = dated = 0
+    for board in table.boards:
+        boards += 1
+        for panel in table.iter_panels(board):
+            panels += 1
+            cards += len(panel.cards)
+            dated += sum(card.day is not None for card in panel.cards)
+    path = table.get_path()
+    size = sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names) \
+        if os.path.isdir(path) else os.path.getsize(path)
+    print_rows([
+        ["table", path],
+        ["size", f"{size / 2 ** 20:.1f} MiB"],
+        ["boards", boards],
+        ["panels", panels],
+        ["cards", cards],
+        ["dated cards", dated],
+        ["overdue", len(table.overdue())],
+        ["due in 7 days", len(table.upcoming(7))],
+    ])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="kanbaru-cli", description=__doc__.splitlines()[0])
+    parser.add_argument("--table", default=default_table_path(),
+                        help="the table file (default: %(default)s)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="log what the table does to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+    colors = [color.name for color in Color]
+
+    command = commands.add_parser(
+        "list", help="list boards, panels or cards, as tab-separated IDs, "
+        "titles and locations")
+    command.add_argument("kind", nargs="?", default="boards",
+                         choices=["boards", "panels", "cards"])
+    command.add_argument("--board", help="only list items of this board")
+    command.add_argument("--panel", help="only list cards of this panel")
+    command.add_argument("--contains", help="only list items whose title "
+                         "contains this text, ignoring case")
+    due = command.add_mutually_exclusive_group()
+    due.add_argument("--overdue", action="store_true",
+                     help="only list overdue cards, the longest overdue "
+                     "first")
+    due.add_argument("--upcoming", type=int, metavar="DAYS",
+                     help="only list cards due in the next DAYS days, "
+                     "soonest first")
+    command.add_argument("--limit", type=int, help="list at most LIMIT items")
+    command.set_defaults(function=list_items)
+
+    command = commands.add_parser("add", help="add a board, panel or card")
+    kinds = command.add_subparsers(dest="kind", required=True)
+    kind = kinds.add_parser("board", help="add a board")
+    kind.add_argument("title")
+    kind.add_argument("--color", choices=colors)
+    kind = kinds.add_parser("panel", help="add a panel to a board")
+    kind.add_argument("board")
+    kind.add_argument("title")
+    kind = kinds.add_parser("card", help="add a card to a panel")
+    kind.add_argument("board")
+    kind.add_argument("panel")
+    kind.add_argument("title")
+    kind.add_argument("--date", help="the due date, DD-MM-YYYY")
+    kind.add_argument("--time", help="the due time, HH:MM")
+    kind.add_argument("--description")
+    command.set_defaults(function=add_item)
+
+    command = commands.add_parser(
+        "move", help="move a card to a panel of the same board")
+    command.add_argument("card")
+    command.add_argument("panel", help="the destination panel")
+    command.add_argument("--index", type=int, help="the position in the "
+                         "destination panel (default: at the end)")
+    command.add_argument("--board", help="the board of the card")
+    command.add_argument("--from", dest="from_panel", metavar="PANEL",
+                         help="the panel of the card")
+    command.set_defaults(function=move_card)
+
+    for name, function in [("update", update_item), ("delete", delete_item)]:
+        command = commands.add_parser(name, help=f"{name} a board, panel or "
+                                      "card, given by ID or title")
+        kinds = command.add_subparsers(dest="kind", required=True)
+        for kind_name in KINDS:
+            kind = kinds.add_parser(kind_name, help=f"{name} a {kind_name}")
+            kind.add_argument("ref", metavar=kind_name.upper())
+            if kind_name != "board":
+                kind.add_argument("--board", help=f"the board of the "
+                                  f"{kind_name}")
+            if kind_name == "card":
+                kind.add_argument("--panel", help="the panel of the card")
+            if name == "update":
+                kind.add_argument("--title")
+            if name == "update" and kind_name == "board":
+                kind.add_argument("--color", choices=colors)
+            if name == "update" and kind_name == "card":
+                kind.add_argument("--date", help="the due date, DD-MM-YYYY, "
+                                  'or "" to clear it')
+                kind.add_argument("--time", help='the due time, HH:MM, or "" '
+                                  "to clear it")
+                kind.add_argument("--description")
+        command.set_defaults(function=function)
+
+    command = commands.add_parser(
+        "export", help="export cards to a .jsonl or .csv file")
+    command.add_argument("output")
+    command.add_argument("--board", action="append", default=[],
+                         help="export this board, can be repeated (default: "
+                         "all the boards)")
+    command.add_argument("--format", choices=["csv", "jsonl"])
+    command.set_defaults(function=export_cards)
+
+    command = commands.add_parser(
+        "import", help="import cards from a .csv, .jsonl or Trello .json "
+        "file")
+    command.add_argument("input")
+    command.add_argument("--board", help="import every card into this board")
+    command.add_argument("--format", choices=["csv", "jsonl", "trello"])
+    command.set_defaults(function=import_cards)
+
+    command = commands.add_parser("stats", help="count the boards, panels "
+                                  "and cards and the due cards")
+    command.set_defaults(function=show_stats)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        format="%(levelname)s - %(message)s",
+        level=logging.INFO if args.verbose else logging.WARNING)
+
+    table = Table.get_instance()
+    table.set_path(args.table)
+    table.set_compression("zlib")
+    try:
+        table.read()
+        args.function(table, args)
+        table.flush()
+    except (OSError, ValueError) as error:
+        print(f"{parser.prog}: error: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,173 @@
+import re
 from abc import ABC, abstractmethod
-from datetime import datetime
+from datetime import date as Date, datetime
 from enum import Enum
-from typing import List
+from typing import Callable, Iterable, List, Tuple
+from uuid import uuid4
+
+MINUTES_PER_DAY = 24 * 60
+MAX_DAY = Date.max.toordinal()
+
+_DATE = re.compile(r"(\d{1,2})-(\d{1,2})-(\d{4})")
+_TIME = re.compile(r"(\d{1,2}):(\d{2})")
+
+
+def parse_date(date: str) -> int:
+    """Returns the proleptic Gregorian ordinal of a DD-MM-YYYY date.
+
+    Parameters
+    ----------
+    date : str
+        The date, e.g. "31-12-2024".
+
+    Returns
+    -------
+    int
+        The ordinal of the date, 1 being 01-01-0001.
+
+    Raises
+    ------
+    ValueError
+        If the date does not follow the format or does not exist.
+    """
+    match = _DATE.fullmatch(date)
+    try:
+        day, month, year = map(int, match.groups())
+        return Date(year, month, day).toordinal()
+    except (AttributeError, ValueError):
+        raise ValueError("Card date must follow format DD-MM-YYYY.")
+
+
+def parse_time(time: str) -> int:
+    """Returns the number of minutes since midnight of an HH:MM time.
+
+    Parameters
+    ----------
+    time : str
+        The time, e.g. "23:59".
+
+    Returns
+    -------
+    int
+        The number of minutes since midnight.
+
+    Raises
+    ------
+    ValueError
+        If the time does not follow the format or does not exist.
+    """
+    match = _TIME.fullmatch(time)
+    if match is None or int(match[1]) > 23 or int(match[2]) > 59:
+        raise ValueError("Card time must follow format HH:MM.")
+    return int(match[1]) * 60 + int(match[2])
+
+
+def format_date(day: int | None) -> str:
+    """Returns a day ordinal as a DD-MM-YYYY date, or "" if it is None."""
+    if day is None:
+        return ""
+    date = Date.fromordinal(day)
+    return f"{date.day:02d}-{date.month:02d}-{date.year:04d}"
+
+
+def format_time(minute: int | None) -> str:
+    """Returns minutes since midnight as an HH:MM time, or "" if it is
+    None."""
+    if minute is None:
+        return ""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def to_day(date: str | int | None) -> int | None:
+    """Returns a date given as a day ordinal or a DD-MM-YYYY string as a day
+    ordinal. Missing dates, None or "", are returned as None."""
+    if isinstance(date, int):
+        if not 1 <= date <= MAX_DAY:
+            raise ValueError("Card date must follow format DD-MM-YYYY.")
+        return date
+    if date is None or date == "":
+        return None
+    return parse_date(date)
+
+
+def to_minute(time: str | int | None) -> int | None:
+    """Returns a time given as minutes since midnight or an HH:MM string as
+    minutes since midnight. Missing times, None or "", are returned as
+    None."""
+    if isinstance(time, int):
+        if not 0 <= time < MINUTES_PER_DAY:
+            raise ValueError("Card time must follow format HH:MM.")
+        return time
+    if time is None or time == "":
+        return None
+    return parse_time(time)
+
+
+def to_due(moment: datetime) -> int:
+    """Returns a date and time in minutes since the start of the day
+    ordinals, the unit of `Card.due`."""
+    return (moment.toordinal() * MINUTES_PER_DAY + moment.hour * 60
+            + moment.minute)
+
+
+def parse_dates(dates: Iterable[str]) -> Tuple[List[int | None], List[int]]:
+    """Parses many DD-MM-YYYY dates at once, e.g. when importing cards.
+    Each distinct string is only parsed once, and invalid dates are reported
+    instead of raising.
+
+    Parameters
+    ----------
+    dates : Iterable[str]
+        The dates. Empty strings and None are missing dates.
+
+    Returns
+    -------
+    days : List[int | None]
+        The day ordinal of each date, None if it is missing or invalid.
+    invalid : List[int]
+        The positions of the invalid dates.
+    """
+    return _parse_many(dates, to_day)
+
+
+def parse_times(times: Iterable[str]) -> Tuple[List[int | None], List[int]]:
+    """Parses many HH:MM times at once, like `parse_dates()`.
+
+    Parameters
+    ----------
+    times : Iterable[str]
+        The times. Empty strings and None are missing times.
+
+    Returns
+    -------
+    minutes : List[int | None]
+        The minutes since midnight of each time, None if it is missing or
+        invalid.
+    invalid : List[int]
+        The positions of the invalid times.
+    """
+    return _parse_many(times, to_minute)
+
+
+def _parse_many(values: Iterable[str], parse: Callable[[str], int | None]
+                ) -> Tuple[List[int | None], List[int]]:
+    parsed = {}
+    results = []
+    invalid = []
+    for position, value in enumerate(values):
+        try:
+            result = parsed[value]
+        except KeyError:
+            try:
+                result = parse(value)
+            except (TypeError, ValueError, OverflowError):
+                result = ValueError
+            parsed[value] = result
+        if result is ValueError:
+            invalid.append(position)
+            result = None
+        results.append(result)
+    return results, invalid
 
 
 class Color(Enum):
@@ -14,6 +180,38 @@ class Color(Enum):
 
 
 class KanbaruObject(ABC):
+    """Base class of boards, panels and cards.
+
+    The subclasses store their attributes in `__slots__` rather than in an
+    instance dictionary, since a table holds one object per card. Objects
+    hash by ID, so they can be kept in sets and used as dictionary keys.
+
+    Every object has a revision, which the table raises whenever the object
+    or anything it contains changes. Two objects are equal if they have the
+    same ID and revision, which takes constant time. Use `deep_equals()` to
+    compare the contents of two objects instead.
+    """
+
+    __slots__ = ("__revision",)
+
+    def __init__(self) -> None:
+        self.__revision = 0
+
+    @property
+    def revision(self) -> int:
+        return self.__revision
+
+    @revision.setter
+    def revision(self, revision: int) -> None:
+        if revision < self.__revision:
+            raise ValueError("Revision cannot decrease.")
+        self.__revision = revision
+
+    @property
+    @abstractmethod
+    def id(self) -> str:
+        pass
+
     @property
     @abstractmethod
     def title(self) -> str:
@@ -25,6 +223,21 @@ class KanbaruObject(ABC):
         pass
 
     def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.id == other.id and self.revision == other.revision
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    @abstractmethod
+    def deep_equals(self, other) -> bool:
+        """Returns whether the contents of the object, and of everything it
+        contains, are the same as those of another object. IDs and revisions
+        are not compared, and `other` only needs the same attributes.
+        """
         pass
 
     def __str__(self) -> str:
@@ -32,28 +245,85 @@ class KanbaruObject(ABC):
 
 
 class Card(KanbaruObject):
-    def __init__(self, title: str = "New Card", date: str = "", time: str = "",
-                 description: str = "") -> None:
+    """A card with a title, a due date and time, and a description.
+
+    The due date is stored as the proleptic Gregorian ordinal of the day and
+    the due time as the number of minutes since midnight, see `parse_date()`
+    and `parse_time()`. Either is None if the card has none. `date` and
+    `time` are the DD-MM-YYYY and HH:MM views of them, and can be set to
+    either a string or a packed integer, or to "" to remove them.
+
+    The description may be given as a function that loads it from the ID of
+    the card instead. It is called every time the description is accessed
+    until the description is set, so the loader decides what to cache.
+    """
+
+    __slots__ = ("__id", "__title", "__day", "__minute", "__description")
+
+    def __init__(self, title: str = "New Card", date: str | int = "",
+                 time: str | int = "",
+                 description: str | Callable[[str], str] = "",
+                 id: str = None) -> None:
+        super().__init__()
+        self.__id = id or uuid4().hex
         self.__title = title
-        self.__date = date
-        self.__time = time
+        self.__day = to_day(date)
+        self.__minute = to_minute(time)
         self.__description = description
 
+    @property
+    def id(self) -> str:
+        return self.__id
+
     @property
     def title(self) -> str:
         return self.__title
 
     @property
     def description(self) -> str:
-        return self.__description
+        description = self.__description
+        return description(self.__id) if callable(description) \
+            else description
+
+    @property
+    def description_loaded(self) -> bool:
+        """Whether the description is held by the card rather than loaded on
+        access."""
+        return not callable(self.__description)
+
+    @property
+    def description_loader(self) -> Callable[[str], str] | None:
+        """The function loading the description, or None if the description
+        is held by the card."""
+        description = self.__description
+        return description if callable(description) else None
 
     @property
     def date(self) -> str:
-        return self.__date
+        return format_date(self.__day)
 
     @property
     def time(self) -> str:
-        return self.__time
+        return format_time(self.__minute)
+
+    @property
+    def day(self) -> int | None:
+        """The due date as a day ordinal, or None."""
+        return self.__day
+
+    @property
+    def minute(self) -> int | None:
+        """The due time in minutes since midnight, or None."""
+        return self.__minute
+
+    @property
+    def due(self) -> int | None:
+        """The due date and time in minutes since the start of the day
+        ordinals, for sorting and comparing cards, or None if the card has
+        no due date. A card without a due time is due at midnight."""
+        if self.__day is None:
+            return None
+        return self.__day * MINUTES_PER_DAY + (self.__minute or 0)
 
     @title.setter
     def title(self, title: str):
@@ -68,31 +338,23 @@ class Card(KanbaruObject):
         self.__description = description
 
     @date.setter
-    def date(self, date: str):
+    def date(self, date: str | int):
         if date is None:
             raise ValueError("Card date cannot be None.")
-        try:
-            datetime.strptime(date, "%d-%m-%Y")
-        except ValueError:
-            raise ValueError("Card date must follow format DD-MM-YYYY.")
-        self.__date = date
+        self.__day = to_day(date)
 
     @time.setter
-    def time(self, time: str):
+    def time(self, time: str | int):
         if time is None:
             raise ValueError("Card time cannot be None.")
-        try:
-            datetime.strptime(time, "%H:%M")
-        except ValueError:
-            raise ValueError("Card time must follow format HH:MM.")
-        self.__time = time
+        self.__minute = to_minute(time)
 
-    def __eq__(self, card):
+    def deep_equals(self, card) -> bool:
         return (
             self.__title == card.title and
-            self.__date == card.date and
-            self.__time == card.time and
-            self.__description == card.description
+            self.date == card.date and
+            self.time == card.time and
+            self.description == card.description
         )
 
     def __str__(self):
@@ -103,10 +365,18 @@ class Card(KanbaruObject):
 
 
 class Panel(KanbaruObject):
+    __slots__ = ("__id", "__title", "__card_lists")
+
     def __init__(self, title: str = "New Panel",
-                 card_lists: List[Card] = []) -> None:
+                 card_lists: List[Card] = None, id: str = None) -> None:
+        super().__init__()
+        self.__id = id or uuid4().hex
         self.__title = title
-        self.__card_lists = card_lists
+        self.__card_lists = card_lists if card_lists is not None else []
+
+    @property
+    def id(self) -> str:
+        return self.__id
 
     @property
     def title(self) -> str:
@@ -130,10 +400,12 @@ class Panel(KanbaruObject):
             raise ValueError("Card already exists.")
         self.__card_lists.append(card)
 
-    def __eq__(self, panel):
+    def deep_equals(self, panel) -> bool:
         return (
             self.__title == panel.title
-            and self.__card_lists == panel.cards
+            and len(self.__card_lists) == len(panel.cards)
+            and all(card.deep_equals(other) for card, other in
+                    zip(self.__card_lists, panel.cards))
         )
 
     def __str__(self):
@@ -144,10 +416,21 @@ class Panel(KanbaruObject):
 
 
 class Board(KanbaruObject):
+    """A board of panels.
+
+    The panels may be given as a function that returns them instead, in which
+    case it is called with the board the first time the panels are accessed.
+    """
+
+    __slots__ = ("__id", "__title", "__color", "__panels_lists")
+
     def __init__(self, title: str = "New Board", color: str = "LIGHTBLUE",
-                 panels_lists: List[Panel] = []):
+                 panels_lists: List[Panel] | Callable[["Board"], List[Panel]]
+                 = None, id: str = None):
+        super().__init__()
+        self.__id = id or uuid4().hex
         self.__title = title
-        self.__panels_lists = panels_lists
+        self.__panels_lists = panels_lists if panels_lists is not None else []
         try:
             self.__color = color
             Color[self.__color].value
@@ -157,6 +440,10 @@ class Board(KanbaruObject):
                 "LIGHTBLUE, ROSE, GOLD, GREEN, LAVENDER, TEAL."
             )
 
+    @property
+    def id(self) -> str:
+        return self.__id
+
     @property
     def title(self) -> str:
         return self.__title
@@ -167,8 +454,15 @@ class Board(KanbaruObject):
 
     @property
     def panels(self) -> List[Panel]:
+        if callable(self.__panels_lists):
+            self.__panels_lists = self.__panels_lists(self)
         return self.__panels_lists
 
+    @property
+    def loaded(self) -> bool:
+        """Whether the panels of the board have been loaded."""
+        return not callable(self.__panels_lists)
+
     @title.setter
     def title(self, title: str) -> None:
         if title is None:
@@ -177,9 +471,9 @@ class Board(KanbaruObject):
 
     @color.setter
     def color(self, color: str) -> None:
-        if color in Color.value2member_map_:
-            self.__color = color
-        else:
+        try:
+            self.__color = Color(color).name
+        except ValueError:
             raise ValueError(
                 "Board color must be one of the following: "
                 "LIGHTBLUE, ROSE, GOLD, GREEN, LAVENDER, TEAL."
@@ -193,11 +487,13 @@ class Board(KanbaruObject):
             raise ValueError("Panel already exists in board.")
         self.__panels_lists.append(panel)
 
-    def __eq__(self, board):
+    def deep_equals(self, board) -> bool:
         return (
             self.title == board.title and
             self.color == board.color and
-            self.panels == board.panels
+            len(self.panels) == len(board.panels) and
+            all(panel.deep_equals(other) for panel, other in
+                zip(self.panels, board.panels))
         )
 
     def __str__(self):
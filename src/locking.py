@@ -0,0 +1,193 @@
+"""Advisory locking of the table file, so several Kanbaru processes, e.g. the
+application and the command line interface, can share a table.
+
+The lock is taken on a small file next to the table file rather than on the
+table file itself, because most backends replace the table file on every
+write. The lock file also holds a counter that every writer increments while
+holding the lock exclusively, so other processes can tell whether the table
+changed even on file systems with a coarse modification time.
+"""
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+UNLOCKED, SHARED, EXCLUSIVE = 0, 1, 2
+COUNTER = struct.Struct("<Q")
+
+
+class FileLock:
+    """A re-entrant advisory lock on a lock file, shared between processes.
+
+    Any number of processes may hold the lock shared, e.g. to read the table,
+    but a process holding it exclusively, e.g. to write the table, keeps every
+    other process out. Within a process, the lock is held by one thread at a
+    time and may be taken again by the thread holding it. Taking it
+    exclusively while holding it shared upgrades it until the inner block
+    ends.
+
+    Windows has no shared locks, so the lock is always exclusive there.
+
+    If the lock file cannot be created, e.g. on a read-only directory, a
+    warning is logged and the lock does nothing.
+
+    Parameters
+    ----------
+    path : str
+        The path of the lock file.
+    timeout : float, optional
+        The number of seconds to wait for another process to release the
+        lock, by default 10.
+    """
+
+    POLL_INTERVAL: float = 0.01
+
+    def __init__(self, path: str, timeout: float = 10.0) -> None:
+        self._path = path
+        self._timeout = timeout
+        self._lock = threading.RLock()
+        self._levels: List[int] = []
+        self._file = None
+        self._failed = False
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @contextmanager
+    def shared(self, timeout: float = None) -> Iterator[None]:
+        """Holds the lock shared for the duration of the block.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The number of seconds to wait for the lock, by default None (the
+            timeout of the lock).
+
+        Raises
+        ------
+        TimeoutError
+            If another process kept the lock for longer than the timeout.
+        """
+        with self._hold(SHARED, timeout):
+            yield
+
+    @contextmanager
+    def exclusive(self, timeout: float = None) -> Iterator[None]:
+        """Holds the lock exclusively for the duration of the block, see
+        `shared()`."""
+        with self._hold(EXCLUSIVE, timeout):
+            yield
+
+    @contextmanager
+    def _hold(self, level: int, timeout: float | None) -> Iterator[None]:
+        timeout = self._timeout if timeout is None else timeout
+        if not self._lock.acquire(timeout=timeout):
+            raise TimeoutError(f'Lock "{self._path}" is held by another '
+                               f'thread')
+        try:
+            if sys.platform == "win32":
+                level = EXCLUSIVE
+            held = self._levels[-1] if self._levels else UNLOCKED
+            if level > held:
+                self._acquire(level, timeout)
+            self._levels.append(max(level, held))
+            try:
+                yield
+            finally:
+                self._levels.pop()
+                if held < max(level, held):
+                    self._set(held)
+        finally:
+            self._lock.release()
+
+    def _open(self) -> bool:
+        """Opens the lock file, creating it if needed. Returns whether the
+        lock file can be used."""
+        if self._file is not None or self._failed:
+            return self._file is not None
+        try:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._file = os.fdopen(fd, "r+b", buffering=0)
+        except OSError:
+            self._failed = True
+            logging.warning(
+                'Cannot open lock file "%s", the table file is not protected '
+                'from other processes', self._path, exc_info=True)
+        return self._file is not None
+
+    def _acquire(self, level: int, timeout: float) -> None:
+        """Takes the lock file at the given level, waiting for other
+        processes to release it until the timeout."""
+        if not self._open():
+            return None
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._set(level)
+                return None
+            except (BlockingIOError, PermissionError):
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f'Table file is locked by another process, see '
+                        f'"{self._path}"')
+                time.sleep(self.POLL_INTERVAL)
+
+    def _set(self, level: int) -> None:
+        """Sets the level of the lock file without waiting."""
+        if self._file is None:
+            return None
+        if sys.platform == "win32":
+            # The counter must stay readable, so a byte past it is locked
+            self._file.seek(COUNTER.size)
+            msvcrt.locking(self._file.fileno(),
+                           msvcrt.LK_NBLCK if level else msvcrt.LK_UNLCK, 1)
+            return None
+        fcntl.flock(self._file.fileno(), {
+            UNLOCKED: fcntl.LOCK_UN,
+            SHARED: fcntl.LOCK_SH | fcntl.LOCK_NB,
+            EXCLUSIVE: fcntl.LOCK_EX | fcntl.LOCK_NB,
+        }[level])
+
+    def generation(self) -> int:
+        """Returns the number of writes recorded by `bump()`, by any process,
+        or 0 if the lock file cannot be used."""
+        with self._lock:
+            if not self._open():
+                return 0
+            self._file.seek(0)
+            data = self._file.read(COUNTER.size)
+            return COUNTER.unpack(data)[0] if len(data) == COUNTER.size \
+                else 0
+
+    def bump(self) -> None:
+        """Records a write of the table. Must be called while holding the
+        lock exclusively."""
+        with self._lock:
+            if not self._open():
+                return None
+            generation = self.generation() + 1
+            self._file.seek(0)
+            self._file.write(COUNTER.pack(generation))
+
+    def close(self) -> None:
+        """Releases the lock and closes the lock file."""
+        with self._lock:
+            if self._file is not None:
+                if self._levels:
+                    self._set(UNLOCKED)
+                self._file.close()
+                self._file = None
+            self._levels = []
@@ -0,0 +1,1206 @@
+import logging
+import os
+import pickle
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import (Callable, Dict, Iterable, Iterator, List, NamedTuple,
+                    Tuple)
+from uuid import uuid4
+
+from kanbaru_objects import to_day, to_minute
+
+
+class Change(NamedTuple):
+    """A single mutation of the table, addressed by the ID of the affected
+    board, panel or card.
+
+    Attributes
+    ----------
+    op : str
+        The name of the mutation, e.g. "update_card" or "delete_panel".
+    target : str
+        The ID of the board, panel or card the mutation applies to, or None
+        if it applies to the whole table.
+    values : Dict
+        The new values, if the mutation carries any.
+    """
+    op: str
+    target: str = None
+    values: Dict = None
+
+
+def default_table_path() -> str:
+    """Returns the path of the table file used by default, in the Kanbaru
+    folder of the documents folder on Windows or of the home folder
+    elsewhere."""
+    if sys.platform == "win32":
+        return os.path.join(os.path.expanduser("~"), "Documents", "Kanbaru",
+                            "Table.db")
+    return os.path.join(os.path.expanduser("~"), "Kanbaru", "Table.db")
+
+
+def replace_file(path: str, content: bytes) -> None:
+    """Writes a file through a temporary file, so it is never left half
+    written."""
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def file_stamp(*paths: str) -> Tuple:
+    """Returns the size and modification time of each file, or None for
+    files that do not exist."""
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(stamps)
+
+
+def replay_changes(data: List[Dict], changes: Iterable[Change]) -> None:
+    """Applies changes to table data in place. The data may be any subset of
+    the boards of the table, as long as the changes only touch those boards.
+    Changes to boards, panels or cards that are not in the data, e.g. because
+    another process deleted them, are skipped."""
+    boards = {board["_Board__id"]: board for board in data}
+    panels = {}
+    cards = {}
+
+    def index_board(board: Dict) -> None:
+        if callable(board["_Board__panels_lists"]):
+            return None
+        for panel in board["_Board__panels_lists"]:
+            index_panel(board, panel)
+
+    def index_panel(board: Dict, panel: Dict) -> None:
+        panels[panel["_Panel__id"]] = (board, panel)
+        for card in panel["_Board__panels"]:
+            cards[card["_Card__id"]] = panel
+
+    def position(items: List[Dict], key: str, item_id: str) -> int:
+        return next(index for index, item in enumerate(items)
+                    if item[key] == item_id)
+
+    def order(items: List[Dict], key: str, item_ids: List[str]) -> None:
+        remaining = {item[key]: item for item in items}
+        items[:] = [remaining.pop(item_id) for item_id in item_ids
+                    if item_id in remaining] + list(remaining.values())
+
+    for board in data:
+        index_board(board)
+    for change in changes:
+        values = change.values
+        try:
+            match change.op:
+                case "insert_board":
+                    board = values["board"]
+                    data.insert(values["index"], board)
+                    boards[board["_Board__id"]] = board
+                    index_board(board)
+                case "update_board":
+                    boards[change.target].update(values)
+                case "delete_board":
+                    del data[position(data, "_Board__id", change.target)]
+                case "order_boards":
+                    order(data, "_Board__id", values["order"])
+                case "insert_panel":
+                    board = boards[values["board"]]
+                    board["_Board__panels_lists"].insert(
+                        values["index"], values["panel"])
+                    index_panel(board, values["panel"])
+                case "update_panel":
+                    panels[change.target][1].update(values)
+                case "delete_panel":
+                    board, _ = panels[change.target]
+                    del board["_Board__panels_lists"][position(
+                        board["_Board__panels_lists"], "_Panel__id",
+                        change.target)]
+                case "order_panels":
+                    order(boards[change.target]["_Board__panels_lists"],
+                          "_Panel__id", values["order"])
+                case "insert_card":
+                    panel = panels[values["panel"]][1]
+                    panel["_Board__panels"].insert(values["index"],
+                                                   values["card"])
+                    cards[values["card"]["_Card__id"]] = panel
+                case "update_card":
+                    panel = cards[change.target]
+                    panel["_Board__panels"][position(
+                        panel["_Board__panels"], "_Card__id",
+                        change.target)].update(values)
+                case "delete_card":
+                    panel = cards[change.target]
+                    del panel["_Board__panels"][position(
+                        panel["_Board__panels"], "_Card__id", change.target)]
+                case "move_card":
+                    panel = cards[change.target]
+                    destination = panels[values["panel"]][1]
+                    card = panel["_Board__panels"].pop(position(
+                        panel["_Board__panels"], "_Card__id", change.target))
+                    destination["_Board__panels"].insert(values["index"],
+                                                         card)
+                    cards[change.target] = destination
+                case _:
+                    raise ValueError(f'Unknown change "{change.op}"')
+        except (KeyError, StopIteration):
+            logging.info('Skipping change "%s" of missing "%s"', change.op,
+                         change.target)
+
+
+class Storage(ABC):
+    """Base class for table storage backends. A backend loads the table data
+    from its file, dumps the whole table to it, and commits the changes made
+    since the last write.
+
+    The table data is exchanged as a list of board dictionaries, the same
+    layout that has always been pickled to the table file.
+
+    Attributes
+    ----------
+    incremental : bool
+        Whether the backend can commit changes one by one. Otherwise every
+        write dumps the whole table.
+    lazy : bool
+        Whether the panels of a board may be loaded as a function that
+        decodes them on demand. Such functions are handed back to `dump()`
+        for boards whose panels were never accessed.
+
+    Backends that store the descriptions of cards apart from the cards may
+    load `load_description` in place of each description. It is handed back
+    to `dump()` for cards whose description was never accessed.
+
+    Long descriptions may be given as bytes compressed by
+    `compression.compress_text()`. Backends store and load them unchanged.
+    """
+
+    incremental: bool = False
+    lazy: bool = False
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @abstractmethod
+    def load(self) -> List[Dict]:
+        """Loads the table data from the table file.
+
+        Returns
+        -------
+        data : List[Dict]
+            The table data.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the table file does not exist.
+        """
+        pass
+
+    @abstractmethod
+    def dump(self, data: List[Dict]) -> None:
+        """Writes the whole table data to the table file.
+
+        Parameters
+        ----------
+        data : List[Dict]
+            The table data.
+        """
+        pass
+
+    def outdated(self) -> bool:
+        """Returns whether the table file must be converted by `migrate()`
+        before it is loaded."""
+        return False
+
+    def migrate(self) -> None:
+        """Converts an older table file to the format of the backend. Called
+        while holding the lock of the table file exclusively, if
+        `outdated()`."""
+        pass
+
+    def load_description(self, card_id: str) -> str:
+        """Loads the description of a card. Only called on backends that load
+        descriptions lazily.
+
+        Parameters
+        ----------
+        card_id : str
+            The ID of the card.
+
+        Returns
+        -------
+        str | bytes
+            The description of the card, or the compressed description.
+        """
+        raise NotImplementedError
+
+    def commit(self, changes: List[Change]) -> None:
+        """Persists the changes made since the last write. Only called on
+        incremental backends.
+
+        Parameters
+        ----------
+        changes : List[Change]
+            The changes made since the last write.
+        """
+        raise NotImplementedError
+
+    def refresh(self) -> None:
+        """Forgets what the backend remembers of the table file between
+        commits, before committing to a table file that another process
+        changed. Only called on incremental backends."""
+        pass
+
+    def stamp(self) -> Tuple:
+        """Returns a stamp of the table file that changes whenever the table
+        file is written, e.g. to tell whether data derived from the table is
+        still current.
+
+        Returns
+        -------
+        Tuple
+            The size and modification time of each file of the table.
+        """
+        return file_stamp(self._path)
+
+    def close(self) -> None:
+        """Releases any resource held by the backend."""
+        pass
+
+
+class PickleStorage(Storage):
+    """Stores the whole table as a single pickled list of dictionaries."""
+
+    def load(self) -> List[Dict]:
+        with open(self._path, "rb") as f:
+            return pickle.load(f)
+
+    def dump(self, data: List[Dict]) -> None:
+        with open(self._path, "wb") as f:
+            pickle.dump(data, f)
+
+
+class JournalStorage(Storage):
+    """Stores the table as a pickled snapshot, in the same format as
+    `PickleStorage`, plus a journal file to which every commit appends its
+    changes. Loading replays the journal on top of the snapshot.
+
+    Each journal record is a pickled `(timestamp, op, target, values)` tuple,
+    so the journal doubles as a log of the edits made since the last
+    snapshot. Once the journal holds more than `max_records` records or
+    `max_bytes` bytes, the next commit compacts it: the snapshot is rewritten
+    with the replayed table and the journal starts over.
+
+    The journal starts with a header holding the length and checksum of the
+    snapshot it applies to, so a journal left behind by an interrupted
+    compaction is ignored instead of being replayed twice. A record cut short
+    by a crash is skipped when loading, which only holds the shared lock of
+    the table file, and cut off by the next commit, under the exclusive lock.
+    """
+
+    incremental = True
+
+    max_records: int = 1000
+    max_bytes: int = 1 << 20
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self._records: int = 0
+        # The offset of the truncated record at the end of the journal and
+        # the size of the journal, as last loaded
+        self._torn: Tuple[int, int] | None = None
+        # Whether the journal last loaded belongs to an older snapshot
+        self._stale: bool = False
+
+    @property
+    def journal_path(self) -> str:
+        """The path of the journal file."""
+        return os.path.splitext(self._path)[0] + ".journal"
+
+    def stamp(self) -> Tuple:
+        return file_stamp(self._path, self.journal_path)
+
+    def load(self) -> List[Dict]:
+        with open(self._path, "rb") as f:
+            snapshot = f.read()
+        data = pickle.loads(snapshot)
+        self._records = 0
+        self._torn = None
+        self._stale = False
+        try:
+            with open(self.journal_path, "rb") as f:
+                header = pickle.load(f)
+                if header != self._header(snapshot):
+                    logging.info('Ignoring journal "%s" of an older snapshot',
+                                 self.journal_path)
+                    self._stale = True
+                    return data
+                replay_changes(data, self._read_records(f))
+        except FileNotFoundError:
+            pass
+        return data
+
+    def _read_records(self, f) -> Iterator[Change]:
+        """Yields the records of the journal. A record cut short by a crash
+        is ignored, and remembered so the next commit cuts it off."""
+        while True:
+            offset = f.tell()
+            try:
+                _, op, target, values = pickle.load(f)
+            except EOFError:
+                return None
+            except Exception:
+                logging.warning('Journal "%s" ends with a truncated record, '
+                                'ignoring it', self.journal_path)
+                self._torn = (offset, os.fstat(f.fileno()).st_size)
+                return None
+            self._records += 1
+            yield Change(op, target, values)
+
+    def dump(self, data: List[Dict]) -> None:
+        snapshot = pickle.dumps(data)
+        replace_file(self._path, snapshot)
+        replace_file(self.journal_path,
+                      pickle.dumps(self._header(snapshot)))
+        self._records = 0
+        self._torn = None
+        self._stale = False
+
+    def commit(self, changes: List[Change]) -> None:
+        if self._stale or not os.path.exists(self.journal_path):
+            # A journal of an older snapshot, left behind by an interrupted
+            # compaction, is started over, as its records are never replayed
+            with open(self._path, "rb") as f:
+                snapshot = f.read()
+            replace_file(self.journal_path,
+                          pickle.dumps(self._header(snapshot)))
+            self._stale = False
+        elif self._torn is not None:
+            offset, size = self._torn
+            # Unless another process cut it off and appended to the journal
+            if os.path.getsize(self.journal_path) == size:
+                os.truncate(self.journal_path, offset)
+                logging.info('Dropped the truncated record of journal "%s"',
+                             self.journal_path)
+        self._torn = None
+        now = time.time()
+        with open(self.journal_path, "ab") as f:
+            for change in changes:
+                pickle.dump((now, *change), f)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        self._records += len(changes)
+        if self._records > self.max_records or size > self.max_bytes:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrites the snapshot with the journal applied and empties the
+        journal."""
+        records = self._records
+        self.dump(self.load())
+        logging.info('Compacted %d journal record%s into "%s"', records,
+                     "s" if records != 1 else "", self._path)
+
+    @staticmethod
+    def _header(snapshot: bytes) -> tuple:
+        return ("snapshot", len(snapshot), zlib.crc32(snapshot))
+
+
+class LazyPanels:
+    """Decodes the panels of one board of a `ContainerStorage` when called.
+
+    Attributes
+    ----------
+    offset : int
+        The position of the pickled panels in the data section of the file.
+    length : int
+        The length of the pickled panels.
+    """
+
+    def __init__(self, storage: "ContainerStorage", offset: int,
+                 length: int) -> None:
+        self.storage = storage
+        self.offset = offset
+        self.length = length
+
+    def __call__(self) -> List[Dict]:
+        return pickle.loads(self.storage.read_raw(self))
+
+
+class ContainerStorage(Storage):
+    """Stores the table in a single file whose header indexes the boards, so
+    the panels of each board are only decoded when first accessed.
+
+    The file starts with `MAGIC` and the length of the header. The header is
+    a pickled list with the ID, title and color of every board and the offset
+    and length of its pickled panels in the data section that follows.
+    Loading decodes the header only and returns a `LazyPanels` in place of
+    the panels of each board. Dumping copies the bytes of the boards whose
+    panels were never decoded instead of pickling them again.
+    """
+
+    lazy = True
+
+    MAGIC = b"KANBARU\x01"
+    HEADER = struct.Struct(">Q")
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self._lock = threading.Lock()
+        self._data_start: int = 0
+
+    def load(self) -> List[Dict]:
+        with self._lock, open(self._path, "rb") as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError(f'"{self._path}" is not a Kanbaru container')
+            length, = self.HEADER.unpack(f.read(self.HEADER.size))
+            header = pickle.loads(f.read(length))
+            self._data_start = f.tell()
+        return [
+            {
+                "_Board__id": board["_Board__id"],
+                "_Board__title": board["_Board__title"],
+                "_Board__color": board["_Board__color"],
+                "_Board__panels_lists": LazyPanels(
+                    self, board["offset"], board["length"])
+            }
+            for board in header
+        ]
+
+    def read_raw(self, panels: LazyPanels) -> bytes:
+        """Returns the pickled panels of a board.
+
+        Parameters
+        ----------
+        panels : LazyPanels
+            The panels of the board, as returned by `load()`.
+
+        Returns
+        -------
+        bytes
+            The pickled panels.
+        """
+        with self._lock:
+            return self._encode(panels)
+
+    def dump(self, data: List[Dict]) -> None:
+        with self._lock:
+            blobs = [self._encode(board.get("_Board__panels_lists", []))
+                     for board in data]
+            entries = []
+            offset = 0
+            for board, blob in zip(data, blobs):
+                entries.append({
+                    "_Board__id": board.get("_Board__id") or uuid4().hex,
+                    "_Board__title": board.get("_Board__title", ""),
+                    "_Board__color": board.get("_Board__color", "LIGHTBLUE"),
+                    "offset": offset,
+                    "length": len(blob)
+                })
+                offset += len(blob)
+            header = pickle.dumps(entries)
+            temp_path = self._path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(self.MAGIC)
+                f.write(self.HEADER.pack(len(header)))
+                f.write(header)
+                f.writelines(blobs)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self._path)
+            self._data_start = (len(self.MAGIC) + self.HEADER.size
+                                + len(header))
+            for board, entry in zip(data, entries):
+                panels = board.get("_Board__panels_lists")
+                if isinstance(panels, LazyPanels) and panels.storage is self:
+                    panels.offset = entry["offset"]
+
+    def _encode(self, panels: List[Dict] | Callable[[], List[Dict]]) -> bytes:
+        """Returns the pickled panels of a board, copied from the current
+        file if they were never decoded."""
+        if isinstance(panels, LazyPanels) and panels.storage is self:
+            with open(self._path, "rb") as f:
+                f.seek(self._data_start + panels.offset)
+                return f.read(panels.length)
+        if callable(panels):
+            panels = panels()
+        return pickle.dumps(panels)
+
+
+class ShardedStorage(Storage):
+    """Stores the table in a directory with a manifest and one file per
+    board.
+
+    The manifest holds the ID, title and color of every board, in order, and
+    each board file holds the pickled panels of one board. Committing changes
+    rewrites the manifest only if boards were added, updated, deleted or
+    reordered, and rewrites only the files of the boards whose panels or
+    cards changed.
+
+    Loading reads the manifest and starts reading the board files on a pool
+    of threads, in the order of the boards. The panels of a board are handed
+    to the table when first accessed, waiting for their file if needed.
+    """
+
+    incremental = True
+    lazy = True
+
+    MANIFEST = "manifest.pickle"
+    EXTENSION = ".board"
+
+    def __init__(self, path: str, workers: int = 4) -> None:
+        super().__init__(path)
+        self._workers = workers
+        self._pool: ThreadPoolExecutor = None
+        self._manifest: List[Dict] = []
+        self._shards: Dict[str, Future] = {}
+        self._owners: Dict[str, str] = {}
+
+    @property
+    def manifest_path(self) -> str:
+        """The path of the manifest file."""
+        return os.path.join(self._path, self.MANIFEST)
+
+    def stamp(self) -> Tuple:
+        try:
+            names = sorted(os.listdir(self._path))
+        except FileNotFoundError:
+            return ()
+        return tuple(zip(names, file_stamp(
+            *(os.path.join(self._path, name) for name in names))))
+
+    def shard_path(self, board_id: str) -> str:
+        """Returns the path of the file of a board.
+
+        Parameters
+        ----------
+        board_id : str
+            The ID of the board.
+
+        Returns
+        -------
+        str
+            The path of the file of the board.
+        """
+        return os.path.join(self._path, board_id + self.EXTENSION)
+
+    def load(self) -> List[Dict]:
+        with open(self.manifest_path, "rb") as f:
+            self._manifest = pickle.load(f)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                self._workers, thread_name_prefix="kanbaru-shard")
+        self._owners = {}
+        self._shards = {
+            board["_Board__id"]: self._pool.submit(
+                self._read_shard, board["_Board__id"])
+            for board in self._manifest
+        }
+        return [
+            dict(board, _Board__panels_lists=partial(
+                self._take_shard, board["_Board__id"]))
+            for board in self._manifest
+        ]
+
+    def _read_shard(self, board_id: str) -> List[Dict]:
+        with open(self.shard_path(board_id), "rb") as f:
+            return pickle.load(f)
+
+    def _take_shard(self, board_id: str) -> List[Dict]:
+        """Returns the panels of a board, read in the background by
+        `load()` if possible."""
+        shard = self._shards.pop(board_id, None)
+        panels = (shard.result() if shard is not None and not shard.cancelled()
+                  else self._read_shard(board_id))
+        self._own(board_id, panels)
+        return panels
+
+    def _own(self, board_id: str, panels: List[Dict]) -> None:
+        """Records the board owning each panel and card, so changes to them
+        can be routed to the file of the board."""
+        for panel in panels:
+            self._owners[panel["_Panel__id"]] = board_id
+            for card in panel["_Board__panels"]:
+                self._owners[card["_Card__id"]] = board_id
+
+    def _owner(self, item_id: str) -> str:
+        if item_id not in self._owners:
+            for board in self._manifest:
+                if board["_Board__id"] in self._shards:
+                    self._take_shard(board["_Board__id"])
+        if item_id not in self._owners:
+            owned = set(self._owners.values())
+            for board in self._manifest:
+                if board["_Board__id"] not in owned:
+                    self._own(board["_Board__id"],
+                              self._read_shard(board["_Board__id"]))
+        return self._owners[item_id]
+
+    def refresh(self) -> None:
+        with open(self.manifest_path, "rb") as f:
+            self._manifest = pickle.load(f)
+        for shard in self._shards.values():
+            shard.cancel()
+        self._shards = {}
+        self._owners = {}
+
+    def dump(self, data: List[Dict]) -> None:
+        os.makedirs(self._path, exist_ok=True)
+        manifest = []
+        for board in data:
+            board_id = board.get("_Board__id") or uuid4().hex
+            panels = board.get("_Board__panels_lists", [])
+            if not (isinstance(panels, partial)
+                    and panels.func == self._take_shard):
+                if callable(panels):
+                    panels = panels()
+                replace_file(self.shard_path(board_id), pickle.dumps(panels))
+                self._own(board_id, panels)
+            manifest.append({
+                "_Board__id": board_id,
+                "_Board__title": board.get("_Board__title", ""),
+                "_Board__color": board.get("_Board__color", "LIGHTBLUE")
+            })
+        replace_file(self.manifest_path, pickle.dumps(manifest))
+        self._manifest = manifest
+        self._remove_orphans()
+
+    def commit(self, changes: List[Change]) -> None:
+        if not os.path.exists(self.manifest_path):
+            raise FileNotFoundError(self.manifest_path)
+        boards = {board["_Board__id"]: board for board in self._manifest}
+        manifest_changed = False
+        inserted = {}
+        deleted = set()
+        pending: Dict[str, List[Change]] = {}
+        for change in changes:
+            values = change.values
+            try:
+                match change.op:
+                    case "insert_board":
+                        board = values["board"]
+                        boards[change.target] = {
+                            "_Board__id": change.target,
+                            "_Board__title": board["_Board__title"],
+                            "_Board__color": board["_Board__color"]
+                        }
+                        self._manifest.insert(values["index"],
+                                              boards[change.target])
+                        inserted[change.target] = board
+                        self._own(change.target,
+                                  board["_Board__panels_lists"])
+                        manifest_changed = True
+                    case "update_board":
+                        boards[change.target].update(values)
+                        manifest_changed = True
+                    case "delete_board":
+                        self._manifest.remove(boards.pop(change.target))
+                        inserted.pop(change.target, None)
+                        pending.pop(change.target, None)
+                        deleted.add(change.target)
+                        manifest_changed = True
+                    case "order_boards":
+                        self._manifest[:] = [
+                            boards[board_id] for board_id in values["order"]
+                            if board_id in boards] + [
+                            board for board in self._manifest
+                            if board["_Board__id"] not in values["order"]]
+                        manifest_changed = True
+                    case "insert_panel":
+                        board_id = values["board"]
+                        self._own(board_id, [values["panel"]])
+                        pending.setdefault(board_id, []).append(change)
+                    case "insert_card":
+                        board_id = self._owner(values["panel"])
+                        self._owners[change.target] = board_id
+                        pending.setdefault(board_id, []).append(change)
+                    case "order_panels":
+                        pending.setdefault(change.target, []).append(change)
+                    case _:
+                        pending.setdefault(
+                            self._owner(change.target), []).append(change)
+            except KeyError:
+                logging.info('Skipping change "%s" of missing "%s"',
+                             change.op, change.target)
+        for board_id, board in inserted.items():
+            replay_changes([board], pending.pop(board_id, []))
+            replace_file(self.shard_path(board_id),
+                         pickle.dumps(board["_Board__panels_lists"]))
+        for board_id, board_changes in pending.items():
+            if board_id not in boards:
+                continue
+            board = {"_Board__id": board_id,
+                     "_Board__panels_lists": self._read_shard(board_id)}
+            replay_changes([board], board_changes)
+            replace_file(self.shard_path(board_id),
+                         pickle.dumps(board["_Board__panels_lists"]))
+        if manifest_changed:
+            replace_file(self.manifest_path, pickle.dumps(self._manifest))
+        for board_id in deleted:
+            self._shards.pop(board_id, None)
+            try:
+                os.remove(self.shard_path(board_id))
+            except FileNotFoundError:
+                pass
+
+    def _remove_orphans(self) -> None:
+        """Removes the files of boards that are not in the manifest."""
+        board_ids = {board["_Board__id"] for board in self._manifest}
+        for name in os.listdir(self._path):
+            board_id, extension = os.path.splitext(name)
+            if extension == self.EXTENSION and board_id not in board_ids:
+                os.remove(os.path.join(self._path, name))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+class SQLiteStorage(Storage):
+    """Stores the table in an SQLite database with one row per board, panel
+    and card, keyed by their IDs. Boards, panels and cards keep their order in
+    an ordinal column, so a change only touches the affected rows and their
+    siblings.
+
+    If the database does not exist yet but a pickled table with the same name
+    does, the pickled table is imported by `migrate()` before the first load.
+
+    The connection may be used from any thread, e.g. by the background writer
+    of the table, as long as only one thread uses it at a time.
+
+    Loading only selects the boards. The panels and cards of each board are
+    selected when they are first accessed. Descriptions are kept in a table
+    of their own and are only selected when the description of a card is
+    accessed, so loading a board only reads the titles, dates and times of
+    its cards.
+    """
+
+    incremental = True
+    lazy = True
+
+    VERSION = 3
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS boards (
+            id TEXT PRIMARY KEY,
+            ordinal INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            color TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS panels (
+            id TEXT PRIMARY KEY,
+            board_id TEXT NOT NULL
+                REFERENCES boards(id) ON DELETE CASCADE,
+            ordinal INTEGER NOT NULL,
+            title TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS cards (
+            id TEXT PRIMARY KEY,
+            panel_id TEXT NOT NULL
+                REFERENCES panels(id) ON DELETE CASCADE,
+            ordinal INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            date INTEGER,
+            time INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS descriptions (
+            card_id TEXT PRIMARY KEY
+                REFERENCES cards(id) ON DELETE CASCADE,
+            description TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS boards_ordinal ON boards(ordinal);
+        CREATE INDEX IF NOT EXISTS panels_board ON panels(board_id, ordinal);
+        CREATE INDEX IF NOT EXISTS cards_panel ON cards(panel_id, ordinal);
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self._conn: sqlite3.Connection = None
+
+    @property
+    def legacy_path(self) -> str:
+        """The path of the pickled table that is imported if the database
+        does not exist yet."""
+        return os.path.splitext(self._path)[0] + ".pickle"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < self.VERSION:
+                self._migrate(version)
+        return self._conn
+
+    def _migrate(self, version: int) -> None:
+        """Creates the schema, or upgrades the schema of an older database.
+        Databases created before version 1 used integer row IDs, so their
+        boards, panels and cards are given new IDs. Databases created before
+        version 2 stored due dates and times as DD-MM-YYYY and HH:MM text
+        instead of day ordinals and minutes since midnight, and databases
+        created before version 3 stored descriptions in the cards table.
+        """
+        conn = self._conn
+        data = []
+        if conn.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'boards'"
+        ).fetchone():
+            data = self._select(conn, version)
+            conn.executescript(
+                "DROP TABLE IF EXISTS descriptions; DROP TABLE cards; "
+                "DROP TABLE panels; DROP TABLE boards;")
+        conn.executescript(self.SCHEMA)
+        with conn:
+            for index_b, board in enumerate(data):
+                self._insert_board(conn, index_b, board)
+        conn.execute(f"PRAGMA user_version = {self.VERSION}")
+        if data:
+            logging.info('Table database "%s" upgraded from version %d to %d',
+                         self._path, version, self.VERSION)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def outdated(self) -> bool:
+        return self._conn is None and not os.path.exists(self._path) and \
+            os.path.exists(self.legacy_path)
+
+    def migrate(self) -> None:
+        self.dump(JournalStorage(self.legacy_path).load())
+        logging.info('Imported pickled table "%s" into "%s"',
+                     self.legacy_path, self._path)
+
+    def load(self) -> List[Dict]:
+        if self._conn is None and not os.path.exists(self._path):
+            raise FileNotFoundError(self._path)
+        return [
+            {
+                "_Board__id": id_,
+                "_Board__title": title,
+                "_Board__color": color,
+                "_Board__panels_lists": partial(self._select_panels, id_)
+            }
+            for id_, title, color in self._connect().execute(
+                "SELECT id, title, color FROM boards ORDER BY ordinal")
+        ]
+
+    def _select_panels(self, board_id: str) -> List[Dict]:
+        """Selects the panels and cards of a board, ordered by the ordinal
+        columns."""
+        conn = self._connect()
+        panels = {}
+        for id_, title in conn.execute(
+                "SELECT id, title FROM panels WHERE board_id = ? "
+                "ORDER BY ordinal", (board_id,)):
+            panels[id_] = {
+                "_Panel__id": id_,
+                "_Panel__title": title,
+                "_Board__panels": []
+            }
+        for id_, panel_id, title, date, time in conn.execute(
+                "SELECT cards.id, panel_id, cards.title, date, time "
+                "FROM cards JOIN panels ON panels.id = panel_id "
+                "WHERE board_id = ? ORDER BY panel_id, cards.ordinal",
+                (board_id,)):
+            panels[panel_id]["_Board__panels"].append({
+                "_Card__id": id_,
+                "_Card__title": title,
+                "_Card__description": self.load_description,
+                "_Card__date": date,
+                "_Card__time": time
+            })
+        return list(panels.values())
+
+    def load_description(self, card_id: str) -> str | bytes:
+        row = self._connect().execute(
+            "SELECT description FROM descriptions WHERE card_id = ?",
+            (card_id,)).fetchone()
+        return "" if row is None else row[0]
+
+    @classmethod
+    def _select(cls, conn: sqlite3.Connection,
+                version: int = None) -> List[Dict]:
+        """Selects the whole table, ordered by the ordinal columns. The
+        schema of the database is the one of `version`, by default the
+        current one."""
+        version = cls.VERSION if version is None else version
+        with_ids = version >= 1
+        data = []
+        boards = {}
+        panels = {}
+        for id_, title, color in conn.execute(
+                "SELECT id, title, color FROM boards ORDER BY ordinal"):
+            board = {
+                "_Board__title": title,
+                "_Board__panels_lists": [],
+                "_Board__color": color
+            }
+            if with_ids:
+                board["_Board__id"] = id_
+            boards[id_] = board
+            data.append(board)
+        for id_, board_id, title in conn.execute(
+                "SELECT id, board_id, title FROM panels "
+                "ORDER BY board_id, ordinal"):
+            panel = {"_Panel__title": title, "_Board__panels": []}
+            if with_ids:
+                panel["_Panel__id"] = id_
+            panels[id_] = panel
+            boards[board_id]["_Board__panels_lists"].append(panel)
+        for id_, panel_id, title, description, date, time in conn.execute(
+                "SELECT id, panel_id, title, description, date, time "
+                "FROM cards ORDER BY panel_id, ordinal" if version < 3 else
+                "SELECT id, panel_id, title, COALESCE(description, ''), "
+                "date, time FROM cards LEFT JOIN descriptions "
+                "ON card_id = id ORDER BY panel_id, ordinal"):
+            card = {
+                "_Card__title": title,
+                "_Card__description": description,
+                "_Card__date": date,
+                "_Card__time": time
+            }
+            if with_ids:
+                card["_Card__id"] = id_
+            panels[panel_id]["_Board__panels"].append(card)
+        return data
+
+    def dump(self, data: List[Dict]) -> None:
+        data = [
+            dict(board, _Board__panels_lists=board["_Board__panels_lists"]())
+            if callable(board.get("_Board__panels_lists")) else board
+            for board in data
+        ]
+        conn = self._connect()
+        unloaded = [
+            card
+            for board in data
+            for panel in board.get("_Board__panels_lists", [])
+            for card in panel.get("_Board__panels", [])
+            if callable(card.get("_Card__description"))
+        ]
+        if unloaded:
+            descriptions = dict(conn.execute(
+                "SELECT card_id, description FROM descriptions"))
+            for card in unloaded:
+                card["_Card__description"] = descriptions.get(
+                    card["_Card__id"], "")
+        with conn:
+            conn.execute("DELETE FROM boards")
+            for index_b, board in enumerate(data):
+                self._insert_board(conn, index_b, board)
+
+    def commit(self, changes: List[Change]) -> None:
+        conn = self._connect()
+        with conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            for change in changes:
+                conn.execute("SAVEPOINT change")
+                try:
+                    self._apply(conn, change)
+                except (TypeError, sqlite3.IntegrityError):
+                    # The target was deleted by another process
+                    conn.execute("ROLLBACK TO change")
+                    logging.info('Skipping change "%s" of missing "%s"',
+                                 change.op, change.target)
+                conn.execute("RELEASE change")
+
+    def _apply(self, conn: sqlite3.Connection, change: Change) -> None:
+        """Applies a single change to the database."""
+        values = change.values
+        match change.op:
+            case "insert_board":
+                conn.execute(
+                    "UPDATE boards SET ordinal = ordinal + 1 "
+                    "WHERE ordinal >= ?", (values["index"],))
+                self._insert_board(conn, values["index"], values["board"])
+            case "update_board":
+                conn.execute(
+                    "UPDATE boards SET title = ?, color = ? WHERE id = ?",
+                    (values["_Board__title"], values["_Board__color"],
+                     change.target))
+            case "delete_board":
+                ordinal, = conn.execute(
+                    "SELECT ordinal FROM boards WHERE id = ?",
+                    (change.target,)).fetchone()
+                conn.execute("DELETE FROM boards WHERE id = ?",
+                             (change.target,))
+                conn.execute(
+                    "UPDATE boards SET ordinal = ordinal - 1 "
+                    "WHERE ordinal > ?", (ordinal,))
+            case "order_boards":
+                conn.executemany(
+                    "UPDATE boards SET ordinal = ? WHERE id = ?",
+                    list(enumerate(values["order"])))
+            case "insert_panel":
+                conn.execute(
+                    "UPDATE panels SET ordinal = ordinal + 1 "
+                    "WHERE board_id = ? AND ordinal >= ?",
+                    (values["board"], values["index"]))
+                self._insert_panel(conn, values["board"], values["index"],
+                                   values["panel"])
+            case "update_panel":
+                conn.execute(
+                    "UPDATE panels SET title = ? WHERE id = ?",
+                    (values["_Panel__title"], change.target))
+            case "delete_panel":
+                board_id, ordinal = conn.execute(
+                    "SELECT board_id, ordinal FROM panels WHERE id = ?",
+                    (change.target,)).fetchone()
+                conn.execute("DELETE FROM panels WHERE id = ?",
+                             (change.target,))
+                conn.execute(
+                    "UPDATE panels SET ordinal = ordinal - 1 "
+                    "WHERE board_id = ? AND ordinal > ?", (board_id, ordinal))
+            case "order_panels":
+                conn.executemany(
+                    "UPDATE panels SET ordinal = ? WHERE id = ?",
+                    list(enumerate(values["order"])))
+            case "insert_card":
+                conn.execute(
+                    "UPDATE cards SET ordinal = ordinal + 1 "
+                    "WHERE panel_id = ? AND ordinal >= ?",
+                    (values["panel"], values["index"]))
+                self._insert_card(conn, values["panel"], values["index"],
+                                  values["card"])
+            case "update_card":
+                conn.execute(
+                    "UPDATE cards SET title = ?, date = ?, time = ? "
+                    "WHERE id = ?",
+                    (values["_Card__title"], values["_Card__date"],
+                     values["_Card__time"], change.target))
+                self._set_description(conn, change.target,
+                                      values["_Card__description"])
+            case "delete_card":
+                panel_id, ordinal = conn.execute(
+                    "SELECT panel_id, ordinal FROM cards WHERE id = ?",
+                    (change.target,)).fetchone()
+                conn.execute("DELETE FROM cards WHERE id = ?",
+                             (change.target,))
+                conn.execute(
+                    "UPDATE cards SET ordinal = ordinal - 1 "
+                    "WHERE panel_id = ? AND ordinal > ?", (panel_id, ordinal))
+            case "move_card":
+                panel_id, ordinal = conn.execute(
+                    "SELECT panel_id, ordinal FROM cards WHERE id = ?",
+                    (change.target,)).fetchone()
+                conn.execute(
+                    "UPDATE cards SET ordinal = ordinal - 1 "
+                    "WHERE panel_id = ? AND ordinal > ?", (panel_id, ordinal))
+                conn.execute(
+                    "UPDATE cards SET ordinal = ordinal + 1 "
+                    "WHERE panel_id = ? AND ordinal >= ? AND id != ?",
+                    (values["panel"], values["index"], change.target))
+                conn.execute(
+                    "UPDATE cards SET panel_id = ?, ordinal = ? WHERE id = ?",
+                    (values["panel"], values["index"], change.target))
+            case _:
+                raise ValueError(f'Unknown change "{change.op}"')
+
+    @classmethod
+    def _insert_board(cls, conn: sqlite3.Connection, ordinal: int,
+                      board: Dict) -> None:
+        board_id = board.get("_Board__id") or uuid4().hex
+        conn.execute(
+            "INSERT INTO boards (id, ordinal, title, color) "
+            "VALUES (?, ?, ?, ?)",
+            (board_id, ordinal, board.get("_Board__title", ""),
+             board.get("_Board__color", "LIGHTBLUE")))
+        for index_p, panel in enumerate(
+                board.get("_Board__panels_lists", [])):
+            cls._insert_panel(conn, board_id, index_p, panel)
+
+    @classmethod
+    def _insert_panel(cls, conn: sqlite3.Connection, board_id: str,
+                      ordinal: int, panel: Dict) -> None:
+        panel_id = panel.get("_Panel__id") or uuid4().hex
+        conn.execute(
+            "INSERT INTO panels (id, board_id, ordinal, title) "
+            "VALUES (?, ?, ?, ?)",
+            (panel_id, board_id, ordinal, panel.get("_Panel__title", "")))
+        rows = [cls._card_row(panel_id, index_c, card) for index_c, card
+                in enumerate(panel.get("_Board__panels", []))]
+        conn.executemany(
+            "INSERT INTO cards (id, panel_id, ordinal, title, date, time) "
+            "VALUES (?, ?, ?, ?, ?, ?)", [row[:-1] for row in rows])
+        conn.executemany(
+            "INSERT INTO descriptions (card_id, description) VALUES (?, ?)",
+            [(row[0], row[-1]) for row in rows if row[-1]])
+
+    @classmethod
+    def _insert_card(cls, conn: sqlite3.Connection, panel_id: str,
+                     ordinal: int, card: Dict) -> None:
+        row = cls._card_row(panel_id, ordinal, card)
+        conn.execute(
+            "INSERT INTO cards (id, panel_id, ordinal, title, date, time) "
+            "VALUES (?, ?, ?, ?, ?, ?)", row[:-1])
+        cls._set_description(conn, row[0], row[-1])
+
+    @staticmethod
+    def _set_description(conn: sqlite3.Connection, card_id: str,
+                         description: str) -> None:
+        """Stores the description of a card. Empty descriptions are not
+        stored."""
+        if description:
+            conn.execute(
+                "INSERT OR REPLACE INTO descriptions (card_id, description) "
+                "VALUES (?, ?)", (card_id, description))
+        else:
+            conn.execute("DELETE FROM descriptions WHERE card_id = ?",
+                         (card_id,))
+
+    @staticmethod
+    def _card_row(panel_id: str, ordinal: int, card: Dict) -> tuple:
+        """Returns the row of a card, followed by its description."""
+        return (card.get("_Card__id") or uuid4().hex, panel_id, ordinal,
+                card.get("_Card__title", ""),
+                to_day(card.get("_Card__date")),
+                to_minute(card.get("_Card__time")),
+                card.get("_Card__description", ""))
+
+
+def storage_for(path: str) -> Storage:
+    """Returns the storage backend matching the extension of the table file.
+    SQLite databases end with .db, .sqlite or .sqlite3, containers end with
+    .kanbaru, sharded tables are directories ending with .shards and
+    journaled tables end with .pickle; anything else is a pickled table.
+
+    Parameters
+    ----------
+    path : str
+        The path of the table file.
+
+    Returns
+    -------
+    storage : Storage
+        The storage backend for the table file.
+    """
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteStorage(path)
+    if os.path.splitext(path)[1].lower() == ".kanbaru":
+        return ContainerStorage(path)
+    if os.path.splitext(path)[1].lower() == ".shards":
+        return ShardedStorage(path)
+    if os.path.splitext(path)[1].lower() == ".pickle":
+        return JournalStorage(path)
+    return PickleStorage(path)
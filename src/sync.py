@@ -0,0 +1,847 @@
+"""Synchronizes the table with a sync server, shipping only the boards, panels
+and cards that changed since the last sync.
+
+Every board, panel and card is synchronized as a record holding its fields,
+the ID of its parent and its rank, or as a tombstone once it is deleted.
+Each record carries a stamp, a `(counter, origin)` pair: the counter is a
+Lamport clock that every local change raises past every counter seen so far,
+and the origin is the random ID of the table that made the change. The
+server keeps the record with the highest stamp, and so does every table that
+pulls it, so concurrent edits of the same item end the same way everywhere:
+the edit made with knowledge of more changes wins, and ties go to the higher
+origin. A deletion wins over any edit, so a deleted item never comes back
+without the panels or cards deleted along with it.
+
+Siblings are ordered by rank, and then by stamp. A rank is a number rather
+than a position, so moving an item only changes the rank of the item, which
+is placed between the ranks of its new neighbours, and deleting an item
+changes no rank at all.
+
+The server numbers the records it accepts with increasing versions, so a
+table only pulls the records accepted since the last version it pulled.
+Records are pushed and pulled in batches of `BATCH_SIZE`.
+
+The server is reached through a `Transport`: `LocalTransport` calls a
+`SyncServer` in the same process, `FileTransport` shares a JSON file between
+processes and `HTTPTransport` talks to `serve()`, a stand-in for the cloud
+backend. Run one from the src directory:
+
+    python sync.py serve sync.json --port 8765
+    python sync.py sync Table.db alice --server http://localhost:8765
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import threading
+import urllib.request
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from typing import Dict, Iterable, List, Set, Tuple
+from uuid import uuid4
+
+from db import Location, Table
+from kanbaru_objects import Board, Card, Color, Panel
+from locking import FileLock
+from storage import Change, replace_file
+
+BATCH_SIZE = 500
+KINDS = ["board", "panel", "card"]
+
+
+def stamp_of(record: Dict) -> Tuple[int, str]:
+    """Returns the stamp of a record as a comparable tuple."""
+    counter, origin = record["stamp"]
+    return counter, origin
+
+
+def precedence(record: Dict) -> Tuple[bool, Tuple[int, str]]:
+    """Returns the key by which the latest record of an item wins: a
+    tombstone wins over any record, and otherwise the highest stamp wins."""
+    return record["deleted"], stamp_of(record)
+
+
+def digest(record: Dict) -> int:
+    """Returns a checksum of the contents of a record, leaving out its rank
+    and stamp, to tell whether an item changed since it was last
+    synchronized."""
+    return zlib.crc32(repr((
+        record["kind"], record["parent"], sorted(record["fields"].items()),
+        record["deleted"])).encode())
+
+
+def increasing(keys: List[Tuple | None]) -> Set[int]:
+    """Returns the positions of a longest strictly increasing subsequence of
+    keys, skipping the None keys."""
+    tails: List[int] = []
+    previous: Dict[int, int] = {}
+    for position, key in enumerate(keys):
+        if key is None:
+            continue
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if keys[tails[middle]] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low:
+            previous[position] = tails[low - 1]
+        if low == len(tails):
+            tails.append(position)
+        else:
+            tails[low] = position
+    result = set()
+    position = tails[-1] if tails else None
+    while position is not None:
+        result.add(position)
+        position = previous.get(position)
+    return result
+
+
+def make_record(location: Location, stamp: Tuple[int, str],
+                rank: float = 0.0) -> Dict:
+    """Returns the record of a board, panel or card."""
+    item = location.item
+    if isinstance(item, Board):
+        kind, parent = "board", None
+        fields = {"title": item.title, "color": Color(item.color).name}
+    elif isinstance(item, Panel):
+        kind, parent = "panel", location.board.id
+        fields = {"title": item.title}
+    else:
+        kind, parent = "card", location.panel.id
+        fields = {"title": item.title, "date": item.day,
+                  "time": item.minute, "description": item.description}
+    return {"id": item.id, "kind": kind, "parent": parent,
+            "rank": rank, "fields": fields,
+            "deleted": False, "stamp": list(stamp)}
+
+
+def make_tombstone(item_id: str, kind: str, stamp: Tuple[int, str]) -> Dict:
+    """Returns the record of a deleted board, panel or card."""
+    return {"id": item_id, "kind": kind, "parent": None, "rank": 0.0,
+            "fields": {}, "deleted": True, "stamp": list(stamp)}
+
+
+class SyncServer:
+    """Keeps the records of each account and hands out the ones accepted
+    since a version. A stand-in for the cloud backend.
+
+    Parameters
+    ----------
+    state : Dict, optional
+        The records and the last version, as returned by `state`, by
+        default None (no records).
+    """
+
+    def __init__(self, state: Dict = None) -> None:
+        self.state = state or {"version": 0, "accounts": {}}
+
+    def push(self, account: str, records: List[Dict]) -> Dict:
+        """Stores the records that win over the stored record with the same
+        ID, if any, see `precedence()`.
+
+        Returns
+        -------
+        result : Dict
+            The IDs of the accepted records, under "accepted", and the last
+            version, under "version".
+        """
+        stored = self.state["accounts"].setdefault(account, {})
+        accepted = []
+        for record in records:
+            current = stored.get(record["id"])
+            if current is None or precedence(record) > precedence(current):
+                self.state["version"] += 1
+                stored[record["id"]] = dict(record,
+                                            version=self.state["version"])
+                accepted.append(record["id"])
+        return {"accepted": accepted, "version": self.state["version"]}
+
+    def pull(self, account: str, since: int, limit: int) -> Dict:
+        """Returns the records accepted after version `since`, oldest first.
+
+        Returns
+        -------
+        result : Dict
+            At most `limit` records, under "records", and the last version,
+            under "version".
+        """
+        records = sorted(
+            (record for record in
+             self.state["accounts"].get(account, {}).values()
+             if record["version"] > since),
+            key=lambda record: record["version"])
+        return {"records": records[:limit],
+                "version": self.state["version"]}
+
+
+class Transport(ABC):
+    """Carries records between a table and a sync server."""
+
+    @abstractmethod
+    def push(self, account: str, records: List[Dict]) -> Dict:
+        """Pushes records to the server, see `SyncServer.push()`."""
+        pass
+
+    @abstractmethod
+    def pull(self, account: str, since: int, limit: int) -> Dict:
+        """Pulls records from the server, see `SyncServer.pull()`."""
+        pass
+
+
+class LocalTransport(Transport):
+    """Calls a sync server in the same process."""
+
+    def __init__(self, server: SyncServer = None) -> None:
+        self.server = server or SyncServer()
+        self._lock = threading.Lock()
+
+    def push(self, account: str, records: List[Dict]) -> Dict:
+        with self._lock:
+            return self.server.push(account, records)
+
+    def pull(self, account: str, since: int, limit: int) -> Dict:
+        with self._lock:
+            return self.server.pull(account, since, limit)
+
+
+class FileTransport(Transport):
+    """Keeps the state of a sync server in a JSON file, which several
+    processes may share. The file is locked while it is read or written."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = FileLock(path + ".lock")
+
+    def _load(self) -> SyncServer:
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                return SyncServer(json.load(file))
+        except FileNotFoundError:
+            return SyncServer()
+
+    def push(self, account: str, records: List[Dict]) -> Dict:
+        with self._lock.exclusive():
+            server = self._load()
+            result = server.push(account, records)
+            if result["accepted"]:
+                replace_file(self._path, json.dumps(server.state).encode())
+            return result
+
+    def pull(self, account: str, since: int, limit: int) -> Dict:
+        with self._lock.shared():
+            return self._load().pull(account, since, limit)
+
+
+class HTTPTransport(Transport):
+    """Posts JSON requests to a sync server started by `serve()`.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the server, e.g. "http://localhost:8765".
+    timeout : float, optional
+        The number of seconds to wait for a response, by default 30.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0) -> None:
+        self._url = url.rstrip("/")
+        self._timeout = timeout
+
+    def _post(self, path: str, body: Dict) -> Dict:
+        request = urllib.request.Request(
+            self._url + path, data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self._timeout) as reply:
+            return json.load(reply)
+
+    def push(self, account: str, records: List[Dict]) -> Dict:
+        return self._post("/push", {"account": account, "records": records})
+
+    def pull(self, account: str, since: int, limit: int) -> Dict:
+        return self._post("/pull", {"account": account, "since": since,
+                                    "limit": limit})
+
+
+def transport_for(server: str) -> Transport:
+    """Returns the transport to a sync server given by an http(s) URL or by
+    the path of a JSON file."""
+    if server.startswith(("http://", "https://")):
+        return HTTPTransport(server)
+    return FileTransport(server)
+
+
+def default_server(table: Table) -> str:
+    """Returns the sync server given by the KANBARU_SYNC_SERVER environment
+    variable, by default a JSON file next to the table file."""
+    return os.environ.get("KANBARU_SYNC_SERVER") or os.path.join(
+        os.path.dirname(os.path.abspath(table.get_path())),
+        "sync-server.json")
+
+
+def serve(path: str, host: str = "localhost",
+          port: int = 8765) -> ThreadingHTTPServer:
+    """Returns an HTTP sync server keeping its state in a JSON file. Call
+    `serve_forever()` on it to handle requests."""
+    transport = FileTransport(path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            try:
+                body = json.loads(self.rfile.read(
+                    int(self.headers.get("Content-Length", 0))))
+                match self.path:
+                    case "/push":
+                        result = transport.push(body["account"],
+                                                body["records"])
+                    case "/pull":
+                        result = transport.pull(body["account"],
+                                                body["since"], body["limit"])
+                    case _:
+                        self.send_error(404)
+                        return None
+            except (KeyError, TypeError, ValueError):
+                self.send_error(400)
+                return None
+            reply = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, format: str, *args) -> None:
+            logging.debug(format, *args)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+class SyncEngine:
+    """Synchronizes a table with a sync server on a background thread.
+
+    The engine listens to the changes made to the table, see
+    `Table.add_listener()`, and stamps the boards, panels and cards they
+    touch. Its state, i.e. the stamps, the changed items and the last
+    version pulled, is saved next to the table file, and changes made while
+    no engine was listening are found by comparing the table with the
+    checksums of the records last synchronized, once per engine.
+
+    Parameters
+    ----------
+    table : Table
+        The table to synchronize.
+    account : str
+        The account whose records the table is synchronized with.
+    transport : Transport
+        The transport to the sync server.
+    """
+
+    def __init__(self, table: Table, account: str,
+                 transport: Transport) -> None:
+        self.table = table
+        self.account = account
+        self.transport = transport
+        self._path = os.path.splitext(table.get_path())[0] + ".sync"
+        self._lock = threading.RLock()
+        # The thread applying pulled records, whose changes are not stamped
+        self._applying: int | None = None
+        self._scanned = False
+        self._executor = ThreadPoolExecutor(
+            1, thread_name_prefix="kanbaru-sync")
+        self.state = self._load()
+        table.add_listener(self._on_change)
+
+    def _load(self) -> Dict:
+        try:
+            with open(self._path, "rb") as file:
+                state = pickle.load(file)
+            if state["account"] == self.account:
+                return state
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+            pass
+        return {"account": self.account, "origin": uuid4().hex, "clock": 0,
+                "version": 0, "stamps": {}, "digests": {}, "kinds": {},
+                "ranks": {}, "parents": {}, "deleted": set(),
+                "dirty": set()}
+
+    def save(self) -> None:
+        """Saves the state of the engine next to the table file."""
+        with self._lock:
+            data = pickle.dumps(self.state)
+        try:
+            replace_file(self._path, data)
+        except OSError:
+            logging.warning("Failed to save the sync state", exc_info=True)
+
+    def close(self) -> None:
+        """Stops listening to the table, waits for the running sync and
+        saves the state of the engine."""
+        self.table.remove_listener(self._on_change)
+        self._executor.shutdown(wait=True)
+        self.save()
+
+    def start(self, push: bool = True, pull: bool = True) -> Future:
+        """Synchronizes the table on the background thread, pushing the
+        local changes first and pulling the remote ones then.
+
+        Returns
+        -------
+        future : Future
+            Resolves to the number of records pushed and pulled, under
+            "pushed" and "pulled".
+        """
+        future = self._executor.submit(self.sync, push, pull)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future: Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logging.warning("Sync failed", exc_info=future.exception())
+
+    def sync(self, push: bool = True, pull: bool = True) -> Dict[str, int]:
+        """Synchronizes the table on the calling thread, see `start()`."""
+        if not self._scanned:
+            self._scan()
+            self._scanned = True
+        result = {"pushed": self.push() if push else 0,
+                  "pulled": self.pull() if pull else 0}
+        self.save()
+        logging.info('Synced with account "%s": %d pushed, %d pulled',
+                     self.account, result["pushed"], result["pulled"])
+        return result
+
+    def _stamp(self) -> Tuple[int, str]:
+        """Returns a new stamp, higher than every stamp seen so far."""
+        self.state["clock"] += 1
+        return self.state["clock"], self.state["origin"]
+
+    def _mark(self, item_id: str, kind: str, deleted: bool = False) -> None:
+        if deleted:
+            self.state["deleted"].add(item_id)
+        self.state["dirty"].add(item_id)
+        self.state["kinds"][item_id] = kind
+        self.state["stamps"][item_id] = self._stamp()
+
+    def _on_change(self, change: Change) -> None:
+        """Stamps the boards, panels and cards touched by a change of the
+        table. Called by the table while holding its lock."""
+        if self._applying == threading.get_ident():
+            return None
+        values = change.values or {}
+        kind = change.op.split("_")[-1].rstrip("s")
+        items = [(change.target, kind)]
+        match change.op:
+            case "order_boards" | "order_panels":
+                items = [(item_id, kind) for item_id in values["order"]]
+            case "insert_board":
+                panels = values["board"]["_Board__panels_lists"]
+                items += [(panel["_Panel__id"], "panel") for panel in panels]
+                items += [(card["_Card__id"], "card") for panel in panels
+                          for card in panel["_Board__panels"]]
+            case "insert_panel":
+                items += [(card["_Card__id"], "card")
+                          for card in values["panel"]["_Board__panels"]]
+            case "delete_board" | "delete_panel":
+                items += self._descendants(change.target)
+        deleted = change.op.startswith("delete_")
+        with self._lock:
+            for item_id, item_kind in items:
+                self._mark(item_id, item_kind, deleted)
+
+    def _descendants(self, item_id: str) -> List[Tuple[str, str]]:
+        """Returns the IDs and kinds of the panels and cards last
+        synchronized as part of a board or panel, so they are deleted along
+        with it everywhere."""
+        children: Dict[str, List[str]] = {}
+        with self._lock:
+            for child, parent in self.state["parents"].items():
+                children.setdefault(parent, []).append(child)
+            result = []
+            stack = [item_id]
+            while stack:
+                for child in children.get(stack.pop(), []):
+                    if self.table.locate(child) is None:
+                        result.append((child, self.state["kinds"][child]))
+                        stack.append(child)
+        return result
+
+    def _remember(self, record: Dict) -> None:
+        """Remembers the checksum and parent of a record that was pushed or
+        applied."""
+        self.state["digests"][record["id"]] = digest(record)
+        if record["deleted"]:
+            self.state["parents"].pop(record["id"], None)
+        elif record["parent"] is not None:
+            self.state["parents"][record["id"]] = record["parent"]
+
+    def _scan(self) -> None:
+        """Marks the boards, panels and cards that changed, appeared or
+        disappeared since they were last synchronized."""
+        seen = set()
+        records = []
+        siblings = [([board.id for board in self.table.boards], "board")]
+        for board_position, board in enumerate(list(self.table.boards)):
+            records.append(make_record(
+                Location(board, board, None, board_position), (0, "")))
+            panels = list(self.table.iter_panels(board))
+            siblings.append(([panel.id for panel in panels], "panel"))
+            for panel_position, panel in enumerate(panels):
+                records.append(make_record(
+                    Location(panel, board, panel, panel_position), (0, "")))
+                records += [
+                    make_record(Location(card, board, panel, position),
+                                (0, ""))
+                    for position, card in enumerate(panel.cards)]
+                siblings.append(([card.id for card in panel.cards], "card"))
+        with self._lock:
+            for record in records:
+                seen.add(record["id"])
+                if self.state["digests"].get(record["id"]) != \
+                        digest(record) and \
+                        record["id"] not in self.state["dirty"]:
+                    self._mark(record["id"], record["kind"])
+            for item_id, kind in list(self.state["kinds"].items()):
+                if item_id not in seen and \
+                        item_id not in self.state["deleted"]:
+                    self._mark(item_id, kind, deleted=True)
+            for ids, kind in siblings:
+                self._rerank(ids, kind)
+
+    def _default_board(self) -> Board | None:
+        """Returns the board of a table holding only the untouched default
+        board, if it was never synchronized, or None. Every new table has
+        one, so it is neither pushed nor kept next to the pulled boards."""
+        boards = self.table.boards
+        if len(boards) != 1:
+            return None
+        board, default = boards[0], Board()
+        if board.id in self.state["digests"] or \
+                board.title != default.title or \
+                board.color != default.color or board.panels:
+            return None
+        return board
+
+    def _forget(self, item_id: str) -> None:
+        """Forgets an item that was never synchronized."""
+        self.state["dirty"].discard(item_id)
+        for key in ("stamps", "kinds", "ranks"):
+            self.state[key].pop(item_id, None)
+
+    def push(self) -> int:
+        """Pushes the records of the boards, panels and cards changed since
+        the last push, in batches. Returns the number of records pushed.
+        The untouched default board is held back, see `_default_board()`."""
+        with self._lock:
+            dirty = list(self.state["dirty"])
+        siblings = self._siblings(dirty)
+        with self._lock:
+            for ids, kind in siblings:
+                self._rerank(ids, kind)
+            dirty = list(self.state["dirty"])
+        default = self._default_board()
+        records = []
+        for item_id in dirty:
+            if default is not None and item_id == default.id:
+                continue
+            location = self.table.locate(item_id)
+            with self._lock:
+                stamp = self.state["stamps"].get(item_id)
+                kind = self.state["kinds"].get(item_id)
+                if location is not None:
+                    rank = self.state["ranks"].get(item_id, 0.0)
+                    records.append(make_record(location, stamp, rank))
+                elif kind is not None:
+                    self.state["deleted"].add(item_id)
+                    records.append(make_tombstone(item_id, kind, stamp))
+                else:
+                    self.state["dirty"].discard(item_id)
+        # Parents first, so they are pulled before their children
+        records.sort(key=lambda record: (
+            record["deleted"], KINDS.index(record["kind"]),
+            record["rank"]))
+        iterator = iter(records)
+        while batch := list(islice(iterator, BATCH_SIZE)):
+            self.transport.push(self.account, batch)
+            with self._lock:
+                for record in batch:
+                    if self.state["stamps"].get(record["id"]) == \
+                            stamp_of(record):
+                        self.state["dirty"].discard(record["id"])
+                        self._remember(record)
+        return len(records)
+
+    def _siblings(self, item_ids: Iterable[str]
+                  ) -> List[Tuple[List[str], str]]:
+        """Returns the IDs of the siblings of items, i.e. of the boards, of
+        the panels of a board or of the cards of a panel, with their kind."""
+        siblings: Dict[str, Tuple[List[str], str]] = {}
+        for item_id in item_ids:
+            location = self.table.locate(item_id)
+            if location is None:
+                continue
+            match location.item:
+                case Board():
+                    siblings.setdefault("", (
+                        [board.id for board in self.table.boards], "board"))
+                case Panel():
+                    siblings.setdefault(location.board.id, (
+                        [panel.id for panel in location.board.panels],
+                        "panel"))
+                case Card():
+                    siblings.setdefault(location.panel.id, (
+                        [card.id for card in location.panel.cards], "card"))
+        return list(siblings.values())
+
+    def _rerank(self, ids: List[str], kind: str) -> None:
+        """Ranks siblings in their order in the table. Only the siblings out
+        of order get a new rank, and a new stamp, e.g. a card moved to the
+        top of its panel but not the cards below it."""
+        ranks, stamps = self.state["ranks"], self.state["stamps"]
+        keys = [(ranks[item_id], tuple(stamps[item_id]))
+                if item_id in ranks and item_id in stamps else None
+                for item_id in ids]
+        kept = increasing(keys)
+        if len(kept) == len(ids):
+            return None
+        new: Dict[str, float] = {}
+        start = 0
+        for end in sorted(kept) + [len(ids)]:
+            count = end - start
+            low = ranks[ids[start - 1]] if start else None
+            high = ranks[ids[end]] if end < len(ids) else None
+            for offset in range(count):
+                if low is None:
+                    rank = (count if high is None else high) - count + offset
+                elif high is None:
+                    rank = low + offset + 1
+                else:
+                    rank = low + (high - low) * (offset + 1) / (count + 1)
+                new[ids[start + offset]] = float(rank)
+            start = end + 1
+        ordered = [new.get(item_id, ranks.get(item_id)) for item_id in ids]
+        if any(first >= second for first, second in zip(ordered,
+                                                         ordered[1:])):
+            # The ranks between two neighbours ran out of precision
+            new = {item_id: float(rank) for rank, item_id in enumerate(ids)}
+        for item_id, rank in new.items():
+            ranks[item_id] = rank
+            self._mark(item_id, kind)
+
+    def pull(self) -> int:
+        """Pulls the records accepted by the server since the last pull, in
+        batches, and applies the ones that are newer than the local boards,
+        panels and cards. Returns the number of records applied, without
+        the records pushed by this table."""
+        applied = 0
+        waiting: List[Dict] = []
+        changed: Set[str] = set()
+        while True:
+            page = self.transport.pull(self.account, self.state["version"],
+                                       BATCH_SIZE)
+            records = page["records"]
+            applied += self._apply_all(waiting + records, waiting, changed)
+            if records:
+                with self._lock:
+                    self.state["version"] = records[-1]["version"]
+            if len(records) < BATCH_SIZE:
+                break
+        if waiting:
+            logging.info("Dropped %d synced records whose board or panel no "
+                         "longer exists", len(waiting))
+        self.table.notify_changed(changed)
+        return applied
+
+    def _apply_all(self, records: Iterable[Dict], waiting: List[Dict],
+                   changed: Set[str]) -> int:
+        """Applies records to the table in a single transaction. Records
+        whose parent is missing are retried once other records were applied,
+        and put in `waiting`, to be applied with the next batch, if their
+        parent is still missing."""
+        applied = 0
+        pending = list(records)
+        # The table passes the changes to `_on_change()` when the
+        # transaction ends
+        self._applying = threading.get_ident()
+        try:
+            with self.table.transaction(), self._lock:
+                while pending:
+                    retry = []
+                    for record in pending:
+                        board_id = self._accept(record)
+                        if board_id is None:
+                            retry.append(record)
+                            continue
+                        if board_id:
+                            changed.add(board_id)
+                        if stamp_of(record)[1] != self.state["origin"]:
+                            applied += 1
+                    if len(retry) == len(pending):
+                        break
+                    pending = retry
+        finally:
+            self._applying = None
+        waiting[:] = pending
+        return applied
+
+    def _accept(self, record: Dict) -> str | None:
+        """Applies a record if it wins over the local item, see
+        `precedence()`. A record whose parent was deleted deletes the item.
+        Returns the ID of the board that changed, "" if none did, or None if
+        the parent of the item is missing."""
+        if not record["deleted"] and record["parent"] in self.state["deleted"]:
+            record = dict(record, deleted=True)
+        stamp = stamp_of(record)
+        self.state["clock"] = max(self.state["clock"], stamp[0])
+        local = self.state["stamps"].get(record["id"])
+        if local is not None and (record["id"] in self.state["deleted"],
+                                  tuple(local)) >= precedence(record):
+            return ""
+        self.state["ranks"][record["id"]] = record["rank"]
+        board_id = self._apply(record, stamp)
+        if board_id is None:
+            return None
+        self.state["stamps"][record["id"]] = stamp
+        self.state["kinds"][record["id"]] = record["kind"]
+        if record["deleted"]:
+            self.state["deleted"].add(record["id"])
+            # The panels and cards deleted along with it
+            self.state["deleted"].update(
+                item_id for item_id, _ in self._descendants(record["id"]))
+        self._remember(record)
+        self.state["dirty"].discard(record["id"])
+        return board_id
+
+    def _apply(self, record: Dict, stamp: Tuple[int, str]) -> str | None:
+        """Applies a record to the table. Returns the ID of the board that
+        changed, or None if the parent of the item is missing."""
+        table = self.table
+        location = table.locate(record["id"])
+        fields = record["fields"]
+        if record["deleted"]:
+            if location is None:
+                return ""
+            match record["kind"]:
+                case "board":
+                    if len(table.boards) == 1:
+                        # A table keeps at least one board
+                        board = table.add_board(Board().title)
+                        self._mark(board.id, "board")
+                    table.delete_board(location.item)
+                case "panel":
+                    table.delete_panel(location.item)
+                case "card":
+                    table.delete_card(location.item)
+            return location.board.id
+        match record["kind"]:
+            case "board":
+                default = self._default_board()
+                board = location.item if location is not None else \
+                    table.add_board(fields["title"], id=record["id"])
+                if default is not None and location is None:
+                    # The pulled board takes the place of the default one
+                    table.delete_board(default)
+                    self._forget(default.id)
+                if board.title != fields["title"] or \
+                        Color(board.color).name != fields["color"]:
+                    table.update_board(board, Board(
+                        fields["title"], fields["color"], id=board.id))
+                boards = self._place(table.boards, board, stamp)
+                if boards != table.boards:
+                    table.update_board_order(boards)
+                return board.id
+            case "panel":
+                parent = table.locate(record["parent"])
+                if parent is None:
+                    return None
+                panel = location.item if location is not None else \
+                    table.add_panel(parent.item, fields["title"],
+                                    id=record["id"])
+                if panel.title != fields["title"]:
+                    table.update_panel(panel, Panel(fields["title"],
+                                                    id=panel.id))
+                board = table.locate(panel.id).board
+                panels = self._place(board.panels, panel, stamp)
+                if panels != board.panels:
+                    table.update_panel_order(board, panels)
+                return board.id
+            case "card":
+                parent = table.locate(record["parent"])
+                if parent is None:
+                    return None
+                card = Card(fields["title"], fields["date"] or "",
+                            fields["time"] or "", fields["description"],
+                            record["id"])
+                if location is None:
+                    table.add_card(parent.item, card)
+                elif not location.item.deep_equals(card):
+                    table.update_card(location.item, card)
+                location = table.locate(card.id)
+                cards = self._place(parent.item.cards, location.item, stamp)
+                position = cards.index(location.item)
+                if location.panel is not parent.item or \
+                        location.position != position:
+                    table.move_card(location.item, parent.item, position)
+                return parent.board.id
+
+    def _place(self, items: List, item, stamp: Tuple[int, str]) -> List:
+        """Returns the siblings of an item with the item placed before the
+        first sibling with a higher rank, or the same rank and a higher
+        stamp, so every table orders the same records the same way."""
+        ranks, stamps = self.state["ranks"], self.state["stamps"]
+        others = [other for other in items if other is not item]
+        key = (ranks[item.id], stamp)
+        index = next((
+            position for position, other in enumerate(others)
+            if other.id in ranks and other.id in stamps and
+            (ranks[other.id], tuple(stamps[other.id])) > key), len(others))
+        return others[:index] + [item] + others[index:]
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("serve", help="run a stand-in HTTP sync "
+                                  "server")
+    command.add_argument("store", help="the JSON file holding the records")
+    command.add_argument("--host", default="localhost")
+    command.add_argument("--port", type=int, default=8765)
+    command = commands.add_parser("sync", help="synchronize a table file")
+    command.add_argument("table", help="the table file")
+    command.add_argument("account")
+    command.add_argument("--server", help="the URL of the sync server or "
+                         "the JSON file holding the records (default: "
+                         "$KANBARU_SYNC_SERVER, or sync-server.json next to "
+                         "the table file)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(levelname)s - %(message)s",
+                        level=logging.INFO)
+
+    if args.command == "serve":
+        server = serve(args.store, args.host, args.port)
+        logging.info("Serving %s on http://%s:%d", args.store, args.host,
+                     server.server_port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return None
+    table = Table.get_instance()
+    table.set_path(args.table)
+    table.read()
+    try:
+        result = table.sync(args.account, args.server).result()
+    except OSError as error:
+        parser.error(str(error))
+    table.flush()
+    print(f"{result['pushed']} records pushed, {result['pulled']} pulled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Tests of the import of cards into the table.
+
+Run from the src directory:
+
+    python -m unittest discover -s tests -t .
+"""
+import logging
+import os
+import tempfile
+import unittest
+
+from db import Table
+from importer import import_file
+
+ROWS = """board,panel,card,date,time,description
+Sprint,To Do,Fix login,01-04-2024,09:30,Users cannot log in
+Sprint,To Do,Write docs,,,
+Sprint,To Do,Fix login,,,The same title twice
+Sprint,Done,Fix login,,,Another panel
+"""
+
+
+class ImportTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        logging.disable(logging.CRITICAL)
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, "cards.csv")
+        with open(self.input, "w", encoding="utf-8") as file:
+            file.write(ROWS)
+        self.table = Table(singleton=False)
+        self.table.set_path(os.path.join(self.directory.name, "Table.db"))
+        self.table.read()
+
+    def tearDown(self) -> None:
+        self.table.close()
+        self.directory.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def titles(self) -> list:
+        return [(panel.title, [card.title for card in panel.cards])
+                for board in self.table.boards if board.title == "Sprint"
+                for panel in board.panels]
+
+    def test_import_twice(self) -> None:
+        self.assertEqual(import_file(self.input, table=self.table), 3)
+        expected = [("To Do", ["Fix login", "Write docs"]),
+                    ("Done", ["Fix login"])]
+        self.assertEqual(self.titles(), expected)
+        self.assertEqual(import_file(self.input, table=self.table), 0)
+        self.assertEqual(self.titles(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
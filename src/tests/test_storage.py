@@ -0,0 +1,62 @@
+"""Tests of the storage backends of the table.
+
+Run from the src directory:
+
+    python -m unittest discover -s tests -t .
+"""
+import logging
+import os
+import pickle
+import tempfile
+import unittest
+
+from db import Table
+from kanbaru_objects import Card
+from storage import JournalStorage, replace_file
+
+
+def open_table(path: str) -> Table:
+    table = Table(singleton=False)
+    table.set_path(path)
+    table.read()
+    return table
+
+
+def card_titles(table: Table) -> list:
+    return [card.title for board in table.boards for panel in board.panels
+            for card in panel.cards]
+
+
+class JournalStorageTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        logging.disable(logging.CRITICAL)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "Table.pickle")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def test_commit_after_interrupted_compaction(self) -> None:
+        table = open_table(self.path)
+        panel = table.add_panel(table.boards[0], "To Do")
+        table.add_card(panel, Card("one"))
+        table.close()
+        # A compaction that wrote the snapshot but not the journal
+        storage = JournalStorage(self.path)
+        replace_file(self.path, pickle.dumps(storage.load()))
+        self.assertTrue(os.path.exists(storage.journal_path))
+
+        table = open_table(self.path)
+        self.assertEqual(card_titles(table), ["one"])
+        table.add_card(table.boards[0].panels[0], Card("two"))
+        table.close()
+
+        table = open_table(self.path)
+        self.assertEqual(card_titles(table), ["one", "two"])
+        table.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,28 @@
 import logging
-from typing import List
+import os
+from typing import Callable, List
 
-from PySide6.QtCore import QEvent
+from PySide6.QtCore import QEvent, Qt, Signal
 from PySide6.QtGui import QFont
-from PySide6.QtWidgets import QMainWindow
+from PySide6.QtWidgets import (QFileDialog, QMainWindow, QProgressDialog,
+                               QPushButton)
 
 from db import Table
 from dialog import dialog_factory
+from export import export
+from importer import ImportCancelled, import_file
 from kanbaru_objects import Board
 from ui.about import About
 from ui.app_settings_ui import Ui_SettingsWindow
+from ui.worker import TableWorker
 from utils import keyPressEvent, modify_hex_color, setup_font_db
 
 
 class AppSettings(QMainWindow):
+    # The number of rows read or cards added by the running import, emitted
+    # from the table worker
+    import_progress = Signal(int)
+
     def __init__(self, board: Board) -> None:
         QMainWindow.__init__(self)
 
@@ -26,12 +35,35 @@ class AppSettings(QMainWindow):
         self.boards_to_delete: List[Board] = []
         self.new_board_order: List[Board] = []
 
+        self.ui.btn_export = QPushButton(
+            "Export", self.ui.btn_delete.parentWidget())
+        self.ui.btn_export.setObjectName(u"btn_export")
+        self.ui.btn_export.setSizePolicy(self.ui.btn_delete.sizePolicy())
+        self.ui.btn_export.setMinimumSize(self.ui.btn_delete.minimumSize())
+        self.ui.btn_export.setCursor(self.ui.btn_delete.cursor())
+        self.ui.btn_export.setFocusPolicy(self.ui.btn_delete.focusPolicy())
+        self.ui.horizontalLayout_4.insertWidget(1, self.ui.btn_export)
+        self.ui.btn_import = QPushButton(
+            "Import", self.ui.btn_delete.parentWidget())
+        self.ui.btn_import.setObjectName(u"btn_import")
+        self.ui.btn_import.setSizePolicy(self.ui.btn_delete.sizePolicy())
+        self.ui.btn_import.setMinimumSize(self.ui.btn_delete.minimumSize())
+        self.ui.btn_import.setCursor(self.ui.btn_delete.cursor())
+        self.ui.btn_import.setFocusPolicy(self.ui.btn_delete.focusPolicy())
+        self.ui.horizontalLayout_4.insertWidget(2, self.ui.btn_import)
+
         self.ui.btn_delete.clicked.connect(self.delete)
+        self.ui.btn_export.clicked.connect(self.export_cards)
+        self.ui.btn_import.clicked.connect(self.import_cards)
         self.ui.btn_cancel.clicked.connect(self.close)
         self.ui.btn_save.clicked.connect(self.save)
 
         self.ui.btn_delete.keyPressEvent = lambda event: keyPressEvent(
             event, function=self.delete(event))
+        self.ui.btn_export.keyPressEvent = lambda event: keyPressEvent(
+            event, function=self.export_cards)
+        self.ui.btn_import.keyPressEvent = lambda event: keyPressEvent(
+            event, function=self.import_cards)
         self.ui.btn_cancel.keyPressEvent = lambda event: keyPressEvent(
             event, function=self.close)
         self.ui.btn_save.keyPressEvent = lambda event: keyPressEvent(
@@ -151,6 +183,8 @@ class AppSettings(QMainWindow):
         )
         self.ui.btn_about.setStyleSheet(stylesheet)
         self.ui.btn_save.setStyleSheet(stylesheet)
+        self.ui.btn_export.setStyleSheet(stylesheet)
+        self.ui.btn_import.setStyleSheet(stylesheet)
 
         self.ui.btn_about.clicked.connect(
             lambda event: self.show_about(event, board.color))
@@ -194,18 +228,137 @@ class AppSettings(QMainWindow):
         ):
             for selected_board in selected_all:
                 board_obj = next(
-                    (board for board in Table.get_instance().boards if
-                     board.title == selected_board.text()), None)
+                    (location.item for location in Table.get_instance().query(
+                        "board", title=selected_board.text())), None)
                 self.boards_to_delete.append(board_obj)
                 self.ui.listWidget_manage_board.takeItem(
                     self.ui.listWidget_manage_board.row(selected_board))
 
+    def export_cards(self) -> None:
+        """Exports the cards of the selected boards, or of all the boards if
+        none is selected, to a CSV or JSON Lines file"""
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export Cards",
+            os.path.join(os.path.expanduser("~"), "Kanbaru.csv"),
+            "CSV (*.csv);;JSON Lines (*.jsonl)")
+        if not path:
+            return None
+        if not os.path.splitext(path)[1]:
+            path += ".jsonl" if "jsonl" in selected_filter else ".csv"
+        boards = [
+            location.item
+            for item in self.ui.listWidget_manage_board.selectedItems()
+            for location in Table.get_instance().query(
+                "board", title=item.text())
+        ]
+        try:
+            count = export(path, boards or None)
+        except (OSError, ValueError) as error:
+            logging.warning('Failed to export cards to "%s": %s', path, error)
+            dialog_factory(
+                title="Export Failed",
+                msg=f"The cards could not be exported:\n{error}",
+                yes_no=False,
+                btn_color=self.color
+            )
+            return None
+        dialog_factory(
+            title="Export Complete",
+            msg=f'{count} cards were exported to "{path}".',
+            yes_no=False,
+            btn_color=self.color
+        )
+
+    def import_cards(self) -> None:
+        """Imports the cards of a CSV, JSON Lines or Trello JSON file on the
+        table worker, showing the progress until the import is done. The
+        import can be cancelled until its cards are committed."""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Cards", os.path.expanduser("~"),
+            "Cards (*.csv *.jsonl *.json);;CSV (*.csv);;"
+            "JSON Lines (*.jsonl);;Trello JSON (*.json)")
+        if not path:
+            return None
+        progress = QProgressDialog("Importing cards...", "Cancel", 0, 0, self)
+        progress.setWindowTitle("Import Cards")
+        progress.setWindowModality(Qt.ApplicationModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        self.import_progress.connect(
+            lambda count: progress.setLabelText(
+                f"Importing cards... {count} done"))
+        cancelled = []
+        progress.canceled.connect(lambda: cancelled.append(True))
+        progress.show()
+
+        def report(count: int) -> None:
+            # Called on the worker thread
+            if cancelled:
+                raise ImportCancelled()
+            self.import_progress.emit(count)
+
+        def finish() -> None:
+            self.import_progress.disconnect()
+            progress.canceled.disconnect()
+            progress.close()
+
+        def failed(message: str) -> None:
+            finish()
+            if cancelled:
+                logging.info('Cancelled the import of "%s"', path)
+                return None
+            logging.warning('Failed to import cards from "%s": %s', path,
+                            message)
+            dialog_factory(
+                title="Import Failed",
+                msg=f"The cards could not be imported:\n{message}",
+                yes_no=False,
+                btn_color=self.color
+            )
+
+        TableWorker.get_instance().submit(
+            lambda: import_file(path, progress=report),
+            done=lambda count: self.show_imported(path, count, finish),
+            failed=failed)
+
+    def show_imported(self, path: str, count: int,
+                      finish: Callable[[], None]) -> None:
+        """Lists the boards created by an import and reports how many cards
+        it added.
+
+        Parameters
+        ----------
+        path : str
+            The path of the imported file.
+        count : int
+            The number of cards imported.
+        finish : Callable[[], None]
+            The function closing the progress dialog.
+        """
+        finish()
+        listed = {self.ui.listWidget_manage_board.item(i).text()
+                  for i in range(self.ui.listWidget_manage_board.count())}
+        listed.update(board.title for board in self.boards_to_delete)
+        self.ui.listWidget_manage_board.addItems(
+            [board.title for board in Table.get_instance().boards
+             if board.title not in listed])
+        if self.new_board_order:
+            self.rowsMoved()
+        dialog_factory(
+            title="Import Complete",
+            msg=f'{count} cards were imported from "{path}".',
+            yes_no=False,
+            btn_color=self.color
+        )
+
     def save(self) -> None:
         """Deletes the selected boards and saves the new board order"""
-        for board in self.boards_to_delete:
-            Table.get_instance().delete_board(board)
-        if len(self.new_board_order) != 0:
-            Table.get_instance().update_board_order(self.new_board_order)
+        with Table.get_instance().transaction() as table:
+            for board in self.boards_to_delete:
+                table.delete_board(board)
+            if len(self.new_board_order) != 0:
+                table.update_board_order(self.new_board_order)
         self.close()
 
     def rowsMoved(self) -> None:
@@ -215,8 +368,8 @@ class AppSettings(QMainWindow):
             for i in range(self.ui.listWidget_manage_board.count())
         ]
         self.new_board_order = [
-            next((board for board in Table.get_instance().boards
-                  if board.title == board_title), None)
+            next((location.item for location in Table.get_instance().query(
+                "board", title=board_title)), None)
             for board_title in self.new_board_order
         ]
 
@@ -226,5 +379,7 @@ class AppSettings(QMainWindow):
         self.ui.label_manage_board.setFont(QFont(toruspro, 14, QFont.Bold))
         self.ui.label_manage_board_desc.setFont(QFont(toruspro, 11))
         self.ui.btn_delete.setFont(QFont(toruspro, 12))
+        self.ui.btn_export.setFont(QFont(toruspro, 12))
+        self.ui.btn_import.setFont(QFont(toruspro, 12))
         self.ui.btn_cancel.setFont(QFont(toruspro, 12))
         self.ui.btn_save.setFont(QFont(toruspro, 12))
@@ -265,8 +265,9 @@ class BoardSettings(QMainWindow):
         ):
             for selected_panel in selected_all:
                 panel_obj = next(
-                    (panel for panel in self.board.panels if
-                     panel.title == selected_panel.text()), None)
+                    (location.item for location in Table.get_instance().query(
+                        "panel", board=self.board,
+                        title=selected_panel.text())), None)
                 self.panels_to_delete.append(panel_obj)
                 self.ui.listWidget_manage_panel.takeItem(
                     self.ui.listWidget_manage_panel.row(selected_panel))
@@ -307,20 +308,19 @@ class BoardSettings(QMainWindow):
             )
             self.rename(event)
             return None
-        for board in Table.get_instance().boards:
-            for panel in board.panels:
-                if panel.title == text:
-                    dialog_factory(
-                        title="Invalid Name",
-                        msg=f'Panel "{text}" already exists!',
-                        yes_no=False,
-                        btn_color=self.color
-                    )
-                    self.rename(event)
-                    return None
+        if Table.get_instance().title_exists("panel", text, self.board.id):
+            dialog_factory(
+                title="Invalid Name",
+                msg=f'Panel "{text}" already exists!',
+                yes_no=False,
+                btn_color=self.color
+            )
+            self.rename(event)
+            return None
         panel_obj = next(
-            (panel for panel in self.board.panels if
-             panel.title == selected_all[0].text()), None)
+            (location.item for location in Table.get_instance().query(
+                "panel", board=self.board, title=selected_all[0].text())),
+            None)
         new_panel = Panel(
             title=text,
             card_lists=panel_obj.cards
@@ -334,31 +334,30 @@ class BoardSettings(QMainWindow):
 
     def save(self) -> None:
         """Deletes the selected panels and saves the board order."""
-        for panel in self.panels_to_delete:
-            Table.get_instance().delete_panel(panel)
         if self.old_board.title != self.title_txt:
-            for board in Table.get_instance().boards:
-                if not self.title_txt:
-                    dialog_factory(
-                        title="Invalid Name",
-                        msg="Board name cannot be empty!",
-                        yes_no=False,
-                        btn_color=self.color
-                    )
-                    self.title = self.old_board.title
-                    return None
-                if board.title == self.title_txt:
-                    dialog_factory(
-                        title="Invalid Name",
-                        msg=f'Board "{self.title_txt}" already exists!',
-                        yes_no=False,
-                        btn_color=self.color
-                    )
-                    return None
-        Table.get_instance().update_board(self.old_board, self)
-        if len(self.new_panel_order) != 0:
-            Table.get_instance().update_panel_order(
-                self.board, self.new_panel_order)
+            if not self.title_txt:
+                dialog_factory(
+                    title="Invalid Name",
+                    msg="Board name cannot be empty!",
+                    yes_no=False,
+                    btn_color=self.color
+                )
+                self.title = self.old_board.title
+                return None
+            if Table.get_instance().title_exists("board", self.title_txt):
+                dialog_factory(
+                    title="Invalid Name",
+                    msg=f'Board "{self.title_txt}" already exists!',
+                    yes_no=False,
+                    btn_color=self.color
+                )
+                return None
+        with Table.get_instance().transaction() as table:
+            for panel in self.panels_to_delete:
+                table.delete_panel(panel)
+            table.update_board(self.old_board, self)
+            if len(self.new_panel_order) != 0:
+                table.update_panel_order(self.board, self.new_panel_order)
         self.close()
 
     @property
@@ -416,8 +415,8 @@ class BoardSettings(QMainWindow):
         self.new_panel_order = [self.ui.listWidget_manage_panel.item(
             i).text() for i in range(self.ui.listWidget_manage_panel.count())]
         self.new_panel_order = [
-            next((panel for panel in self.board.panels
-                  if panel.title == panel_title), None)
+            next((location.item for location in Table.get_instance().query(
+                "panel", board=self.board, title=panel_title)), None)
             for panel_title in self.new_panel_order
         ]
 
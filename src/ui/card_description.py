@@ -4,10 +4,14 @@ from PySide6.QtWidgets import QMainWindow
 
 from db import Table
 from dialog import dialog_factory
-from kanbaru_objects import Card
+from kanbaru_objects import Card, format_date, format_time
 from ui.card_description_ui import Ui_CardWindow
+from ui.worker import TableWorker
 from utils import hex_to_rgba, keyPressEvent, modify_hex_color, setup_font_db
 
+# The Julian day of 01-01-0001, the first day ordinal of the cards.
+JULIAN_DAY_OFFSET = 1721425
+
 
 class CardDescription(QMainWindow):
     def __init__(self, card: Card, color: str) -> None:
@@ -18,6 +22,9 @@ class CardDescription(QMainWindow):
         self.ui.setupUi(self)
 
         self.ui.lineEdit_title.textChanged.connect(self.title_listener)
+        # A card without a due date or time keeps none unless one is picked
+        self.day_set = card.day is not None
+        self.minute_set = card.minute is not None
 
         self.ui.btn_delete.clicked.connect(
             lambda: dialog_factory(
@@ -48,9 +55,16 @@ class CardDescription(QMainWindow):
         self.card = card
         self.color = color
         self.title = card.title
-        self.date = card.date
-        self.time = card.time
-        self.description = card.description
+        self.day = card.day
+        self.minute = card.minute
+        self.ui.calendarWidget.selectionChanged.connect(self.day_listener)
+        self.ui.calendarWidget.clicked.connect(self.day_listener)
+        self.ui.timeEdit.timeChanged.connect(self.minute_listener)
+        self.loading = False
+        if card.description_loaded:
+            self.description = card.description
+        else:
+            self.load_description()
 
         color = hex_to_rgba(color)
         stylesheet = \
@@ -274,8 +288,32 @@ class CardDescription(QMainWindow):
 
         self.setup_font()
 
+    def load_description(self) -> None:
+        """Reads the description of the card on the worker thread, see
+        `TableWorker`, so the window opens without waiting for the table
+        file. The description cannot be edited or saved meanwhile."""
+        self.loading = True
+        self.ui.textEdit_description.setEnabled(False)
+        self.ui.textEdit_description.setPlaceholderText("Loading...")
+        self.ui.btn_save.setEnabled(False)
+        TableWorker.get_instance().submit(
+            Table.get_instance().prefetch, self.card,
+            done=lambda _: self.show_description(),
+            failed=lambda _: self.show_description())
+
+    def show_description(self) -> None:
+        """Shows the description of the card once it has been read, or
+        reads it now if the worker failed to."""
+        self.description = self.card.description
+        self.ui.textEdit_description.setPlaceholderText("")
+        self.ui.textEdit_description.setEnabled(True)
+        self.ui.btn_save.setEnabled(True)
+        self.loading = False
+
     def save(self) -> None:
         """Saves the card to the table."""
+        if self.loading:
+            return None
         if self.title_txt == "":
             dialog_factory(
                 title="Invalid Title",
@@ -285,40 +323,51 @@ class CardDescription(QMainWindow):
             )
             self.title = self.card.title
             return None
-        card_old = Card(self.card.title, self.card.date,
-                        self.card.time, self.card.description)
-        if card_old.title != self.title_txt:
-            for board in Table.get_instance().boards:
-                for panel in board.panels:
-                    for card in panel.cards:
-                        if card.title == self.title_txt:
-                            dialog_factory(
-                                title="Invalid Title",
-                                msg="Card already exists!",
-                                yes_no=False,
-                                btn_color=self.color
-                            )
-                            return None
-        if card_old != self:
+        card_old = Card(self.card.title, self.card.day,
+                        self.card.minute, self.card.description, self.card.id)
+        if (card_old.title != self.title_txt and
+                Table.get_instance().title_exists("card", self.title_txt)):
+            dialog_factory(
+                title="Invalid Title",
+                msg="Card already exists!",
+                yes_no=False,
+                btn_color=self.color
+            )
+            return None
+        if not card_old.deep_equals(self):
             Table.get_instance().update_card(card_old, self)
         self.close()
 
     def delete(self, event: QEvent) -> None:
         """Deletes the card from the table."""
-        Table.get_instance().delete_card(self)
+        Table.get_instance().delete_card(self.card)
         self.close()
 
     @property
     def title(self) -> str:
         return self.title_txt
 
+    @property
+    def day(self) -> int | None:
+        if not self.day_set:
+            return None
+        return self.ui.calendarWidget.selectedDate().toJulianDay() - \
+            JULIAN_DAY_OFFSET
+
+    @property
+    def minute(self) -> int | None:
+        if not self.minute_set:
+            return None
+        time = self.ui.timeEdit.time()
+        return time.hour() * 60 + time.minute()
+
     @property
     def date(self) -> str:
-        return self.ui.calendarWidget.selectedDate().toString("dd-MM-yyyy")
+        return format_date(self.day)
 
     @property
     def time(self) -> str:
-        return self.ui.timeEdit.time().toString("hh:mm")
+        return format_time(self.minute)
 
     @property
     def description(self) -> str:
@@ -328,14 +377,16 @@ class CardDescription(QMainWindow):
     def title(self, title: str) -> None:
         self.ui.lineEdit_title.setText(title)
 
-    @date.setter
-    def date(self, date: str) -> None:
-        self.ui.calendarWidget.setSelectedDate(
-            QDate.fromString(date, "dd-MM-yyyy"))
+    @day.setter
+    def day(self, day: int | None) -> None:
+        if day is not None:
+            self.ui.calendarWidget.setSelectedDate(
+                QDate.fromJulianDay(day + JULIAN_DAY_OFFSET))
 
-    @time.setter
-    def time(self, time: str) -> None:
-        self.ui.timeEdit.setTime(QTime.fromString(time, "hh:mm"))
+    @minute.setter
+    def minute(self, minute: int | None) -> None:
+        if minute is not None:
+            self.ui.timeEdit.setTime(QTime(minute // 60, minute % 60))
 
     @description.setter
     def description(self, description: str) -> None:
@@ -344,6 +395,12 @@ class CardDescription(QMainWindow):
     def title_listener(self, text: str) -> None:
         self.title_txt = text
 
+    def day_listener(self, date: QDate = None) -> None:
+        self.day_set = True
+
+    def minute_listener(self, time: QTime) -> None:
+        self.minute_set = True
+
     def setup_font(self) -> None:
         notosans = setup_font_db("NotoSans.ttf")[0]
         toruspro = setup_font_db("TorusPro.ttf")[0]
@@ -1,21 +1,24 @@
 import datetime
 import logging
 
-from PySide6.QtCore import QCoreApplication, QEvent, QSize, Qt, Slot
+from PySide6.QtCore import (QCoreApplication, QEvent, QModelIndex, QSize,
+                            QStringListModel, Qt, QTimer, Slot)
 from PySide6.QtGui import QCursor, QDragMoveEvent, QDropEvent, QFont
 from PySide6.QtWidgets import (QAbstractItemView, QAbstractScrollArea,
-                               QApplication, QFrame, QLabel, QListWidget,
-                               QListWidgetItem, QMainWindow, QPushButton,
-                               QSizePolicy, QSpacerItem, QVBoxLayout, QWidget)
+                               QApplication, QCompleter, QFrame, QLabel,
+                               QLineEdit, QListWidget, QListWidgetItem,
+                               QMainWindow, QMenu, QPushButton, QSizePolicy,
+                               QSpacerItem, QVBoxLayout, QWidget)
 
-from db import Table
+from db import Location, Table
 from dialog import dialog_factory, input_dialog_factory
-from kanbaru_objects import Board, Card, Panel
+from kanbaru_objects import Board, Card, Panel, format_date, format_time
 from ui.about import About
 from ui.app_settings import AppSettings
 from ui.board_settings import BoardSettings
 from ui.card_description import CardDescription
 from ui.main_ui import Ui_MainWindow
+from ui.worker import TableWorker
 from utils import (hex_to_rgba, keyPressEvent, modify_hex_color, overrides,
                    setup_font_db)
 
@@ -28,6 +31,7 @@ class MainScreen(QMainWindow):
         parent.ui.setupUi(parent)
 
         self.current_board: Board = Table.get_instance().boards[0]
+        self.search_results: list[Location] = []
 
         parent.ui.btn_app_settings.clicked.connect(
             lambda: self.show_app_settings(parent))
@@ -44,6 +48,9 @@ class MainScreen(QMainWindow):
         parent.ui.btn_add_board.keyPressEvent = lambda event: keyPressEvent(
             event, parent, self.add_board(parent))
 
+        self.setup_search(parent)
+        self.setup_due(parent)
+        self.setup_watcher(parent)
         self.update_whole_page(parent)
 
     def update_whole_page(self, parent: QMainWindow) -> None:
@@ -53,7 +60,7 @@ class MainScreen(QMainWindow):
         def on_button_click(board):
             def callback():
                 updated_board = self.get_updated_board(board)
-                self.change_board(parent, updated_board)
+                self.open_board(parent, updated_board)
             return callback
 
         for index, board in enumerate(tb_boards):
@@ -91,6 +98,229 @@ class MainScreen(QMainWindow):
         self.about = About(self.current_board.color)
         self.about.show()
 
+    def setup_search(self, parent: QMainWindow) -> None:
+        """Adds the search box next to the board title
+        - Suggest the cards matching the text while typing
+        - Jump to the chosen card, or to the first match on enter
+
+        Parameters
+        ----------
+        parent : QMainWindow
+            The main window
+        """
+        parent.ui.lineEdit_search = QLineEdit(
+            parent.ui.label_board.parentWidget())
+        parent.ui.lineEdit_search.setObjectName(u"lineEdit_search")
+        parent.ui.lineEdit_search.setPlaceholderText("Search cards")
+        parent.ui.lineEdit_search.setClearButtonEnabled(True)
+        parent.ui.lineEdit_search.setMinimumSize(QSize(220, 34))
+        parent.ui.lineEdit_search.setMaximumSize(QSize(320, 34))
+        parent.ui.lineEdit_search.setStyleSheet(
+            """
+            QLineEdit {
+                background-color: #ebecf0;
+                color: #282c33;
+                border-radius: 5px;
+                padding: 0 8px 0 8px;
+                margin: 0 10px 0 10px;
+            }
+            QLineEdit:focus {
+                background-color: #ffffff;
+            }
+            """
+        )
+        parent.ui.horzLayout_panel_right.addWidget(parent.ui.lineEdit_search)
+
+        parent.ui.search_model = QStringListModel(parent)
+        parent.ui.search_completer = QCompleter(parent.ui.search_model, parent)
+        parent.ui.search_completer.setCompletionMode(
+            QCompleter.UnfilteredPopupCompletion)
+        parent.ui.search_completer.setMaxVisibleItems(10)
+        parent.ui.lineEdit_search.setCompleter(parent.ui.search_completer)
+
+        parent.ui.lineEdit_search.textEdited.connect(
+            lambda text: self.search(parent, text))
+        parent.ui.search_completer.activated[QModelIndex].connect(
+            lambda index: self.jump_to_card(
+                parent, self.search_results[index.row()]))
+        parent.ui.lineEdit_search.returnPressed.connect(
+            lambda: self.search_results and self.jump_to_card(
+                parent, self.search_results[0]))
+
+    def setup_due(self, parent: QMainWindow) -> None:
+        """Adds the due cards button next to the search box
+        - List the overdue cards and the cards due in the next 7 days
+        - Jump to the chosen card
+
+        Parameters
+        ----------
+        parent : QMainWindow
+            The main window
+        """
+        parent.ui.btn_due = QPushButton(
+            "Due", parent.ui.label_board.parentWidget())
+        parent.ui.btn_due.setObjectName(u"btn_due")
+        parent.ui.btn_due.setMinimumSize(QSize(80, 34))
+        parent.ui.btn_due.setCursor(QCursor(Qt.PointingHandCursor))
+        parent.ui.btn_due.setStyleSheet(
+            """
+            QPushButton {
+                background-color: #ebecf0;
+                color: #282c33;
+                border-radius: 5px;
+                padding: 0 8px 0 8px;
+            }
+            QPushButton:hover {
+                background-color: #ffffff;
+            }
+            QPushButton::menu-indicator {
+                width: 0px;
+            }
+            """
+        )
+        parent.ui.menu_due = QMenu(parent.ui.btn_due)
+        parent.ui.btn_due.setMenu(parent.ui.menu_due)
+        parent.ui.horzLayout_panel_right.addWidget(parent.ui.btn_due)
+
+        parent.ui.menu_due.aboutToShow.connect(
+            lambda: self.show_due(parent))
+
+    def show_due(self, parent: QMainWindow, days: int = 7,
+                 limit: int = 20) -> None:
+        """List the overdue cards and the cards due in the next days in the
+        due cards menu
+
+        Parameters
+        ----------
+        parent : QMainWindow
+            The main window
+        days : int, optional
+            The number of days to look ahead, by default 7
+        limit : int, optional
+            The maximum number of cards listed in each section, by default 20
+        """
+        table = Table.get_instance()
+        now = datetime.datetime.now()
+        menu = parent.ui.menu_due
+        menu.clear()
+        for section, locations in [
+                ("Overdue", table.overdue(now, limit)),
+                (f"Next {days} days", table.upcoming(days, now, limit))]:
+            menu.addSection(section)
+            if not locations:
+                menu.addAction("No cards").setEnabled(False)
+            for location in locations:
+                card = location.item
+                action = menu.addAction(
+                    f"{format_date(card.day)} {format_time(card.minute)}  "
+                    f"{card.title}  ({location.board.title} / "
+                    f"{location.panel.title})")
+                action.triggered.connect(
+                    lambda checked=False, location=location:
+                    self.jump_to_card(parent, location))
+
+    def setup_watcher(self, parent: QMainWindow,
+                      interval: int = 2000) -> None:
+        """Set up a timer that checks every `interval` milliseconds whether
+        another process, e.g. the command line interface, changed the table
+        file, see `reload()`.
+
+        Parameters
+        ----------
+        parent : QMainWindow
+            The main window
+        interval : int, optional
+            The number of milliseconds between checks, by default 2000
+        """
+        self.watcher = QTimer(parent)
+        self.watcher.timeout.connect(lambda: self.reload(parent))
+        self.watcher.start(interval)
+
+    def reload(self, parent: QMainWindow) -> None:
+        """Reload the boards changed by another process on the worker
+        thread, see `TableWorker`, and rebuild the page if any did. Nothing
+        is reloaded while a window is open, so the boards, panels and cards
+        it shows stay current, or while the worker is busy.
+
+        Parameters
+        ----------
+        parent : QMainWindow
+            The main window
+        """
+        worker = TableWorker.get_instance()
+        if QApplication.activeModalWidget() is not None or worker.busy:
+            return None
+        worker.submit(Table.get_instance().reload,
+                      done=lambda changed: self.show_reloaded(parent, changed))
+
+    def show_reloaded(self, parent: QMainWindow, changed: set[str]) -> None:
+        """Rebuild the page after `reload()` if any board changed. If a
+        window was opened meanwhile, the page is rebuilt when it closes.
+
+        Parameters
+        ----------
+        parent : QMainWindow
+            The main window
+        changed : set[str]
+            The IDs of the boards that changed
+        """
+        if not changed or QApplication.activeModalWidget() is not None:
+            return None
+        board = self.get_updated_board(self.current_board) or \
+            Table.get_instance().boards[-1]
+        self.clear_page(parent)
+        self.update_whole_page(parent)
+        self.change_board(parent, board)
+
+    def search(self, parent: QMainWindow, text: str) -> None:
+        """Search the cards and list the matches under the search box
+
+        Parameters
+        ----------
+        parent : QMainWindow
+            The main window
+        text : str
+            The words to look for
+        """
+        self.search_results = Table.get_instance().search(text, limit=20)
+        parent.ui.search_model.setStringList([
+            f"{location.item.title}  ({location.board.title} / "
+            f"{location.panel.title})"
+            for location in self.search_results
+        ])
+        if self.search_results:
+            parent.ui.search_completer.complete()
+
+    def jump_to_card(self, parent: QMainWindow, location: Location) -> None:
+        """Show the board of a card and select the card in its panel
+
+        Parameters
+        ----------
+        parent : QMainWindow
+            The main window
+        location : Location
+            The location of the card
+        """
+        location = Table.get_instance().locate(location.item.id)
+        if location is None:
+            return None
+        self.change_board(parent, location.board)
+        list_widgets = [
+            list_widget for list_widget in
+            parent.ui.scrollAreaContent_panel_right.findChildren(
+                CustomListWidget)
+            if getattr(list_widget, "data").id == location.panel.id
+        ]
+        if not list_widgets:
+            return None
+        # Widgets of the previous page are only deleted later, so the last
+        # one created is the one on the page
+        list_widget = list_widgets[-1]
+        parent.ui.scrollArea_panel_right.ensureWidgetVisible(list_widget)
+        list_widget.setCurrentRow(location.position)
+        list_widget.scrollToItem(list_widget.currentItem())
+        list_widget.setFocus()
+
     def board_factory(self, parent: Ui_MainWindow, board: Board, font: str,
                       is_constructed: bool = True) -> QPushButton:
         """Creates a board button widget
@@ -564,18 +794,22 @@ class MainScreen(QMainWindow):
         parent.ui.btn_add_list.setFont(QFont(font_tb, 12))
 
     def show_app_settings(self, parent: Ui_MainWindow) -> None:
-        """Show the application settings window
+        """Show the application settings window. The page is only rebuilt if
+        the table changed while the window was open.
 
         Parameters
         ----------
         parent : Ui_MainWindow
             The main window
         """
+        generation = Table.get_instance().generation
         app_settings = AppSettings(self.current_board)
         app_settings.setWindowModality(Qt.ApplicationModal)
         app_settings.show()
         while app_settings.isVisible():
             QCoreApplication.processEvents()
+        if generation == Table.get_instance().generation:
+            return None
         try:
             self.clear_page(parent)
             self.update_whole_page(parent)
@@ -586,26 +820,31 @@ class MainScreen(QMainWindow):
             return None
 
     def show_board_settings(self, parent: QMainWindow) -> None:
-        """Show the board settings window
+        """Show the board settings window. The page is only rebuilt if the
+        table changed while the window was open.
 
         Parameters
         ----------
         parent : Ui_MainWindow
             The main window
         """
+        generation = Table.get_instance().generation
         board_settings = BoardSettings(self.current_board)
-        index = Table.get_instance().boards.index(self.current_board)
+        index = Table.get_instance().locate(self.current_board.id).position
         board_settings.setWindowModality(Qt.ApplicationModal)
         board_settings.show()
         while board_settings.isVisible():
             QCoreApplication.processEvents()
+        if generation == Table.get_instance().generation:
+            return None
         self.clear_page(parent)
         self.update_whole_page(parent)
         self.change_board(parent, Table.get_instance().boards[index])
 
     def show_card_description(self, event: QEvent, list_widget: QListWidget,
                               parent: QMainWindow, color: str) -> None:
-        """Show the card description window
+        """Show the card description window. The page is only rebuilt if the
+        table changed while the window was open.
 
         Parameters
         ----------
@@ -616,12 +855,15 @@ class MainScreen(QMainWindow):
         parent : QListWidget
             The parent QListWidget
         """
+        generation = Table.get_instance().generation
         card = list_widget.item(event.row()).data(Qt.UserRole)
         card_description = CardDescription(card, color)
         card_description.setWindowModality(Qt.ApplicationModal)
         card_description.show()
         while card_description.isVisible():
             QCoreApplication.processEvents()
+        if generation == Table.get_instance().generation:
+            return None
         self.clear_page(parent)
         self.update_whole_page(parent)
         self.change_board(parent, self.get_updated_board(self.current_board))
@@ -635,9 +877,7 @@ class MainScreen(QMainWindow):
         Board
             The current board
         """
-        for board in Table.get_instance().boards:
-            if board.title == current_board.title:
-                return board
+        return Table.get_instance().find(current_board.id)
 
     def add_board(self, parent: Ui_MainWindow) -> None:
         """Add a new board
@@ -655,8 +895,7 @@ class MainScreen(QMainWindow):
             )
             if text is None:
                 return None
-            if any(board.title == text for
-                   board in Table.get_instance().boards):
+            if Table.get_instance().title_exists("board", text):
                 dialog_factory(
                     title="Invalid Title",
                     msg=f'Board "{text}" already exists!',
@@ -672,17 +911,7 @@ class MainScreen(QMainWindow):
                 yes_no=False,
                 btn_color=self.current_board.color
             )
-        data = Table.get_instance().data
-        data.append(
-            {
-                "_Board__title": text,
-                "_Board__panels_lists": [],
-                "_Board__color": "LIGHTBLUE"
-            }
-        )
-        Table.get_instance().data = data
-        Table.get_instance().write()
-        logging.info(f'Board "{text}" added')
+        Table.get_instance().add_board(text)
         self.clear_page(parent)
         self.update_whole_page(parent)
         self.change_board(parent, Table.get_instance().boards[-1])
@@ -705,9 +934,7 @@ class MainScreen(QMainWindow):
             )
             if text is None:
                 return None
-            if any(panel.title == text for
-                   other_board in Table.get_instance().boards for
-                   panel in other_board.panels):
+            if Table.get_instance().title_exists("panel", text, board.id):
                 dialog_factory(
                     title="Invalid Title",
                     msg=f'Panel "{text}" already exists!',
@@ -721,34 +948,10 @@ class MainScreen(QMainWindow):
                 msg="Panel title cannot be empty!",
                 yes_no=False,
                 btn_color=self.current_board.color)
-        data = Table.get_instance().data
-        for i, tb_board in enumerate(Table.get_instance().boards):
-            if tb_board.title == board.title:
-                panels_list = data[i].get(
-                    "_Board__panels_lists")
-                try:
-                    panel = {
-                        "_Panel__title": text,
-                        "_Board__panels": []
-                    }
-                    panels_list.append(panel)
-                except AttributeError:
-                    panels_list = [{
-                        "_Panel__title": text, "_Board__panels": []
-                    }]
-                    data.get(
-                        "_Table__data")[i]["_Board__panels_lists"] = \
-                        panels_list
-                Table.get_instance().data = data
-                Table.get_instance().write()
-                logging.info(f'Panel "{text}" added to board {board.title}')
-                self.change_board(
-                    parent, Table.get_instance().boards[i])
-                parent.ui.scrollArea_panel_right.horizontalScrollBar(
-                ).setValue(
-                    parent.ui.scrollArea_panel_right.horizontalScrollBar(
-                    ).maximum())
-                return None
+        Table.get_instance().add_panel(board, text)
+        self.change_board(parent, self.get_updated_board(board))
+        parent.ui.scrollArea_panel_right.horizontalScrollBar().setValue(
+            parent.ui.scrollArea_panel_right.horizontalScrollBar().maximum())
 
     def add_card(self, parent: Ui_MainWindow, panel: Panel) -> None:
         """Add a new card
@@ -776,48 +979,49 @@ class MainScreen(QMainWindow):
                 yes_no=False,
                 btn_color=self.current_board.color
             )
-        data = Table.get_instance().data
-        for i, board in enumerate(Table.get_instance().boards):
-            for j, panel_ in enumerate(board.panels):
-                if panel_.title == panel.title:
-                    if any(card.title == text for card in panel_.cards):
-                        dialog_factory(
-                            title="Invalid Title",
-                            msg=f'Card "{text}" already exists!',
-                            yes_no=False,
-                            btn_color=self.current_board.color
-                        )
-                        self.add_card(parent, panel)
-                        return None
-                    try:
-                        data[i].get(
-                            "_Board__panels_lists")[j].get(
-                            "_Board__panels").append({
-                                "_Card__title": text,
-                                "_Card__description": "",
-                                "_Card__date": datetime.date.today()
-                                .strftime("%d-%m-%Y"),
-                                "_Card__time": datetime.datetime.now()
-                                .strftime("%H:%M")
-                            })
-                    except KeyError:
-                        data.get(
-                            "_Table__data")[i].get(
-                                "_Board__panels_lists")[j]["_Board__panels"] =\
-                            [{
-                                "_Card__title": text,
-                                "_Card__description": "",
-                                "_Card__date": datetime.date.today()
-                                .strftime("%d-%m-%Y"),
-                                "_Card__time": datetime.datetime.now()
-                                .strftime("%H:%M")
-                            }]
-                    Table.get_instance().data = data
-                    Table.get_instance().write()
-                    logging.info(
-                        f'Card "{text}" added to panel "{panel.title}"')
-                    self.change_board(
-                        parent, Table.get_instance().boards[i])
+        location = Table.get_instance().locate(panel.id)
+        if location is None:
+            return None
+        if Table.get_instance().title_exists("card", text, panel.id):
+            dialog_factory(
+                title="Invalid Title",
+                msg=f'Card "{text}" already exists!',
+                yes_no=False,
+                btn_color=self.current_board.color
+            )
+            self.add_card(parent, panel)
+            return None
+        now = datetime.datetime.now()
+        Table.get_instance().add_card(location.item, Card(
+            title=text,
+            date=now.toordinal(),
+            time=now.hour * 60 + now.minute
+        ))
+        self.change_board(parent, location.board)
+
+    def open_board(self, parent: Ui_MainWindow, board: Board) -> None:
+        """Change the board to the specified board. The panels of a board
+        that has not been loaded yet are read on the worker thread first, see
+        `TableWorker`, so the window stays responsive meanwhile.
+
+        Parameters
+        ----------
+        parent : Ui_MainWindow
+            The parent widget
+        board : Board
+            The board to change to
+        """
+        if board.loaded:
+            self.change_board(parent, board)
+            return None
+
+        def show(_) -> None:
+            updated_board = self.get_updated_board(board)
+            if updated_board is not None:
+                self.change_board(parent, updated_board)
+
+        TableWorker.get_instance().submit(
+            Table.get_instance().prefetch, board, done=show, failed=show)
 
     def change_board(self, parent: Ui_MainWindow, board: Board) -> None:
         """Change the board to the specified board
@@ -850,11 +1054,8 @@ class MainScreen(QMainWindow):
     def change_card(board: Board, source: Panel, destination: Panel, card: Card,
                     index: int = None) -> None:
         """Change the card in a panel to another panel
-        - Get the data from the table
-        - Find the source panel and the specified card
-        - Find the destination panel and add the card at a specified index
-        - Remove the card from the source panel
-        - Update the table
+        - Move the card from the source panel to the specified index of the
+        destination panel in the table, locating both by their IDs
 
         Parameters
         ----------
@@ -868,31 +1069,8 @@ class MainScreen(QMainWindow):
             The index position to add the card in the destination panel,
             by default None (adds at the end)
         """
-        data = Table.get_instance().data
-        for i, b in enumerate(Table.get_instance().boards):
-            if b.title == board.title:
-                break
-        print(source.data.title)
-        source_list = next(
-            (pan for pan in data[i].get("_Board__panels_lists", [])
-             if pan.get("_Panel__title") == getattr(source, "data").title), {})
-        card_to_move = next(
-            (card_ for card_ in source_list.get("_Board__panels", [])
-             if card_.get("_Card__title") == card.title), {})
-        if card_to_move:
-            source_list.get("_Board__panels").remove(card_to_move)
-            dest_list = next(
-                (pan for pan in data[i].get("_Board__panels_lists", [])
-                 if pan.get("_Panel__title") == getattr(
-                     destination, "data").title), {})
-            try:
-                if index is None or index >= len(dest_list["_Board__panels"]):
-                    dest_list["_Board__panels"].append(card_to_move)
-                else:
-                    dest_list["_Board__panels"].insert(index, card_to_move)
-            except KeyError:
-                dest_list["_Board__panels"] = [card_to_move]
-            Table.get_instance().data = data
+        Table.get_instance().move_card(
+            card, getattr(destination, "data"), index)
 
     @staticmethod
     def clear_page(parent: Ui_MainWindow) -> None:
@@ -929,6 +1107,8 @@ class MainScreen(QMainWindow):
         parent.ui.btn_add_board.setFont(QFont(toruspro, 12))
         parent.ui.btn_board_settings.setFont(QFont(toruspro, 12))
         parent.ui.btn_app_settings.setFont(QFont(toruspro, 12))
+        parent.ui.lineEdit_search.setFont(QFont(toruspro, 12))
+        parent.ui.btn_due.setFont(QFont(toruspro, 12))
 
 
 class CustomListWidget(QListWidget):
@@ -1113,30 +1293,31 @@ class CustomListWidget(QListWidget):
         items = source_widget.selectedItems()
 
         logging.info(
-            f'Moving {len(items)} Card{"s" if len(items) > 1 else ""} '
-            f'({[item.data(Qt.UserRole).title for item in items]}) '
-            f'from panel "{source_widget.data.title}" to panel '
-            f'"{dest_widget.data.title}"')
-
-        for i, item in enumerate(items):
-            source_widget.takeItem(source_widget.row(item))
-
-            index = dest_widget.row(dest_widget.itemAt(event.pos()))
-            if index < 0:
-                index = dest_widget.count()
-
-            index += i
-            if source_widget == dest_widget:
-                if len(items) > 1:
-                    index -= 1
-                dest_widget.insertItem(index, item)
-
-            logging.info(
-                f'Moved card "{item.data(Qt.UserRole).title}" to {index=}')
-
-            MainScreen.change_card(self.board, source_widget, dest_widget,
-                                   item.data(Qt.UserRole), index)
-            Table.get_instance().write()
+            'Moving %d Card%s (%s) from panel "%s" to panel "%s"', len(items),
+            "s" if len(items) > 1 else "",
+            [item.data(Qt.UserRole).title for item in items],
+            source_widget.data.title, dest_widget.data.title)
+
+        with Table.get_instance().transaction():
+            for i, item in enumerate(items):
+                source_widget.takeItem(source_widget.row(item))
+
+                index = dest_widget.row(dest_widget.itemAt(event.pos()))
+                if index < 0:
+                    index = dest_widget.count()
+
+                index += i
+                if source_widget == dest_widget:
+                    if len(items) > 1:
+                        index -= 1
+                    dest_widget.insertItem(index, item)
+
+                logging.info('Moved card "%s" to index=%d',
+                             item.data(Qt.UserRole).title, index)
+
+                MainScreen.change_card(self.board, source_widget,
+                                       dest_widget, item.data(Qt.UserRole),
+                                       index)
         event.accept()
 
         super().dropEvent(event)
@@ -0,0 +1,141 @@
+"""Runs the reads of the table file off the GUI thread.
+
+The table records every change as a `storage.Change` and writes them to the
+table file on its write-behind thread, see `Table.start_write_behind()`, so
+the GUI thread only ever changes the boards, panels and cards in memory.
+`TableWorker` reports those writes through Qt signals, and runs the reads the
+GUI would otherwise wait for, e.g. `Table.reload()` or `Table.prefetch()`,
+on a thread of its own.
+"""
+import logging
+from typing import Any, Callable, Dict, Tuple
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+
+class _JobSignals(QObject):
+    finished = Signal(object, object)
+    failed = Signal(object, str)
+
+
+class _Job(QRunnable):
+    """A function run by the worker. Its result is sent to the worker, which
+    lives on the GUI thread, through signals."""
+
+    def __init__(self, function: Callable, args: Tuple) -> None:
+        QRunnable.__init__(self)
+        self.setAutoDelete(False)
+        self.function = function
+        self.args = args
+        self.signals = _JobSignals()
+
+    def run(self) -> None:
+        try:
+            result = self.function(*self.args)
+        except Exception as e:
+            logging.warning("Failed to run a table job in the background",
+                            exc_info=True)
+            self.signals.failed.emit(self, str(e))
+        else:
+            self.signals.finished.emit(self, result)
+
+
+class TableWorker(QObject):
+    """Runs table functions on a background thread, one at a time, and calls
+    back on the GUI thread when they are done. Also reports the writes of
+    the write-behind thread of the table through `written` and
+    `write_failed`.
+
+    Use `TableWorker.get_instance()` to get the instance of the worker, from
+    the GUI thread.
+    """
+
+    written = Signal()
+    write_failed = Signal(str)
+
+    _instance: "TableWorker" = None
+
+    def __init__(self) -> None:
+        assert TableWorker._instance is None, \
+            "TableWorker class is a singleton class!"
+        QObject.__init__(self)
+        TableWorker._instance = self
+
+        self._pool = QThreadPool(self)
+        # The table file is read by one thread at a time anyway
+        self._pool.setMaxThreadCount(1)
+        self._jobs: Dict[_Job, Tuple[Callable | None, Callable | None]] = {}
+
+    @staticmethod
+    def get_instance() -> "TableWorker":
+        """Static method to return the instance of the worker class.
+
+        Returns
+        -------
+        _instance : TableWorker
+            The instance of the worker class.
+        """
+        if TableWorker._instance is None:
+            TableWorker()
+        return TableWorker._instance
+
+    @property
+    def busy(self) -> bool:
+        """Whether a job is running or waiting to run."""
+        return bool(self._jobs)
+
+    def submit(self, function: Callable, *args: Any,
+               done: Callable[[Any], None] = None,
+               failed: Callable[[str], None] = None) -> None:
+        """Runs a function on the background thread, after the jobs
+        submitted before it.
+
+        Parameters
+        ----------
+        function : Callable
+            The function to run. It must not touch widgets.
+        *args : Any
+            The arguments of the function.
+        done : Callable[[Any], None], optional
+            The function called on the GUI thread with the result, by default
+            None.
+        failed : Callable[[str], None], optional
+            The function called on the GUI thread with the error message if
+            the function raised an exception, by default None.
+        """
+        job = _Job(function, args)
+        job.signals.finished.connect(self._finished)
+        job.signals.failed.connect(self._failed)
+        self._jobs[job] = (done, failed)
+        self._pool.start(job)
+
+    def report_write(self, error: BaseException | None) -> None:
+        """Emits `written` or `write_failed` for a write of the table file.
+        Passed to `Table.start_write_behind()`, and called from its
+        write-behind thread.
+
+        Parameters
+        ----------
+        error : BaseException | None
+            The exception that failed the write, or None if it succeeded.
+        """
+        if error is None:
+            self.written.emit()
+        else:
+            self.write_failed.emit(str(error) or type(error).__name__)
+
+    def close(self) -> None:
+        """Waits for the submitted jobs to finish."""
+        self._pool.waitForDone()
+
+    @Slot(object, object)
+    def _finished(self, job: _Job, result: Any) -> None:
+        done, _ = self._jobs.pop(job, (None, None))
+        if done is not None:
+            done(result)
+
+    @Slot(object, str)
+    def _failed(self, job: _Job, message: str) -> None:
+        _, failed = self._jobs.pop(job, (None, None))
+        if failed is not None:
+            failed(message)
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from typing import Callable
+
+
+class WriteBehind:
+    """Background thread that coalesces write requests.
+
+    Every call to `mark_dirty()` pushes the next write back by `delay`
+    seconds, so a burst of changes is written once when it is over. The write
+    is never pushed back further than `max_delay` seconds after the first
+    unwritten change, so a steady stream of changes is still written
+    regularly. A write that fails is retried `delay` seconds later, until
+    the writer is closed, see `close()`.
+
+    Parameters
+    ----------
+    write : Callable[[], None]
+        The function that writes the changes. It is called from the
+        background thread.
+    delay : float, optional
+        The number of seconds without changes to wait before writing, by
+        default 0.5.
+    max_delay : float, optional
+        The maximum number of seconds a change stays unwritten, by default 5.
+    done : Callable[[BaseException | None], None], optional
+        The function called after every write with the exception that
+        failed it, or None if it succeeded, by default None. It is called
+        from the background thread.
+    """
+
+    def __init__(self, write: Callable[[], None], delay: float = 0.5,
+                 max_delay: float = 5.0,
+                 done: Callable[[BaseException | None], None] = None
+                 ) -> None:
+        self._write = write
+        self._done = done
+        self._delay = delay
+        self._max_delay = max_delay
+        self._condition = threading.Condition()
+        self._dirty_since: float | None = None
+        self._deadline: float | None = None
+        self._writing = False
+        self._failures = 0
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="kanbaru-write-behind", daemon=True)
+        self._thread.start()
+
+    @property
+    def dirty(self) -> bool:
+        """Whether there are changes that have not been written yet."""
+        with self._condition:
+            return self._dirty_since is not None or self._writing
+
+    def mark_dirty(self) -> None:
+        """Schedules a write after the debounce delay."""
+        with self._condition:
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._deadline = min(now + self._delay,
+                                 self._dirty_since + self._max_delay)
+            self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Writes the pending changes now and waits until they are written.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum number of seconds to wait, by default None (no
+            limit).
+
+        Returns
+        -------
+        bool
+            True if everything was written, False if the timeout expired or
+            the write failed.
+        """
+        with self._condition:
+            failures = self._failures
+            if self._dirty_since is not None:
+                self._deadline = time.monotonic()
+                self._condition.notify_all()
+            self._condition.wait_for(
+                lambda: not self._writing and (
+                    self._dirty_since is None
+                    or self._failures != failures),
+                timeout)
+            return self._dirty_since is None and not self._writing
+
+    def close(self, timeout: float = None) -> None:
+        """Stops the background thread once the running write, if any, is
+        over. Neither the pending changes nor a failed write are written,
+        so the caller writes them once, e.g. if `dirty` is still True.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum number of seconds to wait, by default None (no
+            limit).
+        """
+        with self._condition:
+            self._closed = True
+            self._deadline = None
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def _retry(self) -> None:
+        """Schedules the write that failed again after the debounce delay.
+        Called while holding the condition."""
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if self._deadline is None or self._deadline > now + self._delay:
+            self._deadline = now + self._delay
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and (
+                    self._deadline is None
+                    or self._deadline > time.monotonic()
+                ):
+                    self._condition.wait(
+                        None if self._deadline is None
+                        else self._deadline - time.monotonic())
+                if self._closed:
+                    return None
+                self._dirty_since = self._deadline = None
+                self._writing = True
+            error = None
+            try:
+                self._write()
+            except BaseException as e:
+                error = e
+                logging.error("Failed to write the table in the background",
+                              exc_info=True)
+            finally:
+                with self._condition:
+                    self._writing = False
+                    if error is not None:
+                        self._failures += 1
+                        if not self._closed:
+                            self._retry()
+                    self._condition.notify_all()
+            if self._done is not None:
+                try:
+                    self._done(error)
+                except Exception:
+                    logging.error("Failed to report a background write",
+                                  exc_info=True)